@@ -1,25 +1,280 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, flash
+from flask import (Flask, Response, render_template, request, redirect, url_for, jsonify, flash, g,
+                   has_request_context, make_response, send_file, session,
+                   before_render_template, template_rendered)
+from markupsafe import escape
+from werkzeug.exceptions import HTTPException
+from metrics import MetricsRegistry
+from response_cache import ResponseCache, CachedResponse
+from slow_queries import SlowQueryLog, fingerprint_sql, redact_parameters
+from profiling import RequestProfiler, list_profiles, merged_stacks, profile_path, profile_summary
+from scoring import DIRECTIONS, MISSING, NORMALIZATIONS, ScoreCache, ScoreColumn, ScoreTable
+from skyline import skyline
+from field_stats import AnalysisSummary, SummaryCache
+from similarity import SimilarityCache, SimilarityIndex
+from dedup import DedupCache, DedupIndex, cluster_pairs
 import sqlite3
 import json
-from datetime import datetime
+import csv
+import functools
+import hashlib
+import io
+import itertools
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date
+from collections import namedtuple
+from array import array
+import base64
+import math
 import os
 
 app = Flask(__name__)
-app.secret_key = 'your-secret-key-change-this'  # Change this in production
+app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-this')  # Change this in production
 
 # Database configuration
-DATABASE = 'product_comparisons.db'
+DATABASE = os.environ.get('DATABASE_PATH', 'product_comparisons.db')
 
-def get_db_connection():
-    """Get database connection with row factory for dict-like access"""
-    conn = sqlite3.connect(DATABASE)
+# Per-connection SQLite settings, overridable through the environment
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    # Negative cache_size is in KiB
+    'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON'
+}
+
+# Keep one open connection per thread and database instead of reconnecting per request
+REUSE_CONNECTIONS = os.environ.get('SQLITE_REUSE_CONNECTIONS', '1') != '0'
+
+# Statements slower than this many milliseconds are logged with their query plan; negative disables
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+
+_thread_state = threading.local()
+
+slow_query_log = SlowQueryLog()
+
+def _sql_source():
+    # The route serving the current request, or the background job running on this thread
+    if has_request_context():
+        return request.url_rule.rule if request.url_rule else '<unmatched>'
+    return getattr(_thread_state, 'sql_source', None) or '<background>'
+
+def explain_query_plan(conn, sql, parameters=()):
+    """EXPLAIN QUERY PLAN output for `sql` as a tuple of lines indented by depth, or None"""
+    try:
+        # Bypass the instrumented execute so explaining is never itself timed or logged
+        rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    
+    depths, lines = {}, []
+    for node_id, parent, _, detail in rows:
+        depths[node_id] = depths.get(parent, -1) + 1
+        lines.append('  ' * depths[node_id] + detail)
+    return tuple(lines) or None
+
+def _record_sql(conn, sql, parameters, started):
+    elapsed = time.perf_counter() - started
+    
+    # Statements run while a request is being served count towards its metrics
+    stats = getattr(_thread_state, 'request_metrics', None)
+    if stats is not None:
+        stats['sql_statements'] += 1
+        stats['sql_seconds'] += elapsed
+    
+    if 0 <= SLOW_QUERY_MS <= elapsed * 1000:
+        source = _sql_source()
+        # Scripts hold several statements and have no single plan
+        plan = explain_query_plan(conn, sql, parameters) if parameters is not None else None
+        slow_query_log.record(sql, elapsed, source, parameters, plan)
+        app.logger.warning('Slow query (%.1f ms) from %s: %s parameters=%s',
+                           elapsed * 1000, source, fingerprint_sql(sql), redact_parameters(parameters))
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection that times each statement for the request metrics and the slow-query log"""
+    
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_sql(self, sql, parameters, started)
+    
+    def executemany(self, sql, parameters):
+        # Keep the first row of a list so a slow batch can still be explained
+        first = parameters[0] if isinstance(parameters, (list, tuple)) and parameters else ()
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            _record_sql(self, sql, first, started)
+    
+    def executescript(self, sql_script):
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            _record_sql(self, sql_script, None, started)
+
+class ReusableConnection(InstrumentedConnection):
+    """sqlite3 connection whose close() keeps it open for the next caller on this thread
+
+    Closing rolls back anything left uncommitted, which is what a real close
+    would have discarded, so callers keep their usual connect/commit/close
+    pattern. dispose() closes the underlying connection for good.
+    """
+    
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+    
+    def dispose(self):
+        super().close()
+
+def open_db_connection(database=None, factory=InstrumentedConnection):
+    """Open a new configured connection to `database` (defaults to DATABASE)"""
+    conn = sqlite3.connect(database or DATABASE,
+                           timeout=SQLITE_PRAGMAS['busy_timeout'] / 1000,
+                           factory=factory)
     conn.row_factory = sqlite3.Row
+    for pragma, value in SQLITE_PRAGMAS.items():
+        conn.execute(f'PRAGMA {pragma} = {value}')
+    return conn
+
+def get_db_connection():
+    """Get database connection with row factory for dict-like access
+
+    Connections are reused per thread (and per process, so forked workers
+    never share a handle) and tracked on flask.g for the current request,
+    which releases them on teardown.
+    """
+    if not REUSE_CONNECTIONS:
+        return open_db_connection()
+    
+    connections = getattr(_thread_state, 'connections', None)
+    if connections is None or _thread_state.pid != os.getpid():
+        connections = _thread_state.connections = {}
+        _thread_state.pid = os.getpid()
+    
+    conn = connections.get(DATABASE)
+    if conn is None:
+        conn = connections[DATABASE] = open_db_connection(factory=ReusableConnection)
+    
+    if has_request_context():
+        g.db_connection = conn
     return conn
 
+def close_thread_connections():
+    """Dispose of every connection cached for the current thread"""
+    for conn in getattr(_thread_state, 'connections', {}).values():
+        conn.dispose()
+    _thread_state.connections = {}
+
+@app.teardown_request
+def release_db_connection(error):
+    """Roll back whatever the request left uncommitted on its connection"""
+    conn = g.pop('db_connection', None)
+    if conn is not None:
+        conn.close()
+
+# Request metrics, labelled by URL rule so /analysis/1 and /analysis/2 share a series.
+# They are kept per process; each worker of a multi-process server reports its own
+metrics_registry = MetricsRegistry()
+http_requests = metrics_registry.counter(
+    'http_requests_total', 'Requests served', ['route', 'method', 'status'])
+http_request_duration = metrics_registry.histogram(
+    'http_request_duration_seconds', 'Time until the response body was fully sent', ['route', 'method'])
+http_response_size = metrics_registry.histogram(
+    'http_response_size_bytes', 'Response body size', ['route'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216))
+sql_statements_per_request = metrics_registry.histogram(
+    'sql_statements_per_request', 'SQL statements executed while serving one request', ['route'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+sql_statements = metrics_registry.counter(
+    'sql_statements_total', 'SQL statements executed while serving requests', ['route'])
+sql_seconds = metrics_registry.counter(
+    'sql_seconds_total', 'Time spent executing SQL statements while serving requests', ['route'])
+template_render_duration = metrics_registry.histogram(
+    'template_render_seconds', 'Time spent rendering a template', ['template'])
+
+@app.before_request
+def begin_request_metrics():
+    """Start counting time and SQL statements for this request on the current thread"""
+    _thread_state.request_metrics = {
+        'started': time.perf_counter(), 'sql_statements': 0, 'sql_seconds': 0.0, 'bytes': 0
+    }
+
+def _count_streamed_bytes(body, stats):
+    for chunk in body:
+        stats['bytes'] += len(chunk)
+        yield chunk
+
+@app.after_request
+def finish_request_metrics(response):
+    """Record the request's metrics once its body has been sent
+
+    Streamed bodies run SQL and produce bytes after this hook, so the
+    numbers are taken when the response is closed.
+    """
+    stats = getattr(_thread_state, 'request_metrics', None)
+    if stats is None:
+        return response
+    
+    route = request.url_rule.rule if request.url_rule else '<unmatched>'
+    method, status = request.method, response.status_code
+    if response.is_streamed and not response.direct_passthrough:
+        response.response = _count_streamed_bytes(response.response, stats)
+    else:
+        stats['bytes'] = response.content_length or 0
+    
+    def observe():
+        if getattr(_thread_state, 'request_metrics', None) is stats:
+            _thread_state.request_metrics = None
+        http_requests.inc((route, method, status))
+        http_request_duration.observe((route, method), time.perf_counter() - stats['started'])
+        http_response_size.observe((route,), stats['bytes'])
+        sql_statements_per_request.observe((route,), stats['sql_statements'])
+        sql_statements.inc((route,), stats['sql_statements'])
+        sql_seconds.inc((route,), stats['sql_seconds'])
+    
+    response.call_on_close(observe)
+    return response
+
+@before_render_template.connect_via(app)
+def _template_render_started(sender, template, context, **extra):
+    _thread_state.template_started = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def _template_render_finished(sender, template, context, **extra):
+    started = getattr(_thread_state, 'template_started', None)
+    if started is not None:
+        template_render_duration.observe((template.name,), time.perf_counter() - started)
+        _thread_state.template_started = None
+
 def init_db():
-    """Initialize the database with required tables"""
+    """Initialize the database and bring its schema up to date"""
     conn = get_db_connection()
     
+    # Freed pages are returned by the reclaimer's incremental vacuum steps.
+    # Switching an existing database over needs one full VACUUM
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+    
+    run_migrations(conn)
+    conn.close()
+
+def _migration_base_tables(conn):
+    """Create the original analysis, fields, objects and object_values tables"""
     # Analysis table - stores comparison groups
     conn.execute('''
         CREATE TABLE IF NOT EXISTS analysis (
@@ -71,12 +326,462 @@ def init_db():
             FOREIGN KEY (field_id) REFERENCES fields (id) ON DELETE CASCADE
         )
     ''')
+
+def _migration_typed_values(conn):
+    """Add the typed shadow columns of object_values and backfill them"""
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(object_values)')}
     
-    conn.commit()
-    conn.close()
+    if 'value_num' not in columns:
+        conn.execute('ALTER TABLE object_values ADD COLUMN value_num REAL')
+    if 'value_date' not in columns:
+        conn.execute('ALTER TABLE object_values ADD COLUMN value_date TEXT')
+    
+    # Typed values are looked up per field, so both indexes lead with field_id.
+    # They also serve every plain field_id lookup
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_object_values_field_num ON object_values (field_id, value_num)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_object_values_field_date ON object_values (field_id, value_date)')
+    
+    if 'value_num' in columns and 'value_date' in columns:
+        return
+    
+    # Backfill existing rows of typed fields in id-ordered batches
+    last_id = 0
+    while True:
+        batch = conn.execute(f'''
+            SELECT ov.id, f.field_type, ov.field_value
+            FROM object_values ov
+            JOIN fields f ON f.id = ov.field_id
+            WHERE ov.id > ?
+              AND f.field_type IN ({','.join('?' * len(TYPED_FIELD_TYPES))})
+              AND ov.field_value IS NOT NULL AND ov.field_value != ''
+            ORDER BY ov.id
+            LIMIT 1000
+        ''', (last_id,) + TYPED_FIELD_TYPES).fetchall()
+        
+        if not batch:
+            break
+        
+        conn.executemany(
+            'UPDATE object_values SET value_num = ?, value_date = ? WHERE id = ?',
+            [parse_typed_value(field_type, field_value) + (value_id,)
+             for value_id, field_type, field_value in batch]
+        )
+        last_id = batch[-1][0]
+
+def _migration_lookup_indexes(conn):
+    """Index the foreign keys every route filters on and make values unique per object and field"""
+    # Keep only the newest value of any duplicated (object_id, field_id) pair
+    conn.execute('''
+        DELETE FROM object_values
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM object_values GROUP BY object_id, field_id
+        )
+    ''')
+    
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_object_values_object_field ON object_values (object_id, field_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_objects_analysis_created ON objects (analysis_id, created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_fields_analysis_order ON fields (analysis_id, display_order)')
+    
+    # Give the query planner statistics for the new indexes
+    conn.execute('ANALYZE')
+
+def _migration_search_index(conn):
+    """Create FTS5 indexes over analyses, objects and field values, kept in sync by triggers"""
+    # External-content tables: the text lives in the base tables and the
+    # index only stores tokens, so snippets are read back from the source
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS analysis_fts USING fts5(
+            name, description, category,
+            content='analysis', content_rowid='id', prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS objects_fts USING fts5(
+            object_name, brand,
+            content='objects', content_rowid='id', prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS object_values_fts USING fts5(
+            field_value,
+            content='object_values', content_rowid='id', prefix='2 3'
+        )
+    ''')
+    
+    sync_triggers = {
+        'analysis': ('analysis_fts', ['name', 'description', 'category'], ''),
+        'objects': ('objects_fts', ['object_name', 'brand'], 'OF object_name, brand '),
+        'object_values': ('object_values_fts', ['field_value'], 'OF field_value '),
+    }
+    for table, (fts_table, columns, update_of) in sync_triggers.items():
+        column_list = ', '.join(columns)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        old_values = ', '.join(f'old.{column}' for column in columns)
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE {update_of}ON {table} BEGIN
+                INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+            END
+        ''')
+        conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+
+def _stats_delta(metric, bucket, delta, condition='1'):
+    """Trigger statement adding `delta` to one stats bucket when `condition` holds"""
+    return f'''
+                INSERT INTO stats (metric, bucket, value)
+                SELECT '{metric}', {bucket}, {delta} WHERE {condition}
+                ON CONFLICT (metric, bucket) DO UPDATE SET value = value + excluded.value;'''
+
+def _migration_stats_rollups(conn):
+    """Keep dashboard totals and distributions in a rollup table maintained by triggers"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stats (
+            metric TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, bucket)
+        ) WITHOUT ROWID
+    ''')
+    
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(analysis)')}
+    if 'object_count' not in columns:
+        conn.execute('ALTER TABLE analysis ADD COLUMN object_count INTEGER NOT NULL DEFAULT 0')
+    
+    triggers = {
+        'stats_analysis_ai': ('AFTER INSERT ON analysis',
+            _stats_delta('total', "'analyses'", 1)
+            + _stats_delta('category', 'new.category', 1, 'new.category IS NOT NULL')),
+        'stats_analysis_ad': ('AFTER DELETE ON analysis',
+            _stats_delta('total', "'analyses'", -1)
+            + _stats_delta('category', 'old.category', -1, 'old.category IS NOT NULL')),
+        'stats_analysis_au': ('AFTER UPDATE OF category ON analysis',
+            _stats_delta('category', 'old.category', -1, 'old.category IS NOT NULL')
+            + _stats_delta('category', 'new.category', 1, 'new.category IS NOT NULL')),
+        'stats_objects_ai': ('AFTER INSERT ON objects',
+            _stats_delta('total', "'objects'", 1)
+            + '\n                UPDATE analysis SET object_count = object_count + 1 WHERE id = new.analysis_id;'),
+        'stats_objects_ad': ('AFTER DELETE ON objects',
+            _stats_delta('total', "'objects'", -1)
+            + '\n                UPDATE analysis SET object_count = object_count - 1 WHERE id = old.analysis_id;'),
+        'stats_fields_ai': ('AFTER INSERT ON fields',
+            _stats_delta('total', "'fields'", 1)
+            + _stats_delta('field_type', 'new.field_type', 1)),
+        'stats_fields_ad': ('AFTER DELETE ON fields',
+            _stats_delta('total', "'fields'", -1)
+            + _stats_delta('field_type', 'old.field_type', -1)),
+    }
+    for name, (event, statements) in triggers.items():
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN{statements}
+            END
+        ''')
+    
+    # Seed the rollups from the existing rows
+    conn.execute('DELETE FROM stats')
+    conn.execute('''
+        INSERT INTO stats (metric, bucket, value)
+        SELECT 'total', 'analyses', COUNT(*) FROM analysis
+        UNION ALL SELECT 'total', 'objects', COUNT(*) FROM objects
+        UNION ALL SELECT 'total', 'fields', COUNT(*) FROM fields
+        UNION ALL SELECT 'category', category, COUNT(*) FROM analysis WHERE category IS NOT NULL GROUP BY category
+        UNION ALL SELECT 'field_type', field_type, COUNT(*) FROM fields GROUP BY field_type
+    ''')
+    conn.execute('''
+        UPDATE analysis SET object_count = (
+            SELECT COUNT(*) FROM objects WHERE objects.analysis_id = analysis.id
+        )
+    ''')
+    
+    # Recent analyses and recent activity are read newest first
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_analysis_created ON analysis (created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_objects_created ON objects (created_at)')
+
+def _migration_analysis_version(conn):
+    """Add a version stamp that every change to an analysis increments"""
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(analysis)')}
+    if 'version' not in columns:
+        conn.execute('ALTER TABLE analysis ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+
+def _migration_narrow_analysis_fts_trigger(conn):
+    """Only re-index an analysis when its searchable text changes
+
+    The original update trigger fired on every analysis update, including the
+    object_count and version bookkeeping done on each object write.
+    """
+    conn.execute('DROP TRIGGER IF EXISTS analysis_fts_au')
+    conn.execute('''
+        CREATE TRIGGER analysis_fts_au AFTER UPDATE OF name, description, category ON analysis BEGIN
+            INSERT INTO analysis_fts (analysis_fts, rowid, name, description, category)
+            VALUES ('delete', old.id, old.name, old.description, old.category);
+            INSERT INTO analysis_fts (rowid, name, description, category)
+            VALUES (new.id, new.name, new.description, new.category);
+        END
+    ''')
+
+# Field types whose values are indexed for full-text search
+SEARCHABLE_FIELD_TYPES = ('text', 'select')
+
+def _migration_text_only_value_search(conn):
+    """Index only free-text field values, in an FTS table that owns its content
+
+    Numbers, prices, ratings, booleans and dates are not useful search terms
+    but made up most of the value index and most of its write cost. Owning
+    the content lets rows be deleted by rowid whether or not they were
+    indexed, so the index can never drift from object_values.
+    """
+    for suffix in ('ai', 'ad', 'au'):
+        conn.execute(f'DROP TRIGGER IF EXISTS object_values_fts_{suffix}')
+    conn.execute('DROP TABLE IF EXISTS object_values_fts')
+    
+    conn.execute('''
+        CREATE VIRTUAL TABLE object_values_fts USING fts5(field_value, prefix='2 3')
+    ''')
+    
+    searchable = ', '.join(f"'{field_type}'" for field_type in SEARCHABLE_FIELD_TYPES)
+    index_new = f'''
+                INSERT INTO object_values_fts (rowid, field_value)
+                SELECT new.id, new.field_value
+                WHERE new.field_value != ''
+                  AND (SELECT field_type FROM fields WHERE id = new.field_id) IN ({searchable});'''
+    conn.execute(f'''
+        CREATE TRIGGER object_values_fts_ai AFTER INSERT ON object_values BEGIN{index_new}
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER object_values_fts_ad AFTER DELETE ON object_values BEGIN
+            DELETE FROM object_values_fts WHERE rowid = old.id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER object_values_fts_au AFTER UPDATE OF field_value ON object_values BEGIN
+            DELETE FROM object_values_fts WHERE rowid = old.id;{index_new}
+        END
+    ''')
+    
+    conn.execute(f'''
+        INSERT INTO object_values_fts (rowid, field_value)
+        SELECT ov.id, ov.field_value
+        FROM object_values ov
+        JOIN fields f ON f.id = ov.field_id
+        WHERE ov.field_value != '' AND f.field_type IN ({searchable})
+    ''')
+
+def _migration_bulk_load_mode(conn):
+    """Let bulk loads skip per-row insert triggers and catch up once per batch
+
+    While a row exists in bulk_load the insert triggers on objects and
+    object_values do nothing. The writer sets the flag inside its own
+    transaction and calls finish_bulk_load() before committing, so other
+    connections never observe it.
+    """
+    conn.execute('CREATE TABLE IF NOT EXISTS bulk_load (flag INTEGER PRIMARY KEY)')
+    
+    searchable = ', '.join(f"'{field_type}'" for field_type in SEARCHABLE_FIELD_TYPES)
+    triggers = {
+        'objects_fts_ai': ('objects', '''
+            INSERT INTO objects_fts (rowid, object_name, brand) VALUES (new.id, new.object_name, new.brand);'''),
+        'stats_objects_ai': ('objects',
+            _stats_delta('total', "'objects'", 1)
+            + '\n                UPDATE analysis SET object_count = object_count + 1 WHERE id = new.analysis_id;'),
+        'object_values_fts_ai': ('object_values', f'''
+            INSERT INTO object_values_fts (rowid, field_value)
+            SELECT new.id, new.field_value
+            WHERE new.field_value != ''
+              AND (SELECT field_type FROM fields WHERE id = new.field_id) IN ({searchable});'''),
+    }
+    for name, (table, statements) in triggers.items():
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+        conn.execute(f'''
+            CREATE TRIGGER {name} AFTER INSERT ON {table}
+            WHEN NOT EXISTS (SELECT 1 FROM bulk_load) BEGIN{statements}
+            END
+        ''')
+
+def _migration_soft_delete(conn):
+    """Mark analyses deleted instead of removing them inside the request
+
+    A soft delete takes the analysis and its objects and fields out of the
+    rollups at once; the delete triggers skip rows of deleted analyses so
+    the reclaimer's later physical deletes do not count them twice.
+    """
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(analysis)')}
+    if 'deleted_at' not in columns:
+        conn.execute('ALTER TABLE analysis ADD COLUMN deleted_at TIMESTAMP')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_analysis_deleted ON analysis (deleted_at)
+        WHERE deleted_at IS NOT NULL
+    ''')
+    
+    live_parent = 'NOT EXISTS (SELECT 1 FROM analysis WHERE id = old.analysis_id AND deleted_at IS NOT NULL)'
+    triggers = {
+        'stats_analysis_ad': ('AFTER DELETE ON analysis WHEN old.deleted_at IS NULL',
+            _stats_delta('total', "'analyses'", -1)
+            + _stats_delta('category', 'old.category', -1, 'old.category IS NOT NULL')),
+        'stats_objects_ad': (f'AFTER DELETE ON objects WHEN {live_parent}',
+            _stats_delta('total', "'objects'", -1)
+            + '\n                UPDATE analysis SET object_count = object_count - 1 WHERE id = old.analysis_id;'),
+        'stats_fields_ad': (f'AFTER DELETE ON fields WHEN {live_parent}',
+            _stats_delta('total', "'fields'", -1)
+            + _stats_delta('field_type', 'old.field_type', -1)),
+        'stats_analysis_soft_delete': (
+            'AFTER UPDATE OF deleted_at ON analysis '
+            'WHEN old.deleted_at IS NULL AND new.deleted_at IS NOT NULL',
+            _stats_delta('total', "'analyses'", -1)
+            + _stats_delta('category', 'old.category', -1, 'old.category IS NOT NULL')
+            + _stats_delta('total', "'objects'", '-old.object_count')
+            + _stats_delta('total', "'fields'", '-(SELECT COUNT(*) FROM fields WHERE analysis_id = old.id)')
+            + '''
+                INSERT INTO stats (metric, bucket, value)
+                SELECT 'field_type', field_type, -COUNT(*) FROM fields WHERE analysis_id = old.id GROUP BY field_type
+                ON CONFLICT (metric, bucket) DO UPDATE SET value = value + excluded.value;'''),
+    }
+    for name, (event, statements) in triggers.items():
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+        conn.execute(f'''
+            CREATE TRIGGER {name} {event} BEGIN{statements}
+            END
+        ''')
+
+def _migration_jobs(conn):
+    """Persist background jobs so any worker process can report on them"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            artifact_path TEXT,
+            artifact_name TEXT,
+            artifact_mimetype TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            worker_pid INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, finished_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at)')
+
+def _migration_score_profiles(conn):
+    """Store saved weight profiles that rank the objects of an analysis"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS score_profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            analysis_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            normalization TEXT NOT NULL DEFAULT 'minmax',
+            version INTEGER NOT NULL DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (analysis_id) REFERENCES analysis (id) ON DELETE CASCADE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS score_weights (
+            profile_id INTEGER NOT NULL,
+            field_id INTEGER NOT NULL,
+            weight REAL NOT NULL,
+            direction TEXT NOT NULL DEFAULT 'higher',
+            PRIMARY KEY (profile_id, field_id),
+            FOREIGN KEY (profile_id) REFERENCES score_profiles (id) ON DELETE CASCADE,
+            FOREIGN KEY (field_id) REFERENCES fields (id) ON DELETE CASCADE
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_score_profiles_analysis ON score_profiles (analysis_id)')
+    # Deleting a field (also by the reclaimer) looks its weights up by field_id
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_score_weights_field ON score_weights (field_id)')
+
+def _migration_covering_value_index(conn):
+    """Let reads of one field's numeric values by object skip the table
+
+    (field_id, value_num, object_id) serves everything (field_id, value_num)
+    did, so it replaces that index rather than adding to the cost of writes.
+    """
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_object_values_field_num_object
+        ON object_values (field_id, value_num, object_id)
+    ''')
+    conn.execute('DROP INDEX IF EXISTS idx_object_values_field_num')
 
-# Initialize database on startup
-init_db()
+def _migration_duplicate_candidates(conn):
+    """Store pairs of objects of an analysis that look like duplicates of each other
+
+    Each pair is stored once, with object_id below other_id.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS duplicate_candidates (
+            object_id INTEGER NOT NULL,
+            other_id INTEGER NOT NULL,
+            analysis_id INTEGER NOT NULL,
+            similarity REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (object_id, other_id),
+            FOREIGN KEY (object_id) REFERENCES objects (id) ON DELETE CASCADE,
+            FOREIGN KEY (other_id) REFERENCES objects (id) ON DELETE CASCADE,
+            FOREIGN KEY (analysis_id) REFERENCES analysis (id) ON DELETE CASCADE
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_duplicate_candidates_other ON duplicate_candidates (other_id)')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_duplicate_candidates_analysis
+        ON duplicate_candidates (analysis_id, similarity)
+    ''')
+
+# Schema migrations in order; the database's PRAGMA user_version is the
+# number of migrations already applied. Only ever append to this list
+MIGRATIONS = [
+    _migration_base_tables,
+    _migration_typed_values,
+    _migration_lookup_indexes,
+    _migration_search_index,
+    _migration_stats_rollups,
+    _migration_analysis_version,
+    _migration_narrow_analysis_fts_trigger,
+    _migration_text_only_value_search,
+    _migration_bulk_load_mode,
+    _migration_soft_delete,
+    _migration_jobs,
+    _migration_score_profiles,
+    _migration_covering_value_index,
+    _migration_duplicate_candidates,
+]
+
+def run_migrations(conn):
+    """Apply pending migrations, each in its own transaction
+
+    Returns the list of applied migration names. When the schema is already
+    current this only reads PRAGMA user_version and issues no DDL.
+    """
+    current_version = conn.execute('PRAGMA user_version').fetchone()[0]
+    applied = []
+    
+    for version, migration in enumerate(MIGRATIONS[current_version:], start=current_version + 1):
+        conn.execute('BEGIN')
+        try:
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(migration.__name__)
+    
+    return applied
 
 # Field type options for dynamic forms
 FIELD_TYPES = {
@@ -90,40 +795,447 @@ FIELD_TYPES = {
     'date': 'Date'
 }
 
+# Field types whose text values are compared as numbers
+NUMERIC_FIELD_TYPES = ('number', 'decimal', 'price', 'rating')
+
+# Field types that also get a typed shadow value in object_values
+TYPED_FIELD_TYPES = ('number', 'decimal', 'price', 'rating', 'boolean', 'date')
+
+INSERT_OBJECT_VALUE_SQL = '''
+    INSERT INTO object_values (object_id, field_id, field_value, value_num, value_date)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+def parse_typed_value(field_type, value):
+    """Typed shadow values (value_num, value_date) for a raw field value
+
+    Numeric types and booleans (Yes=1, No=0) go to value_num, dates to
+    value_date as ISO strings. Values that do not parse leave both NULL.
+    """
+    if value is None or str(value).strip() == '':
+        return None, None
+    
+    value = str(value).strip()
+    if field_type in NUMERIC_FIELD_TYPES:
+        try:
+            number = float(value.replace(',', '').lstrip('$')) if field_type == 'price' else float(value)
+        except ValueError:
+            return None, None
+        return (number if math.isfinite(number) else None), None
+    
+    if field_type == 'boolean':
+        return {'yes': 1.0, 'no': 0.0}.get(value.lower()), None
+    
+    if field_type == 'date':
+        try:
+            return None, date.fromisoformat(value).isoformat()
+        except ValueError:
+            return None, None
+    
+    return None, None
+
+def object_value_params(object_id, field, field_value):
+    """Parameters for INSERT_OBJECT_VALUE_SQL, including the typed shadow values"""
+    value_num, value_date = parse_typed_value(field['field_type'], field_value)
+    return (object_id, field['id'], field_value, value_num, value_date)
+
+UPSERT_OBJECT_VALUE_SQL = INSERT_OBJECT_VALUE_SQL + '''
+    ON CONFLICT (object_id, field_id) DO UPDATE SET
+        field_value = excluded.field_value,
+        value_num = excluded.value_num,
+        value_date = excluded.value_date
+'''
+
+# Object columns that edits may change
+OBJECT_EDIT_COLUMNS = ('object_name', 'brand', 'image_url')
+
+def update_object_columns(conn, object_id, columns):
+    """Write the given object columns that differ from the stored row
+
+    Returns the names of the columns that changed; nothing is written (and
+    no search re-index triggered) when the submitted values are unchanged.
+    """
+    current = conn.execute(
+        f'SELECT {", ".join(OBJECT_EDIT_COLUMNS)} FROM objects WHERE id = ?', (object_id,)
+    ).fetchone()
+    changed = {column: value for column, value in columns.items()
+               if column in OBJECT_EDIT_COLUMNS and (current[column] or '') != value}
+    if changed:
+        assignments = ', '.join(f'{column} = ?' for column in changed)
+        conn.execute(f'''
+            UPDATE objects SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+        ''', (*changed.values(), object_id))
+    return list(changed)
+
+def save_object_values(conn, object_id, fields, submitted):
+    """Apply submitted field values as a diff against the stored ones
+
+    `submitted` maps field ids to new values; fields missing from it keep
+    their stored value. Changed values are upserted and emptied ones
+    deleted, each as one batch. Returns the ids of the fields that changed.
+    """
+    stored = dict(conn.execute(
+        'SELECT field_id, field_value FROM object_values WHERE object_id = ?', (object_id,)
+    ).fetchall())
+    
+    upserts, deletes = [], []
+    for field in fields:
+        if field['id'] not in submitted:
+            continue
+        value = submitted[field['id']]
+        if value and value != stored.get(field['id']):
+            upserts.append(object_value_params(object_id, field, value))
+        elif not value and field['id'] in stored:
+            deletes.append((object_id, field['id']))
+    
+    if upserts:
+        conn.executemany(UPSERT_OBJECT_VALUE_SQL, upserts)
+    if deletes:
+        conn.executemany('DELETE FROM object_values WHERE object_id = ? AND field_id = ?', deletes)
+    return [params[1] for params in upserts] + [field_id for _, field_id in deletes]
+
+def submitted_field_values(form, fields):
+    """Field values present in a submitted object form, keyed by field id"""
+    return {field['id']: form[f'field_{field["id"]}'].strip()
+            for field in fields if f'field_{field["id"]}' in form}
+
+def typed_value_column(field_type):
+    """Name of the object_values column holding comparable values of a field type"""
+    if field_type in NUMERIC_FIELD_TYPES or field_type == 'boolean':
+        return 'value_num'
+    if field_type == 'date':
+        return 'value_date'
+    return None
+
+def load_stats(conn, metric, limit=None):
+    """Non-empty buckets of one rollup metric as rows of (bucket, count), largest first"""
+    return conn.execute('''
+        SELECT bucket, value AS count FROM stats
+        WHERE metric = ? AND value > 0
+        ORDER BY value DESC, bucket
+        LIMIT ?
+    ''', (metric, limit if limit is not None else -1)).fetchall()
+
+def load_totals(conn):
+    """Total number of analyses, objects and fields from the stats rollup"""
+    totals = {'analyses': 0, 'objects': 0, 'fields': 0}
+    for row in conn.execute("SELECT bucket, value FROM stats WHERE metric = 'total'"):
+        totals[row['bucket']] = row['value']
+    return totals
+
+# Object x field grid for one analysis. `values` maps object_id -> {field_id: value}
+ComparisonMatrix = namedtuple('ComparisonMatrix', ['fields', 'objects', 'values'])
+
+# Built-in object columns the objects API can sort by
+OBJECT_SORT_COLUMNS = {
+    'created_at': 'o.created_at',
+    'name': 'o.object_name',
+    'brand': 'o.brand'
+}
+
+# Default and maximum page sizes for incremental object loading
+OBJECTS_PAGE_SIZE = 50
+MAX_OBJECTS_PAGE_SIZE = 500
+
+def load_analysis(conn, analysis_id):
+    """Get an analysis unless it does not exist or has been deleted"""
+    return conn.execute(
+        'SELECT * FROM analysis WHERE id = ? AND deleted_at IS NULL', (analysis_id,)
+    ).fetchone()
+
+def load_fields(conn, analysis_id):
+    """Get the fields of an analysis in display order"""
+    return conn.execute('''
+        SELECT * FROM fields 
+        WHERE analysis_id = ? 
+        ORDER BY display_order ASC
+    ''', (analysis_id,)).fetchall()
+
+def load_object_values(conn, analysis_id, object_ids=None):
+    """Get {object_id: {field_id: value}} for an analysis, optionally limited to some objects"""
+    object_filter = ''
+    params = [analysis_id]
+    if object_ids is not None:
+        object_ids = list(object_ids)
+        if not object_ids:
+            return {}
+        object_filter = f"AND o.id IN ({','.join('?' * len(object_ids))})"
+        params.extend(object_ids)
+    
+    # One set-based pass over the values; fields of other analyses are
+    # filtered out by the join so stale rows never leak in
+    rows = conn.execute(f'''
+        SELECT ov.object_id, ov.field_id, ov.field_value
+        FROM objects o
+        JOIN object_values ov ON ov.object_id = o.id
+        JOIN fields f ON f.id = ov.field_id AND f.analysis_id = o.analysis_id
+        WHERE o.analysis_id = ? {object_filter}
+    ''', params)
+    
+    values = {object_id: {} for object_id in object_ids} if object_ids is not None else {}
+    for object_id, field_id, field_value in rows:
+        values.setdefault(object_id, {})[field_id] = field_value
+    return values
+
+def load_comparison_matrix(conn, analysis_id, object_id=None):
+    """Load fields, objects and the full value grid of an analysis in a constant number of queries"""
+    fields = load_fields(conn, analysis_id)
+    
+    object_filter = 'AND o.id = ?' if object_id is not None else ''
+    params = (analysis_id, object_id) if object_id is not None else (analysis_id,)
+    
+    objects = conn.execute(f'''
+        SELECT o.* FROM objects o
+        WHERE o.analysis_id = ? {object_filter}
+        ORDER BY o.created_at DESC, o.id DESC
+    ''', params).fetchall()
+    
+    values = load_object_values(conn, analysis_id,
+                                [object_id] if object_id is not None else None)
+    values = {obj['id']: values.get(obj['id'], {}) for obj in objects}
+    
+    return ComparisonMatrix(fields, objects, values)
+
+def encode_cursor(position):
+    """Encode a keyset position as an opaque URL-safe cursor"""
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(position, list) or len(position) != 3:
+        raise ValueError('Invalid cursor')
+    return position
+
+def parse_object_filters(args, fields):
+    """Parse field filters from query args
+
+    Supported forms, where <id> is a field id of the analysis:
+    field_<id>=value (equals), field_<id>_min / field_<id>_max (range)
+    and field_<id>_contains (substring).
+    """
+    fields_by_id = {field['id']: field for field in fields}
+    filters = []
+    
+    for key, value in args.items(multi=True):
+        if not key.startswith('field_') or value == '':
+            continue
+        
+        field_part, _, op = key[len('field_'):].partition('_')
+        op = op or 'eq'
+        if op not in ('eq', 'min', 'max', 'contains'):
+            raise ValueError(f'Unsupported filter "{key}"')
+        if not field_part.isdigit() or int(field_part) not in fields_by_id:
+            raise ValueError(f'Unknown field in filter "{key}"')
+        
+        field = fields_by_id[int(field_part)]
+        if op in ('min', 'max') and typed_value_column(field['field_type']):
+            typed = parse_typed_value(field['field_type'], value)
+            value = typed[0] if typed[0] is not None else typed[1]
+            if value is None:
+                raise ValueError(f'Filter "{key}" expects a {FIELD_TYPES[field["field_type"]].lower()} value')
+        
+        filters.append((field, op, value))
+    
+    return filters
+
+def _filter_clause(field, op, value):
+    """SQL condition and parameters for one parsed filter"""
+    typed_column = typed_value_column(field['field_type'])
+    
+    if op == 'eq':
+        condition, param = 'field_value = ?', value
+    elif op in ('min', 'max'):
+        # Range filters use the typed (field_id, value) indexes when possible
+        column = typed_column or 'field_value'
+        condition, param = f"{column} {'>=' if op == 'min' else '<='} ?", value
+    else:
+        escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        condition, param = "field_value LIKE ? ESCAPE '\\'", f'%{escaped}%'
+    
+    return f'''o.id IN (
+            SELECT object_id FROM object_values
+            WHERE field_id = ? AND field_value != '' AND {condition}
+        )''', [field['id'], param]
+
+def load_objects_page(conn, analysis_id, fields, sort='created_at', order='desc',
+                      filters=(), cursor=None, limit=OBJECTS_PAGE_SIZE):
+    """Load one keyset-paginated page of objects and their values
+
+    `sort` is a built-in column from OBJECT_SORT_COLUMNS or a field id of the
+    analysis. Objects without a value for the sort key always come last.
+    Returns (ComparisonMatrix, next_cursor) where next_cursor is None on the
+    last page. Raises ValueError for unknown sort keys or bad cursors.
+    """
+    join, join_params = '', []
+    if str(sort) in OBJECT_SORT_COLUMNS:
+        sort_expr = OBJECT_SORT_COLUMNS[str(sort)]
+        empty_key = "''"
+    else:
+        field = next((f for f in fields if str(f['id']) == str(sort)), None)
+        if field is None:
+            raise ValueError(f'Unknown sort field "{sort}"')
+        join = 'LEFT JOIN object_values sv ON sv.object_id = o.id AND sv.field_id = ?'
+        join_params = [field['id']]
+        typed_column = typed_value_column(field['field_type'])
+        if typed_column == 'value_num':
+            sort_expr, empty_key = 'sv.value_num', '0'
+        elif typed_column:
+            sort_expr, empty_key = f'sv.{typed_column}', "''"
+        else:
+            sort_expr, empty_key = "NULLIF(sv.field_value, '')", "''"
+    
+    descending = str(order).lower() == 'desc'
+    direction = 'DESC' if descending else 'ASC'
+    comparison = '<' if descending else '>'
+    null_expr = f'(({sort_expr}) IS NULL)'
+    key_expr = f'COALESCE({sort_expr}, {empty_key})'
+    
+    conditions, params = ['o.analysis_id = ?'], [analysis_id]
+    for field, op, value in filters:
+        condition, condition_params = _filter_clause(field, op, value)
+        conditions.append(condition)
+        params.extend(condition_params)
+    
+    if cursor:
+        is_null, key, last_id = decode_cursor(cursor)
+        conditions.append(f'''({null_expr} > ? OR ({null_expr} = ? AND (
+            {key_expr} {comparison} ? OR ({key_expr} = ? AND o.id {comparison} ?))))''')
+        params.extend([is_null, is_null, key, key, last_id])
+    
+    limit = max(1, min(int(limit), MAX_OBJECTS_PAGE_SIZE))
+    rows = conn.execute(f'''
+        SELECT o.*, {null_expr} AS sort_null, {key_expr} AS sort_key
+        FROM objects o
+        {join}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY sort_null ASC, sort_key {direction}, o.id {direction}
+        LIMIT ?
+    ''', join_params + params + [limit + 1]).fetchall()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last['sort_null'], last['sort_key'], last['id']])
+    
+    values = load_object_values(conn, analysis_id, [row['id'] for row in rows])
+    return ComparisonMatrix(fields, rows, values), next_cursor
+
+# Rendered analysis pages and exports, keyed by (analysis_id, version, variant)
+response_cache = ResponseCache(int(os.environ.get('RESPONSE_CACHE_BYTES', 64 * 1024 * 1024)))
+
+# Change on deploys that alter templates or rendering so old ETags stop matching
+ETAG_SALT = os.environ.get('ETAG_SALT', '1')
+
+def get_analysis_version(conn, analysis_id):
+    """Current version stamp of an analysis, or None if it does not exist or was deleted"""
+    row = conn.execute(
+        'SELECT version FROM analysis WHERE id = ? AND deleted_at IS NULL', (analysis_id,)
+    ).fetchone()
+    return row['version'] if row else None
+
+def bump_analysis_version(conn, analysis_id):
+    """Mark an analysis as changed, invalidating its ETags and cached responses"""
+    conn.execute('UPDATE analysis SET version = version + 1 WHERE id = ?', (analysis_id,))
+
+def _cache_while_streaming(chunks, key, mimetype, headers):
+    """Pass a streamed body through, caching it once complete if it stays small enough"""
+    parts, size = [], 0
+    for chunk in chunks:
+        if parts is not None:
+            data = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+            size += len(data)
+            if size <= response_cache.max_entry_bytes:
+                parts.append(data)
+            else:
+                parts = None
+        yield chunk
+    
+    if parts is not None:
+        response_cache.put(key, CachedResponse(b''.join(parts), mimetype, headers))
+
+def versioned_response(view):
+    """Serve an analysis read route with a strong ETag, 304s and the response cache
+
+    The cache key combines the analysis version with everything else the
+    response depends on: the route, host, query string and gzip support.
+    """
+    @functools.wraps(view)
+    def wrapper(analysis_id, **kwargs):
+        # Pending flash messages are rendered into the page, so it is per-user
+        if session.get('_flashes'):
+            return view(analysis_id, **kwargs)
+        
+        conn = get_db_connection()
+        version = get_analysis_version(conn, analysis_id)
+        conn.close()
+        
+        if version is None:
+            return view(analysis_id, **kwargs)
+        
+        variant = (request.endpoint, request.host, tuple(sorted(request.args.items(multi=True))),
+                   bool(request.accept_encodings['gzip']))
+        key = (analysis_id, version, variant)
+        etag = hashlib.sha1(repr((ETAG_SALT, key)).encode()).hexdigest()
+        
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            cached = response_cache.get(key)
+            if cached is not None:
+                response = Response(cached.body, mimetype=cached.mimetype, headers=cached.headers)
+            else:
+                response = make_response(view(analysis_id, **kwargs))
+                if response.status_code != 200:
+                    return response
+                
+                headers = [(name, value) for name, value in response.headers
+                           if name not in ('Content-Type', 'Content-Length')]
+                if response.is_streamed:
+                    response.response = _cache_while_streaming(
+                        response.response, key, response.mimetype, headers)
+                else:
+                    response_cache.put(key, CachedResponse(response.get_data(), response.mimetype, headers))
+        
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    return wrapper
+
 @app.route('/')
 def dashboard():
     """Dashboard view with overview of all comparisons"""
     conn = get_db_connection()
     
-    # Get recent analyses
+    # Get recent analyses; object counts are maintained by triggers
     recent_analyses = conn.execute('''
-        SELECT a.*, COUNT(o.id) as object_count
-        FROM analysis a
-        LEFT JOIN objects o ON a.id = o.analysis_id
-        GROUP BY a.id
-        ORDER BY a.created_at DESC
+        SELECT * FROM analysis
+        WHERE deleted_at IS NULL
+        ORDER BY created_at DESC
         LIMIT 6
     ''').fetchall()
     
     # Get statistics
-    total_analyses = conn.execute('SELECT COUNT(*) FROM analysis').fetchone()[0]
-    total_objects = conn.execute('SELECT COUNT(*) FROM objects').fetchone()[0]
+    totals = load_totals(conn)
     
     # Category distribution
-    categories = conn.execute('''
-        SELECT category, COUNT(*) as count
-        FROM analysis
-        WHERE category IS NOT NULL
-        GROUP BY category
-        ORDER BY count DESC
-    ''').fetchall()
+    categories = [
+        {'category': row['bucket'], 'count': row['count']}
+        for row in load_stats(conn, 'category')
+    ]
     
     conn.close()
     
     return render_template('dashboard.html',
                          recent_analyses=recent_analyses,
-                         total_analyses=total_analyses,
-                         total_objects=total_objects,
+                         total_analyses=totals['analyses'],
+                         total_objects=totals['objects'],
                          categories=categories)
 
 # app.py - Add these routes after the dashboard route
@@ -164,9 +1276,7 @@ def analysis_setup(analysis_id):
     conn = get_db_connection()
     
     # Get analysis details
-    analysis = conn.execute(
-        'SELECT * FROM analysis WHERE id = ?', (analysis_id,)
-    ).fetchone()
+    analysis = load_analysis(conn, analysis_id)
     
     if not analysis:
         flash('Analysis not found!', 'error')
@@ -218,6 +1328,7 @@ def add_field(analysis_id):
         ''', (analysis_id, field_name, field_type, field_unit, is_required, max_order + 1))
         
         field_id = cursor.lastrowid
+        bump_analysis_version(conn, analysis_id)
         conn.commit()
         conn.close()
         
@@ -240,6 +1351,7 @@ def delete_field(analysis_id, field_id):
         conn.execute('DELETE FROM object_values WHERE field_id = ?', (field_id,))
         conn.execute('DELETE FROM fields WHERE id = ? AND analysis_id = ?', (field_id, analysis_id))
         
+        bump_analysis_version(conn, analysis_id)
         conn.commit()
         conn.close()
         
@@ -262,6 +1374,7 @@ def reorder_fields(analysis_id):
                 (index, field_id, analysis_id)
             )
         
+        bump_analysis_version(conn, analysis_id)
         conn.commit()
         conn.close()
         
@@ -271,53 +1384,99 @@ def reorder_fields(analysis_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/analysis/<int:analysis_id>')
+@versioned_response
 def view_analysis(analysis_id):
     """View analysis with objects and comparison table"""
     conn = get_db_connection()
     
     # Get analysis details
-    analysis = conn.execute(
-        'SELECT * FROM analysis WHERE id = ?', (analysis_id,)
-    ).fetchone()
+    analysis = load_analysis(conn, analysis_id)
     
     if not analysis:
         flash('Analysis not found!', 'error')
         return redirect(url_for('dashboard'))
     
-    # Get fields
-    fields = conn.execute('''
-        SELECT * FROM fields 
-        WHERE analysis_id = ? 
-        ORDER BY display_order ASC
-    ''', (analysis_id,)).fetchall()
+    # Get fields and the first page of objects; the rest is loaded
+    # incrementally through the objects API
+    fields = load_fields(conn, analysis_id)
+    try:
+        filters = parse_object_filters(request.args, fields)
+    except ValueError as e:
+        flash(str(e), 'error')
+        filters = []
     
-    # Get objects with their values
-    objects = conn.execute('''
-        SELECT * FROM objects 
-        WHERE analysis_id = ? 
-        ORDER BY created_at DESC
-    ''', (analysis_id,)).fetchall()
+    page, next_cursor = load_objects_page(conn, analysis_id, fields, filters=filters)
     
-    # Get all field values for objects
-    object_values = {}
-    for obj in objects:
-        values = conn.execute('''
-            SELECT f.id as field_id, f.field_name, ov.field_value
-            FROM fields f
-            LEFT JOIN object_values ov ON f.id = ov.field_id AND ov.object_id = ?
-            WHERE f.analysis_id = ?
-            ORDER BY f.display_order ASC
-        ''', (obj['id'], analysis_id)).fetchall()
-        
-        object_values[obj['id']] = {v['field_id']: v['field_value'] for v in values}
+    # Summary statistics over all objects, and which cells of the page hold a field's best value
+    stats = load_field_stats(conn, analysis_id)
+    field_summaries = {field['id']: field_stats_to_dict(field, stats[field['id']])
+                       for field in page.fields if field['id'] in stats}
+    best_cells = {(obj['id'], field['id']) for obj in page.objects for field in page.fields
+                  if field['id'] in stats
+                  and is_best_value(field, page.values.get(obj['id'], {}).get(field['id']), stats[field['id']])}
     
     conn.close()
     
     return render_template('analysis_view.html',
                          analysis=analysis,
-                         fields=fields,
-                         objects=objects,
-                         object_values=object_values)
+                         fields=page.fields,
+                         objects=page.objects,
+                         object_values=page.values,
+                         next_cursor=next_cursor,
+                         page_size=OBJECTS_PAGE_SIZE,
+                         skyline_field_types=SKYLINE_FIELD_TYPES,
+                         field_summaries=field_summaries,
+                         best_cells=best_cells)
+
+@app.route('/api/analysis/<int:analysis_id>/objects')
+@versioned_response
+def api_analysis_objects(analysis_id):
+    """Keyset-paginated objects of an analysis with server-side sort and filters"""
+    conn = get_db_connection()
+    
+    try:
+        analysis = load_analysis(conn, analysis_id)
+        
+        if not analysis:
+            return jsonify({'success': False, 'error': 'Analysis not found'}), 404
+        
+        fields = load_fields(conn, analysis_id)
+        
+        try:
+            limit = int(request.args.get('limit', OBJECTS_PAGE_SIZE))
+            filters = parse_object_filters(request.args, fields)
+            page, next_cursor = load_objects_page(
+                conn, analysis_id, fields,
+                sort=request.args.get('sort', 'created_at'),
+                order=request.args.get('order', 'desc'),
+                filters=filters,
+                cursor=request.args.get('cursor'),
+                limit=limit
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        objects = [
+            {
+                'id': obj['id'],
+                'object_name': obj['object_name'],
+                'brand': obj['brand'],
+                'image_url': obj['image_url'],
+                'created_at': obj['created_at'],
+                'values': {str(field_id): value for field_id, value in page.values[obj['id']].items()}
+            }
+            for obj in page.objects
+        ]
+        
+        return jsonify({
+            'success': True,
+            'objects': objects,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
+    
+    finally:
+        conn.close()
 
 @app.route('/analysis/<int:analysis_id>/objects/new', methods=['GET', 'POST'])
 def new_object(analysis_id):
@@ -325,9 +1484,7 @@ def new_object(analysis_id):
     conn = get_db_connection()
     
     # Get analysis details
-    analysis = conn.execute(
-        'SELECT * FROM analysis WHERE id = ?', (analysis_id,)
-    ).fetchone()
+    analysis = load_analysis(conn, analysis_id)
     
     if not analysis:
         flash('Analysis not found!', 'error')
@@ -368,12 +1525,11 @@ def new_object(analysis_id):
                 field_value = request.form.get(f'field_{field["id"]}', '').strip()
                 
                 if field_value or field['is_required']:
-                    conn.execute('''
-                        INSERT INTO object_values (object_id, field_id, field_value)
-                        VALUES (?, ?, ?)
-                    ''', (object_id, field['id'], field_value))
+                    conn.execute(INSERT_OBJECT_VALUE_SQL,
+                                 object_value_params(object_id, field, field_value))
             
-            conn.commit()
+            commit_object_write(conn, analysis_id, object_id)
+            record_duplicate_candidates(conn, analysis_id, object_id)
             conn.close()
             
             flash(f'Object "{object_name}" added successfully!', 'success')
@@ -426,12 +1582,11 @@ def create_object(analysis_id):
             field_value = request.form.get(f'field_{field["id"]}', '').strip()
             
             if field_value or field['is_required']:
-                conn.execute('''
-                    INSERT INTO object_values (object_id, field_id, field_value)
-                    VALUES (?, ?, ?)
-                ''', (object_id, field['id'], field_value))
+                conn.execute(INSERT_OBJECT_VALUE_SQL,
+                             object_value_params(object_id, field, field_value))
         
-        conn.commit()
+        commit_object_write(conn, analysis_id, object_id)
+        record_duplicate_candidates(conn, analysis_id, object_id)
         conn.close()
         
         flash(f'Object "{object_name}" added successfully!', 'success')
@@ -450,40 +1605,25 @@ def edit_object(analysis_id, object_id):
     conn = get_db_connection()
     
     # Get analysis and object details
-    analysis = conn.execute(
-        'SELECT * FROM analysis WHERE id = ?', (analysis_id,)
-    ).fetchone()
+    analysis = load_analysis(conn, analysis_id)
     
     if not analysis:
         flash('Analysis not found!', 'error')
         return redirect(url_for('dashboard'))
     
-    object_data = conn.execute(
-        'SELECT * FROM objects WHERE id = ? AND analysis_id = ?', 
-        (object_id, analysis_id)
-    ).fetchone()
+    # Get object, fields and values
+    matrix = load_comparison_matrix(conn, analysis_id, object_id=object_id)
     
-    if not object_data:
+    if not matrix.objects:
         flash('Object not found!', 'error')
         return redirect(url_for('view_analysis', analysis_id=analysis_id))
     
-    # Get fields and values
-    fields = conn.execute('''
-        SELECT * FROM fields 
-        WHERE analysis_id = ? 
-        ORDER BY display_order ASC
-    ''', (analysis_id,)).fetchall()
+    object_data = matrix.objects[0]
+    fields = matrix.fields
     
     object_values = {}
     if request.method == 'GET':
-        values = conn.execute('''
-            SELECT field_id, field_value 
-            FROM object_values 
-            WHERE object_id = ?
-        ''', (object_id,)).fetchall()
-        
-        for value in values:
-            object_values[value['field_id']] = value['field_value']
+        object_values = matrix.values[object_id]
     
     # Handle POST request (form submission)
     if request.method == 'POST':
@@ -502,25 +1642,16 @@ def edit_object(analysis_id, object_id):
                                      object_values=object_values,
                                      mode='edit')
             
-            # Update object
-            conn.execute('''
-                UPDATE objects 
-                SET object_name = ?, brand = ?, image_url = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ? AND analysis_id = ?
-            ''', (object_name, brand, image_url, object_id, analysis_id))
-            
-            # Delete and recreate field values
-            conn.execute('DELETE FROM object_values WHERE object_id = ?', (object_id,))
-            
-            for field in fields:
-                field_value = request.form.get(f'field_{field["id"]}', '').strip()
-                if field_value:
-                    conn.execute('''
-                        INSERT INTO object_values (object_id, field_id, field_value)
-                        VALUES (?, ?, ?)
-                    ''', (object_id, field['id'], field_value))
+            # Write only what differs from the stored object and values
+            changed_columns = update_object_columns(conn, object_id, {
+                'object_name': object_name, 'brand': brand, 'image_url': image_url
+            })
+            changed_fields = save_object_values(conn, object_id, fields,
+                                                submitted_field_values(request.form, fields))
             
-            conn.commit()
+            commit_object_write(conn, analysis_id, object_id, changed_columns or changed_fields)
+            if set(changed_columns) & set(DUPLICATE_COLUMNS):
+                record_duplicate_candidates(conn, analysis_id, object_id)
             conn.close()
             
             flash(f'Object "{object_name}" updated successfully!', 'success')
@@ -553,32 +1684,25 @@ def update_object(analysis_id, object_id):
         
         conn = get_db_connection()
         
-        # Update object
-        conn.execute('''
-            UPDATE objects 
-            SET object_name = ?, brand = ?, image_url = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ? AND analysis_id = ?
-        ''', (object_name, brand, image_url, object_id, analysis_id))
-        
-        # Delete existing field values
-        conn.execute('DELETE FROM object_values WHERE object_id = ?', (object_id,))
-        
-        # Get fields for this analysis
-        fields = conn.execute(
-            'SELECT * FROM fields WHERE analysis_id = ?', (analysis_id,)
-        ).fetchall()
+        exists = conn.execute(
+            'SELECT 1 FROM objects WHERE id = ? AND analysis_id = ?', (object_id, analysis_id)
+        ).fetchone()
+        if not exists:
+            conn.close()
+            flash('Object not found!', 'error')
+            return redirect(url_for('view_analysis', analysis_id=analysis_id))
         
-        # Save new field values
-        for field in fields:
-            field_value = request.form.get(f'field_{field["id"]}', '').strip()
-            
-            if field_value:
-                conn.execute('''
-                    INSERT INTO object_values (object_id, field_id, field_value)
-                    VALUES (?, ?, ?)
-                ''', (object_id, field['id'], field_value))
+        # Write only what differs from the stored object and values
+        fields = load_fields(conn, analysis_id)
+        changed_columns = update_object_columns(conn, object_id, {
+            'object_name': object_name, 'brand': brand, 'image_url': image_url
+        })
+        changed_fields = save_object_values(conn, object_id, fields,
+                                            submitted_field_values(request.form, fields))
         
-        conn.commit()
+        commit_object_write(conn, analysis_id, object_id, changed_columns or changed_fields)
+        if set(changed_columns) & set(DUPLICATE_COLUMNS):
+            record_duplicate_candidates(conn, analysis_id, object_id)
         conn.close()
         
         flash(f'Object "{object_name}" updated successfully!', 'success')
@@ -588,6 +1712,70 @@ def update_object(analysis_id, object_id):
         flash(f'Error updating object: {str(e)}', 'error')
         return redirect(url_for('edit_object', analysis_id=analysis_id, object_id=object_id))
 
+@app.route('/analysis/<int:analysis_id>/objects/<int:object_id>', methods=['PATCH'])
+def patch_object(analysis_id, object_id):
+    """Update individual cells of an object from a JSON body
+
+    Keys are object columns (object_name, brand, image_url) or field_<id>
+    as in the object form, so an inline edit sends just the one cell.
+    Field values are validated like imports; an empty value clears the cell.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
+        return jsonify({'success': False, 'error': 'Expected a JSON object of cells to update'}), 400
+    
+    try:
+        conn = get_db_connection()
+        
+        exists = conn.execute(
+            'SELECT 1 FROM objects WHERE id = ? AND analysis_id = ?', (object_id, analysis_id)
+        ).fetchone()
+        if not exists:
+            conn.close()
+            return jsonify({'success': False, 'error': 'Object not found'}), 404
+        
+        fields = {f'field_{field["id"]}': field for field in load_fields(conn, analysis_id)}
+        columns, submitted, errors = {}, {}, {}
+        for key, value in data.items():
+            if key in OBJECT_EDIT_COLUMNS:
+                columns[key] = str(value if value is not None else '').strip()
+                if key == 'object_name' and not columns[key]:
+                    errors[key] = 'Object name is required'
+            elif key in fields:
+                field = fields[key]
+                try:
+                    submitted[field['id']] = normalize_field_value(field['field_type'], value)
+                except ValueError as e:
+                    errors[key] = str(e)
+                    continue
+                if field['is_required'] and not submitted[field['id']]:
+                    errors[key] = f'{field["field_name"]} is required'
+            else:
+                errors[key] = 'Unknown cell'
+        
+        if errors:
+            conn.close()
+            return jsonify({'success': False, 'error': 'Invalid cells', 'errors': errors}), 400
+        
+        changed_columns = update_object_columns(conn, object_id, columns)
+        changed_fields = save_object_values(conn, object_id, fields.values(), submitted)
+        
+        commit_object_write(conn, analysis_id, object_id, changed_columns or changed_fields)
+        if set(changed_columns) & set(DUPLICATE_COLUMNS):
+            record_duplicate_candidates(conn, analysis_id, object_id)
+        version = get_analysis_version(conn, analysis_id)
+        conn.close()
+        
+        return jsonify({
+            'success': True,
+            'changed': changed_columns + [f'field_{field_id}' for field_id in changed_fields],
+            'values': {**columns, **{f'field_{field_id}': value for field_id, value in submitted.items()}},
+            'version': version
+        })
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/analysis/<int:analysis_id>/objects/<int:object_id>', methods=['DELETE'])
 def delete_object(analysis_id, object_id):
     """Delete object"""
@@ -610,7 +1798,7 @@ def delete_object(analysis_id, object_id):
         conn.execute('DELETE FROM objects WHERE id = ? AND analysis_id = ?', 
                     (object_id, analysis_id))
         
-        conn.commit()
+        commit_object_write(conn, analysis_id, object_id)
         conn.close()
         
         return jsonify({
@@ -621,217 +1809,1480 @@ def delete_object(analysis_id, object_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/analysis/<int:analysis_id>/export')
-def export_analysis(analysis_id):
-    """Export analysis data in multiple formats"""
-    format_type = request.args.get('format', 'csv')
+# Weighted scoring. A score profile gives some scorable fields of an
+# analysis a weight and a direction; objects are ranked by the weighted mean
+# of their normalized values. Score tables are cached per process by
+# (analysis, profile) together with the versions they reflect
+SCORABLE_FIELD_TYPES = NUMERIC_FIELD_TYPES + ('boolean', 'date')
+
+# Default and maximum number of objects a ranking returns
+RANKING_SIZE = 10
+MAX_RANKING_SIZE = 500
+
+score_cache = ScoreCache(int(os.environ.get('SCORE_CACHE_ENTRIES', '64')))
+
+def score_value(value_num, value_date):
+    """Number a typed object value is scored by; dates count days"""
+    if value_num is not None:
+        return value_num
+    if value_date is not None:
+        return float(date.fromisoformat(value_date).toordinal())
+    return MISSING
+
+def load_score_profile(conn, analysis_id, profile_id):
+    """A score profile of an analysis and its weights in field display order, or (None, [])"""
+    profile = conn.execute(
+        'SELECT * FROM score_profiles WHERE id = ? AND analysis_id = ?', (profile_id, analysis_id)
+    ).fetchone()
+    if profile is None:
+        return None, []
     
-    conn = get_db_connection()
+    weights = conn.execute('''
+        SELECT w.field_id, w.weight, w.direction, f.field_name, f.field_type, f.field_unit
+        FROM score_weights w
+        JOIN fields f ON f.id = w.field_id
+        WHERE w.profile_id = ?
+        ORDER BY f.display_order, f.id
+    ''', (profile_id,)).fetchall()
+    return profile, weights
+
+def score_profile_to_dict(profile, weights):
+    """JSON representation of a score profile"""
+    return {
+        'id': profile['id'],
+        'name': profile['name'],
+        'normalization': profile['normalization'],
+        'version': profile['version'],
+        'updated_at': profile['updated_at'],
+        'weights': [
+            {
+                'field_id': weight['field_id'],
+                'field_name': weight['field_name'],
+                'weight': weight['weight'],
+                'direction': weight['direction']
+            }
+            for weight in weights
+        ]
+    }
+
+def parse_score_profile(data, fields):
+    """Validate a score profile JSON body into (name, normalization, weights)
+
+    `weights` is a list of {field_id, weight, direction} over scorable
+    fields of the analysis, each weight a positive number. Raises ValueError.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object')
     
-    # Get analysis details
-    analysis = conn.execute(
-        'SELECT * FROM analysis WHERE id = ?', (analysis_id,)
-    ).fetchone()
+    name = str(data.get('name') or '').strip()
+    if not name:
+        raise ValueError('Profile name is required')
     
-    if not analysis:
-        return jsonify({'error': 'Analysis not found'}), 404
+    normalization = data.get('normalization', 'minmax')
+    if normalization not in NORMALIZATIONS:
+        raise ValueError(f'Normalization must be one of {", ".join(NORMALIZATIONS)}')
     
-    # Get fields and objects
-    fields = conn.execute('''
-        SELECT * FROM fields 
-        WHERE analysis_id = ? 
-        ORDER BY display_order ASC
-    ''', (analysis_id,)).fetchall()
+    fields_by_id = {field['id']: field for field in fields}
+    weights, seen = [], set()
+    for entry in data.get('weights') or []:
+        if not isinstance(entry, dict):
+            raise ValueError('Each weight must be an object with field_id, weight and direction')
+        field = fields_by_id.get(entry.get('field_id'))
+        if field is None:
+            raise ValueError(f'Unknown field {entry.get("field_id")!r}')
+        if field['field_type'] not in SCORABLE_FIELD_TYPES:
+            raise ValueError(f'{field["field_name"]} is a {FIELD_TYPES[field["field_type"]].lower()} field and cannot be scored')
+        if field['id'] in seen:
+            raise ValueError(f'{field["field_name"]} is weighted twice')
+        seen.add(field['id'])
+        
+        try:
+            weight = float(entry.get('weight', 1))
+        except (TypeError, ValueError):
+            weight = math.nan
+        if not (math.isfinite(weight) and weight > 0):
+            raise ValueError(f'Weight of {field["field_name"]} must be a positive number')
+        
+        direction = entry.get('direction', 'higher')
+        if direction not in DIRECTIONS:
+            raise ValueError(f'Direction of {field["field_name"]} must be one of {", ".join(DIRECTIONS)}')
+        weights.append({'field_id': field['id'], 'weight': weight, 'direction': direction})
     
-    objects = conn.execute('''
-        SELECT o.*, GROUP_CONCAT(f.field_name || ':' || ov.field_value, '|') as values
-        FROM objects o
-        LEFT JOIN object_values ov ON o.id = ov.object_id
-        LEFT JOIN fields f ON ov.field_id = f.id
-        WHERE o.analysis_id = ?
-        GROUP BY o.id
-        ORDER BY o.created_at DESC
-    ''', (analysis_id,)).fetchall()
+    if not weights:
+        raise ValueError('Weight at least one field')
+    return name, normalization, weights
+
+def save_score_weights(conn, profile_id, weights):
+    """Replace the weights of a score profile"""
+    conn.execute('DELETE FROM score_weights WHERE profile_id = ?', (profile_id,))
+    conn.executemany('''
+        INSERT INTO score_weights (profile_id, field_id, weight, direction) VALUES (?, ?, ?, ?)
+    ''', [(profile_id, weight['field_id'], weight['weight'], weight['direction']) for weight in weights])
+
+def load_value_columns(conn, analysis_id, field_ids):
+    """Typed values of some fields as columns over the objects of an analysis
+
+    Returns (object_ids in id order, {field_id: array of score_value()s}),
+    MISSING where an object has no value. Each field is read in one pass.
+    """
+    object_ids = [row[0] for row in conn.execute(
+        'SELECT id FROM objects WHERE analysis_id = ? ORDER BY id', (analysis_id,)
+    )]
+    rows = {object_id: row for row, object_id in enumerate(object_ids)}
+    columns = {field_id: array('d', [MISSING]) * len(object_ids) for field_id in field_ids}
     
-    conn.close()
+    # Served by the (field_id, value_num) and (field_id, value_date) indexes
+    for object_id, field_id, value_num, value_date in conn.execute(f'''
+        SELECT object_id, field_id, value_num, value_date FROM object_values
+        WHERE field_id IN ({','.join('?' * len(columns))})
+    ''', list(columns)):
+        row = rows.get(object_id)
+        if row is not None:
+            columns[field_id][row] = score_value(value_num, value_date)
     
-    if format_type == 'json':
-        return export_to_json(analysis, fields, objects)
-    elif format_type == 'csv':
-        return export_to_csv(analysis, fields, objects)
-    else:
-        return jsonify({'error': 'Unsupported format'}), 400
+    return object_ids, columns
+
+def build_score_table(conn, analysis_id, profile, weights, version):
+    """Score every object of an analysis under a profile"""
+    object_ids, columns = load_value_columns(conn, analysis_id, [weight['field_id'] for weight in weights])
+    return ScoreTable(object_ids,
+                      [ScoreColumn(weight['field_id'], weight['weight'], weight['direction'],
+                                   columns[weight['field_id']]) for weight in weights],
+                      profile['normalization'], version, profile['version'])
+
+def get_score_table(conn, analysis_id, profile, weights):
+    """The score table of a profile for the current analysis version, built on a cache miss"""
+    # Read the version and the values from one snapshot
+    conn.execute('BEGIN')
+    try:
+        version = get_analysis_version(conn, analysis_id)
+        table = score_cache.get(analysis_id, profile['id'], version, profile['version'])
+        if table is None:
+            table = build_score_table(conn, analysis_id, profile, weights, version)
+            score_cache.put(analysis_id, profile['id'], table)
+    finally:
+        conn.commit()
+    return table
 
-def export_to_csv(analysis, fields, objects):
-    """Export analysis to CSV format"""
-    import csv
-    import io
-    from flask import make_response
+def commit_object_write(conn, analysis_id, object_id, changed=True):
+    """Commit a write of one object, bumping the analysis version if anything `changed`
+
+    Score tables, the field summary, similarity indexes and the duplicate
+    index this process has cached for the analysis are carried over to the
+    new version by applying just that object's name and values (none once
+    it is deleted) rather than rebuilt.
+    """
+    if not changed:
+        conn.commit()
+        return
     
-    output = io.StringIO()
-    writer = csv.writer(output)
+    bump_analysis_version(conn, analysis_id)
+    tables = score_cache.tables_for(analysis_id)
+    summary = summary_cache.peek(analysis_id)
+    indexes = similarity_cache.indexes_for(analysis_id)
+    dedup = dedup_cache.peek(analysis_id)
+    name = brand = values = None
+    if tables or summary or indexes or dedup is not None:
+        version = get_analysis_version(conn, analysis_id)
+        row = conn.execute('SELECT object_name, brand FROM objects WHERE id = ?', (object_id,)).fetchone()
+        if row:
+            name, brand = row
+            values = {field_id: score_value(value_num, value_date)
+                      for field_id, value_num, value_date in conn.execute(
+                          'SELECT field_id, value_num, value_date FROM object_values WHERE object_id = ?',
+                          (object_id,))}
+    conn.commit()
     
-    # Write header
-    header = ['Object Name', 'Brand', 'Image URL', 'Created Date']
-    header.extend([field['field_name'] for field in fields])
-    writer.writerow(header)
+    if values is not None:
+        for table in tables:
+            table.update_object(object_id, values, version)
+    if summary:
+        summary.apply_object(object_id, values, version)
+    for index in indexes:
+        index.apply_object(analysis_id, object_id, values, version)
+    if dedup is not None:
+        dedup.apply_object(object_id, name, brand, version)
+
+@app.route('/api/analysis/<int:analysis_id>/score-profiles')
+def list_score_profiles(analysis_id):
+    """Saved score profiles of an analysis"""
+    conn = get_db_connection()
     
-    # Write data rows
-    for obj in objects:
-        row = [obj['object_name'], obj['brand'] or '', obj['image_url'] or '', obj['created_at']]
+    if not load_analysis(conn, analysis_id):
+        conn.close()
+        return jsonify({'success': False, 'error': 'Analysis not found'}), 404
+    
+    profiles = []
+    for row in conn.execute('SELECT id FROM score_profiles WHERE analysis_id = ? ORDER BY id', (analysis_id,)).fetchall():
+        profiles.append(score_profile_to_dict(*load_score_profile(conn, analysis_id, row['id'])))
+    conn.close()
+    
+    return jsonify({'success': True, 'profiles': profiles})
+
+@app.route('/api/analysis/<int:analysis_id>/score-profiles', methods=['POST'])
+def create_score_profile(analysis_id):
+    """Save a new score profile from a JSON body of name, normalization and weights"""
+    try:
+        conn = get_db_connection()
         
-        # Parse field values
-        values_dict = {}
-        if obj['values']:
-            for value_pair in obj['values'].split('|'):
-                if ':' in value_pair:
-                    field_name, field_value = value_pair.split(':', 1)
-                    values_dict[field_name] = field_value
+        if not load_analysis(conn, analysis_id):
+            conn.close()
+            return jsonify({'success': False, 'error': 'Analysis not found'}), 404
         
-        # Add field values in correct order
-        for field in fields:
-            row.append(values_dict.get(field['field_name'], ''))
+        try:
+            name, normalization, weights = parse_score_profile(request.get_json(silent=True),
+                                                               load_fields(conn, analysis_id))
+        except ValueError as e:
+            conn.close()
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        writer.writerow(row)
+        profile_id = conn.execute('''
+            INSERT INTO score_profiles (analysis_id, name, normalization) VALUES (?, ?, ?)
+        ''', (analysis_id, name, normalization)).lastrowid
+        save_score_weights(conn, profile_id, weights)
+        conn.commit()
+        
+        profile = score_profile_to_dict(*load_score_profile(conn, analysis_id, profile_id))
+        conn.close()
+        
+        return jsonify({'success': True, 'profile': profile})
     
-    output.seek(0)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/analysis/<int:analysis_id>/score-profiles/<int:profile_id>', methods=['PUT'])
+def update_score_profile(analysis_id, profile_id):
+    """Replace the name, normalization and weights of a score profile"""
+    try:
+        conn = get_db_connection()
+        
+        profile, _ = load_score_profile(conn, analysis_id, profile_id)
+        if profile is None:
+            conn.close()
+            return jsonify({'success': False, 'error': 'Score profile not found'}), 404
+        
+        try:
+            name, normalization, weights = parse_score_profile(request.get_json(silent=True),
+                                                               load_fields(conn, analysis_id))
+        except ValueError as e:
+            conn.close()
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        conn.execute('''
+            UPDATE score_profiles
+            SET name = ?, normalization = ?, version = version + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (name, normalization, profile_id))
+        save_score_weights(conn, profile_id, weights)
+        conn.commit()
+        
+        profile = score_profile_to_dict(*load_score_profile(conn, analysis_id, profile_id))
+        conn.close()
+        
+        return jsonify({'success': True, 'profile': profile})
     
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = f'attachment; filename="{analysis["name"]}_comparison.csv"'
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/analysis/<int:analysis_id>/score-profiles/<int:profile_id>', methods=['DELETE'])
+def delete_score_profile(analysis_id, profile_id):
+    """Delete a score profile"""
+    try:
+        conn = get_db_connection()
+        
+        deleted = conn.execute(
+            'DELETE FROM score_profiles WHERE id = ? AND analysis_id = ?', (profile_id, analysis_id)
+        ).rowcount
+        conn.commit()
+        conn.close()
+        
+        if not deleted:
+            return jsonify({'success': False, 'error': 'Score profile not found'}), 404
+        return jsonify({'success': True, 'message': 'Score profile deleted'})
     
-    return response
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-def export_to_json(analysis, fields, objects):
-    """Export analysis to JSON format"""
-    from flask import jsonify
+@app.route('/api/analysis/<int:analysis_id>/score-profiles/<int:profile_id>/ranking')
+def score_ranking(analysis_id, profile_id):
+    """Top `k` objects of an analysis under a score profile, with each weighted field's share
+
+    With `object_id` the rank and score of that object are included too.
+    """
+    conn = get_db_connection()
     
-    # Build structured data
-    export_data = {
-        'analysis': {
-            'id': analysis['id'],
-            'name': analysis['name'],
-            'description': analysis['description'],
-            'category': analysis['category'],
-            'created_at': analysis['created_at'],
-            'updated_at': analysis['updated_at']
-        },
-        'fields': [
+    try:
+        if not load_analysis(conn, analysis_id):
+            return jsonify({'success': False, 'error': 'Analysis not found'}), 404
+        
+        profile, weights = load_score_profile(conn, analysis_id, profile_id)
+        if profile is None:
+            return jsonify({'success': False, 'error': 'Score profile not found'}), 404
+        if not weights:
+            return jsonify({'success': False, 'error': 'The profile has no weighted fields left'}), 409
+        
+        k = min(max(request.args.get('k', RANKING_SIZE, type=int), 1), MAX_RANKING_SIZE)
+        table = get_score_table(conn, analysis_id, profile, weights)
+        top = table.top(k)
+        
+        objects = {row['id']: row for row in conn.execute(f'''
+            SELECT id, object_name, brand, image_url FROM objects
+            WHERE id IN ({','.join('?' * len(top))})
+        ''', [object_id for object_id, _ in top])} if top else {}
+        
+        ranking = [
             {
-                'id': field['id'],
-                'name': field['field_name'],
-                'type': field['field_type'],
-                'unit': field['field_unit'],
-                'required': bool(field['is_required']),
-                'order': field['display_order']
+                'rank': rank,
+                'object_id': object_id,
+                'object_name': objects[object_id]['object_name'] if object_id in objects else None,
+                'brand': objects[object_id]['brand'] if object_id in objects else None,
+                'score': round(score, 6),
+                'contributions': {str(field_id): None if share is None else round(share, 6)
+                                  for field_id, share in table.contributions(object_id).items()}
             }
-            for field in fields
-        ],
-        'objects': []
-    }
-    
-    # Add objects data
-    for obj in objects:
-        obj_data = {
-            'id': obj['id'],
-            'name': obj['object_name'],
-            'brand': obj['brand'],
-            'image_url': obj['image_url'],
-            'created_at': obj['created_at'],
-            'field_values': {}
+            for rank, (object_id, score) in enumerate(top, start=1)
+        ]
+        
+        result = {
+            'success': True,
+            'profile': score_profile_to_dict(profile, weights),
+            'version': table.version,
+            'total_objects': len(table.object_ids),
+            'ranking': ranking
         }
         
-        # Parse field values
-        if obj['values']:
-            for value_pair in obj['values'].split('|'):
-                if ':' in value_pair:
-                    field_name, field_value = value_pair.split(':', 1)
-                    obj_data['field_values'][field_name] = field_value
+        object_id = request.args.get('object_id', type=int)
+        if object_id is not None:
+            position = table.rank(object_id)
+            if position is None:
+                return jsonify({'success': False, 'error': 'Object not found'}), 404
+            result['object'] = {'object_id': object_id, 'rank': position[0], 'score': round(position[1], 6)}
         
-        export_data['objects'].append(obj_data)
-    
-    response = jsonify(export_data)
-    response.headers['Content-Disposition'] = f'attachment; filename="{analysis["name"]}_comparison.json"'
+        return jsonify(result)
     
-    return response
+    finally:
+        conn.close()
 
-@app.route('/search')
-def search():
-    """Global search across all analyses"""
-    query = request.args.get('q', '').strip()
+# Field types the Pareto skyline can be taken over
+SKYLINE_FIELD_TYPES = NUMERIC_FIELD_TYPES
+
+def parse_skyline_fields(args, fields):
+    """The (field, lower_is_better) criteria of a skyline request
+
+    `fields` lists field ids, comma-separated, and defaults to every
+    numeric field. `lower` lists those where smaller is better and defaults
+    to the price fields. Raises ValueError.
+    """
+    numeric = {str(field['id']): field for field in fields if field['field_type'] in SKYLINE_FIELD_TYPES}
     
-    if not query:
-        return jsonify({'results': []})
+    requested = [part for part in args.get('fields', '').split(',') if part.strip()]
+    for part in requested:
+        if part.strip() not in numeric:
+            raise ValueError(f'Field "{part}" is not a numeric field of this analysis')
+    chosen = [numeric[part.strip()] for part in dict.fromkeys(requested)] or list(numeric.values())
+    if not chosen:
+        raise ValueError('This analysis has no numeric fields')
     
+    if 'lower' in args:
+        lower = {part.strip() for part in args['lower'].split(',') if part.strip()}
+    else:
+        lower = {str(field['id']) for field in chosen if field['field_type'] == 'price'}
+    return [(field, str(field['id']) in lower) for field in chosen]
+
+@app.route('/api/analysis/<int:analysis_id>/skyline')
+@versioned_response
+def analysis_skyline(analysis_id):
+    """Objects of an analysis that no other object beats on every chosen numeric field
+
+    Objects missing a value for any of the fields are left out. Results are
+    cached and ETagged against the analysis version.
+    """
     conn = get_db_connection()
     
-    # Search analyses
-    analyses = conn.execute('''
-        SELECT id, name, description, category, created_at
-        FROM analysis 
-        WHERE name LIKE ? OR description LIKE ? OR category LIKE ?
-        ORDER BY updated_at DESC
-        LIMIT 10
-    ''', (f'%{query}%', f'%{query}%', f'%{query}%')).fetchall()
-    
-    # Search objects
-    objects = conn.execute('''
-        SELECT o.id, o.object_name, o.brand, a.id as analysis_id, a.name as analysis_name
-        FROM objects o
-        JOIN analysis a ON o.analysis_id = a.id
-        WHERE o.object_name LIKE ? OR o.brand LIKE ?
-        ORDER BY o.created_at DESC
-        LIMIT 10
-    ''', (f'%{query}%', f'%{query}%')).fetchall()
-    
-    conn.close()
-    
-    results = {
-        'analyses': [dict(analysis) for analysis in analyses],
-        'objects': [dict(obj) for obj in objects]
-    }
+    try:
+        if not load_analysis(conn, analysis_id):
+            return jsonify({'success': False, 'error': 'Analysis not found'}), 404
+        
+        try:
+            criteria = parse_skyline_fields(request.args, load_fields(conn, analysis_id))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        object_ids, columns = load_value_columns(conn, analysis_id, [field['id'] for field, _ in criteria])
+        
+        # Orient every criterion so that larger is better
+        candidates, points = [], []
+        for row, object_id in enumerate(object_ids):
+            point = tuple(-columns[field['id']][row] if lower else columns[field['id']][row]
+                          for field, lower in criteria)
+            if all(value == value for value in point):
+                candidates.append(object_id)
+                points.append(point)
+        
+        members = sorted(candidates[index] for index in skyline(points))
+        
+        return jsonify({
+            'success': True,
+            'fields': [
+                {'id': field['id'], 'field_name': field['field_name'],
+                 'direction': 'lower' if lower else 'higher'}
+                for field, lower in criteria
+            ],
+            'object_ids': members,
+            'considered': len(candidates),
+            'excluded': len(object_ids) - len(candidates)
+        })
     
-    return jsonify(results)
+    finally:
+        conn.close()
 
-@app.route('/admin')
-def admin_dashboard():
-    """Admin dashboard with system statistics"""
-    conn = get_db_connection()
-    
+# Per-field summary statistics. The typed values of each summarized field
+# are kept per process by analysis, together with the version they reflect,
+# and carried over object writes by commit_object_write()
+SUMMARY_FIELD_TYPES = NUMERIC_FIELD_TYPES + ('boolean', 'date')
+
+summary_cache = SummaryCache(int(os.environ.get('FIELD_SUMMARY_CACHE_ENTRIES', '256')))
+
+def build_field_summary(conn, analysis_id, fields, version):
+    """Summary of the typed values of an analysis's summarized fields"""
+    field_ids = [field['id'] for field in fields if field['field_type'] in SUMMARY_FIELD_TYPES]
+    object_ids, columns = load_value_columns(conn, analysis_id, field_ids)
+    return AnalysisSummary(object_ids, {
+        field_id: {object_ids[row]: value for row, value in enumerate(column) if value == value}
+        for field_id, column in columns.items()
+    }, version)
+
+def load_field_stats(conn, analysis_id):
+    """{field_id: stats} of the summarized fields of an analysis, built on a cache miss
+
+    The best value of a price is its lowest, of any other field its highest.
+    """
+    # Read the version, the fields and the values from one snapshot
+    conn.execute('BEGIN')
+    try:
+        version = get_analysis_version(conn, analysis_id)
+        fields = load_fields(conn, analysis_id)
+        summary = summary_cache.get(analysis_id, version)
+        if summary is None:
+            summary = build_field_summary(conn, analysis_id, fields, version)
+            summary_cache.put(analysis_id, summary)
+    finally:
+        conn.commit()
+    return summary.stats(lower_is_better={field['id'] for field in fields if field['field_type'] == 'price'})
+
+def format_summary_value(field_type, value):
+    """Display text of a summary statistic in the units of its field"""
+    if value is None:
+        return '-'
+    if field_type == 'date':
+        return date.fromordinal(round(value)).isoformat()
+    if field_type == 'boolean':
+        return 'Yes' if value >= 0.5 else 'No'
+    if field_type == 'price':
+        return f'${value:,.2f}'
+    return f'{value:,.2f}'.rstrip('0').rstrip('.')
+
+def field_stats_to_dict(field, stats):
+    """JSON-ready statistics of one field, with display texts
+
+    Dates are given as ISO dates and their spread in days; the mean of a
+    boolean is its share of Yes. `best` is written as a cell value would
+    be, and is None unless the values differ.
+    """
+    field_type = field['field_type']
+    best = None
+    if stats['count'] and stats['min'] != stats['max']:
+        best = (date.fromordinal(round(stats['best'])).isoformat() if field_type == 'date'
+                else format_summary_value(field_type, stats['best']) if field_type == 'boolean'
+                else stats['best'])
+    
+    result = dict(stats, id=field['id'], field_name=field['field_name'], field_type=field_type,
+                  direction='lower' if field_type == 'price' else 'higher', best=best)
+    if field_type == 'date':
+        for name in ('min', 'max', 'mean', 'median'):
+            result[name] = format_summary_value(field_type, stats[name]) if stats['count'] else None
+    
+    if field_type == 'boolean':
+        mean = f"{stats['mean']:.0%} Yes" if stats['count'] else '-'
+        spread = f"{stats['spread']:.2f}" if stats['count'] else '-'
+    elif field_type == 'date':
+        mean = format_summary_value(field_type, stats['mean'])
+        spread = f"{stats['spread']:,.0f} days" if stats['count'] else '-'
+    else:
+        mean = format_summary_value(field_type, stats['mean'])
+        spread = format_summary_value(field_type, stats['spread'])
+    result['display'] = {
+        'range': f"{format_summary_value(field_type, stats['min'])} – {format_summary_value(field_type, stats['max'])}",
+        'mean': mean,
+        'median': format_summary_value(field_type, stats['median']),
+        'spread': spread,
+        'fill': f"{stats['fill_rate']:.0%}"
+    }
+    return result
+
+def is_best_value(field, value, stats):
+    """Whether a raw cell value is its field's best, among values that differ"""
+    if not stats['count'] or stats['min'] == stats['max']:
+        return False
+    return score_value(*parse_typed_value(field['field_type'], value)) == stats['best']
+
+@app.route('/api/analysis/<int:analysis_id>/field-stats')
+@versioned_response
+def analysis_field_stats(analysis_id):
+    """Min, max, mean, median, spread and fill rate of the numeric, boolean and date fields of an analysis"""
+    conn = get_db_connection()
+    
+    try:
+        if not load_analysis(conn, analysis_id):
+            return jsonify({'success': False, 'error': 'Analysis not found'}), 404
+        
+        stats = load_field_stats(conn, analysis_id)
+        fields = [field for field in load_fields(conn, analysis_id) if field['id'] in stats]
+        
+        return jsonify({
+            'success': True,
+            'fields': [field_stats_to_dict(field, stats[field['id']]) for field in fields]
+        })
+    
+    finally:
+        conn.close()
+
+# Similar products. Numeric fields of the analyses of one category are
+# matched into shared features by name, unit and type, and each category
+# gets a k-NN index over its objects, cached per process together with the
+# versions of its analyses and carried over object writes
+SIMILARITY_FIELD_TYPES = NUMERIC_FIELD_TYPES
+
+# Default and maximum number of similar objects returned
+SIMILAR_SIZE = 10
+MAX_SIMILAR_SIZE = 100
+
+similarity_cache = SimilarityCache(int(os.environ.get('SIMILARITY_CACHE_ENTRIES', '8')))
+
+def feature_key(field):
+    """(name, unit, kind) under which fields of different analyses count as the same feature"""
+    def words(text):
+        return ' '.join(re.findall(r'[a-z0-9]+', (text or '').lower()))
+    kind = 'number' if field['field_type'] in ('number', 'decimal') else field['field_type']
+    return words(field['field_name']), words(field['field_unit']), kind
+
+def load_similarity_group(conn, analysis_id):
+    """(group key, {analysis_id: version}) of the analyses compared with an analysis
+
+    These are the live analyses of its category, or just itself when it
+    has none. The key is None if the analysis does not exist.
+    """
+    row = conn.execute(
+        'SELECT lower(trim(category)), version FROM analysis WHERE id = ? AND deleted_at IS NULL', (analysis_id,)
+    ).fetchone()
+    if row is None:
+        return None, {}
+    if not row[0]:
+        return analysis_id, {analysis_id: row[1]}
+    return row[0], dict(conn.execute(
+        'SELECT id, version FROM analysis WHERE lower(trim(category)) = ? AND deleted_at IS NULL', (row[0],)
+    ).fetchall())
+
+def build_similarity_index(conn, versions):
+    """k-NN index over the objects of some analyses that have a value for any matched feature"""
+    analysis_ids = list(versions)
+    fields = conn.execute(f'''
+        SELECT * FROM fields
+        WHERE analysis_id IN ({','.join('?' * len(analysis_ids))})
+        AND field_type IN ({','.join('?' * len(SIMILARITY_FIELD_TYPES))})
+    ''', analysis_ids + list(SIMILARITY_FIELD_TYPES)).fetchall()
+    features = {}
+    field_features = {field['id']: features.setdefault(feature_key(field), len(features)) for field in fields}
+    
+    # One pass over the covering (field_id, value_num, object_id) index per field
+    by_analysis = {}
+    for field in fields:
+        values = dict(conn.execute(
+            'SELECT object_id, value_num FROM object_values WHERE field_id = ? AND value_num IS NOT NULL',
+            (field['id'],)
+        ).fetchall())
+        if values:
+            by_analysis.setdefault(field['analysis_id'], {}).setdefault(field_features[field['id']], {}).update(values)
+    
+    analyses = {}
+    for analysis_id, feature_values in by_analysis.items():
+        object_ids = sorted(set().union(*feature_values.values()))
+        analyses[analysis_id] = (object_ids, {
+            feature: array('d', map(values.get, object_ids, itertools.repeat(MISSING)))
+            for feature, values in feature_values.items()
+        })
+    return SimilarityIndex(analyses, field_features, len(features), versions)
+
+def get_similarity_index(conn, analysis_id):
+    """The similarity index of an analysis's group for the current versions, built on a cache miss"""
+    # Read the versions and the values from one snapshot
+    conn.execute('BEGIN')
+    try:
+        group, versions = load_similarity_group(conn, analysis_id)
+        index = similarity_cache.get(group, versions)
+        if index is None:
+            index = build_similarity_index(conn, versions)
+            similarity_cache.put(group, index)
+    finally:
+        conn.commit()
+    return index
+
+@app.route('/api/objects/<int:object_id>/similar')
+def similar_objects(object_id):
+    """Objects of the other analyses of the same category nearest to one object
+
+    Nearness is over the numeric features the object has values for, each
+    scaled to unit deviation across the category. `k` sets how many are
+    returned; `same_analysis=1` considers the object's own analysis too.
+    """
+    conn = get_db_connection()
+    
+    try:
+        obj = conn.execute('''
+            SELECT o.id, o.analysis_id FROM objects o
+            JOIN analysis a ON a.id = o.analysis_id
+            WHERE o.id = ? AND a.deleted_at IS NULL
+        ''', (object_id,)).fetchone()
+        if not obj:
+            return jsonify({'success': False, 'error': 'Object not found'}), 404
+        
+        try:
+            k = int(request.args.get('k', SIMILAR_SIZE))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'k must be a number'}), 400
+        if not 1 <= k <= MAX_SIMILAR_SIZE:
+            return jsonify({'success': False, 'error': f'k must be between 1 and {MAX_SIMILAR_SIZE}'}), 400
+        same_analysis = request.args.get('same_analysis', '').lower() in ('1', 'true', 'yes')
+        
+        index = get_similarity_index(conn, obj['analysis_id'])
+        values = dict(conn.execute(
+            'SELECT field_id, value_num FROM object_values WHERE object_id = ? AND value_num IS NOT NULL',
+            (object_id,)
+        ).fetchall())
+        neighbours = index.nearest(values, k, exclude_id=object_id,
+                                   exclude_analysis=None if same_analysis else obj['analysis_id'])
+        
+        details = {}
+        if neighbours:
+            ids = [neighbour[0] for neighbour in neighbours]
+            details = {row['id']: row for row in conn.execute(f'''
+                SELECT o.id, o.object_name, o.brand, o.image_url, o.analysis_id, a.name AS analysis_name
+                FROM objects o JOIN analysis a ON a.id = o.analysis_id
+                WHERE o.id IN ({','.join('?' * len(ids))})
+            ''', ids)}
+        
+        return jsonify({
+            'success': True,
+            'object_id': object_id,
+            'similar': [
+                {
+                    'id': neighbour_id,
+                    'object_name': details[neighbour_id]['object_name'],
+                    'brand': details[neighbour_id]['brand'],
+                    'image_url': details[neighbour_id]['image_url'],
+                    'analysis_id': analysis_id,
+                    'analysis_name': details[neighbour_id]['analysis_name'],
+                    'distance': round(distance, 6),
+                    'shared_fields': shared
+                }
+                for neighbour_id, analysis_id, distance, shared in neighbours
+                if neighbour_id in details
+            ]
+        })
+    
+    finally:
+        conn.close()
+
+# Export formats: (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'json': ('application/json', 'json'),
+    'ndjson': ('application/x-ndjson', 'ndjson')
+}
+
+# Size of the chunks streamed to the client
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+@app.route('/analysis/<int:analysis_id>/export')
+@versioned_response
+def export_analysis(analysis_id):
+    """Export analysis data in multiple formats, streamed row by row"""
+    format_type = request.args.get('format', 'csv')
+    
+    if format_type not in EXPORT_FORMATS:
+        return jsonify({'error': 'Unsupported format'}), 400
+    
+    conn = get_db_connection()
+    
+    # Get analysis details
+    analysis = load_analysis(conn, analysis_id)
+    
+    if not analysis:
+        conn.close()
+        return jsonify({'error': 'Analysis not found'}), 404
+    
+    # ?async=1 writes the export to a file that a job offers for download
+    if request.args.get('async') == '1':
+        try:
+            job_id = submit_job(conn, 'export', {'analysis_id': analysis_id, 'format_type': format_type})
+        except JobQueueFull as e:
+            return jsonify({'success': False, 'error': str(e)}), 503
+        finally:
+            conn.close()
+        return job_accepted(job_id)
+    
+    fields = load_fields(conn, analysis_id)
+    
+    if format_type == 'json':
+        body = export_to_json(analysis, fields, iter_export_objects(conn, analysis_id, fields))
+    elif format_type == 'ndjson':
+        body = export_to_ndjson(fields, iter_export_objects(conn, analysis_id, fields))
+    else:
+        body = export_to_csv(fields, iter_export_objects(conn, analysis_id, fields))
+    
+    mimetype, extension = EXPORT_FORMATS[format_type]
+    headers = {
+        'Content-Disposition': f'attachment; filename="{analysis["name"]}_comparison.{extension}"',
+        'Vary': 'Accept-Encoding'
+    }
+    
+    body = chunk_stream(body)
+    if request.args.get('gzip', '1') != '0' and request.accept_encodings['gzip']:
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    
+    return Response(body, mimetype=mimetype, headers=headers)
+
+def iter_export_objects(conn, analysis_id, fields):
+    """Yield (object row, {field_id: value}) for an analysis, newest first, from one cursor
+
+    Rows are grouped as they arrive so only one object is held in memory.
+    The connection is closed once the cursor is exhausted or the consumer
+    stops early.
+    """
+    field_ids = {field['id'] for field in fields}
+    
+    try:
+        rows = conn.execute('''
+            SELECT o.id, o.object_name, o.brand, o.image_url, o.created_at,
+                   ov.field_id, ov.field_value
+            FROM objects o
+            LEFT JOIN object_values ov ON ov.object_id = o.id
+            WHERE o.analysis_id = ?
+            ORDER BY o.created_at DESC, o.id DESC
+        ''', (analysis_id,))
+        
+        current, values = None, {}
+        for row in rows:
+            if current is not None and row['id'] != current['id']:
+                yield current, values
+                values = {}
+            current = row
+            if row['field_id'] in field_ids:
+                values[row['field_id']] = row['field_value']
+        
+        if current is not None:
+            yield current, values
+    
+    finally:
+        conn.close()
+
+def chunk_stream(pieces, size=EXPORT_CHUNK_SIZE):
+    """Coalesce many small strings into chunks of roughly `size` bytes"""
+    buffer, buffered = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+def gzip_stream(chunks):
+    """Gzip-compress a stream of text chunks on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_to_csv(fields, objects):
+    """Stream analysis objects as CSV lines"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    
+    def take_line(row):
+        writer.writerow(row)
+        line = output.getvalue()
+        output.seek(0)
+        output.truncate()
+        return line
+    
+    # Write header
+    header = ['Object Name', 'Brand', 'Image URL', 'Created Date']
+    header.extend([field['field_name'] for field in fields])
+    yield take_line(header)
+    
+    # Write data rows
+    for obj, values in objects:
+        row = [obj['object_name'], obj['brand'] or '', obj['image_url'] or '', obj['created_at']]
+        
+        # Add field values in correct order
+        for field in fields:
+            value = values.get(field['id'])
+            row.append(value if value is not None else '')
+        
+        yield take_line(row)
+
+def export_object_data(fields, obj, values):
+    """JSON-ready dict for one exported object"""
+    return {
+        'id': obj['id'],
+        'name': obj['object_name'],
+        'brand': obj['brand'],
+        'image_url': obj['image_url'],
+        'created_at': obj['created_at'],
+        'field_values': {
+            field['field_name']: values[field['id']]
+            for field in fields if field['id'] in values
+        }
+    }
+
+def export_to_json(analysis, fields, objects):
+    """Stream analysis objects as one JSON document"""
+    header = {
+        'analysis': {
+            'id': analysis['id'],
+            'name': analysis['name'],
+            'description': analysis['description'],
+            'category': analysis['category'],
+            'created_at': analysis['created_at'],
+            'updated_at': analysis['updated_at']
+        },
+        'fields': [
+            {
+                'id': field['id'],
+                'name': field['field_name'],
+                'type': field['field_type'],
+                'unit': field['field_unit'],
+                'required': bool(field['is_required']),
+                'order': field['display_order']
+            }
+            for field in fields
+        ]
+    }
+    
+    # Emit the header keys, then the objects array one element at a time
+    yield json.dumps(header)[:-1] + ', "objects": ['
+    for index, (obj, values) in enumerate(objects):
+        yield (', ' if index else '') + json.dumps(export_object_data(fields, obj, values))
+    yield ']}'
+
+def export_to_ndjson(fields, objects):
+    """Stream analysis objects as newline-delimited JSON, one object per line"""
+    for obj, values in objects:
+        yield json.dumps(export_object_data(fields, obj, values)) + '\n'
+
+def begin_bulk_load(conn):
+    """Suspend the per-row insert triggers until finish_bulk_load() in this transaction"""
+    conn.execute('INSERT OR IGNORE INTO bulk_load (flag) VALUES (1)')
+
+def finish_bulk_load(conn, last_object_id, last_value_id):
+    """Do the suspended trigger work for rows with ids above the given ones, set-based
+
+    Indexes the new objects and searchable values and adds them to the
+    object rollups, then re-enables the per-row triggers.
+    """
+    conn.execute('''
+        INSERT INTO objects_fts (rowid, object_name, brand)
+        SELECT id, object_name, brand FROM objects WHERE id > ?
+    ''', (last_object_id,))
+    
+    searchable = ', '.join('?' for _ in SEARCHABLE_FIELD_TYPES)
+    conn.execute(f'''
+        INSERT INTO object_values_fts (rowid, field_value)
+        SELECT ov.id, ov.field_value
+        FROM object_values ov
+        JOIN fields f ON f.id = ov.field_id
+        WHERE ov.id > ? AND ov.field_value != '' AND f.field_type IN ({searchable})
+    ''', (last_value_id, *SEARCHABLE_FIELD_TYPES))
+    
+    added = conn.execute('''
+        SELECT analysis_id, COUNT(*) FROM objects WHERE id > ? GROUP BY analysis_id
+    ''', (last_object_id,)).fetchall()
+    conn.executemany('UPDATE analysis SET object_count = object_count + ? WHERE id = ?',
+                     [(count, analysis_id) for analysis_id, count in added])
+    conn.execute('''
+        INSERT INTO stats (metric, bucket, value) VALUES ('total', 'objects', ?)
+        ON CONFLICT (metric, bucket) DO UPDATE SET value = value + excluded.value
+    ''', (sum(count for _, count in added),))
+    
+    conn.execute('DELETE FROM bulk_load')
+
+# Objects written per executemany batch (and per transaction unless atomic)
+IMPORT_BATCH_SIZE = 1000
+
+# At most this many per-row errors are returned in an import report
+MAX_IMPORT_ERRORS = 100
+
+# Import columns that map onto object attributes rather than fields;
+# None marks export-only columns that are accepted and skipped
+IMPORT_OBJECT_COLUMNS = {
+    'object name': 'object_name',
+    'object_name': 'object_name',
+    'name': 'object_name',
+    'brand': 'brand',
+    'image url': 'image_url',
+    'image_url': 'image_url',
+    'created date': None,
+    'created_at': None,
+    'id': None
+}
+
+def normalize_field_value(field_type, value):
+    """Validate a raw imported value against its field type and return the stored text
+
+    Raises ValueError with a user-facing message when the value does not fit.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        value = 'Yes' if value else 'No'
+    value = str(value).strip()
+    if value == '':
+        return ''
+    
+    if field_type in ('number', 'decimal', 'price'):
+        if parse_typed_value(field_type, value)[0] is None:
+            raise ValueError(f'"{value}" is not a valid {FIELD_TYPES[field_type].lower()}')
+        return value
+    
+    if field_type == 'rating':
+        number = parse_typed_value(field_type, value)[0]
+        # Ratings are whole stars; a fraction is rejected rather than rounded
+        if number is None or not 1 <= number <= 5 or number != int(number):
+            raise ValueError(f'"{value}" is not a rating between 1 and 5')
+        return str(int(number))
+    
+    if field_type == 'boolean':
+        lowered = value.lower()
+        if lowered in ('yes', 'y', 'true', '1'):
+            return 'Yes'
+        if lowered in ('no', 'n', 'false', '0'):
+            return 'No'
+        raise ValueError(f'"{value}" is not Yes/No')
+    
+    if field_type == 'date':
+        typed_date = parse_typed_value(field_type, value)[1]
+        if typed_date is None:
+            raise ValueError(f'"{value}" is not a YYYY-MM-DD date')
+        return typed_date
+    
+    return value
+
+def _object_row(line_number, data, field_values):
+    """Split one imported record into (line, name, brand, image_url, {column: value})"""
+    return (line_number,
+            str(data.get('object_name') or '').strip(),
+            str(data.get('brand') or '').strip(),
+            str(data.get('image_url') or '').strip(),
+            field_values)
+
+def read_import_csv(text):
+    """Yield import records from CSV text with a header row"""
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if not header:
+        raise ValueError('CSV file is empty')
+    
+    targets = [IMPORT_OBJECT_COLUMNS.get(column.strip().lower(), column) for column in header]
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        data, field_values = {}, {}
+        for target, column, cell in zip(targets, header, row):
+            if target in ('object_name', 'brand', 'image_url'):
+                data[target] = cell
+            elif target is not None:
+                field_values[column] = cell
+        yield _object_row(reader.line_num, data, field_values)
+
+def _json_object_row(line_number, obj):
+    """Import record for one object in the export_to_json / NDJSON shape"""
+    if not isinstance(obj, dict):
+        raise ValueError(f'Line {line_number}: expected a JSON object')
+    data = {'object_name': obj.get('name', obj.get('object_name')),
+            'brand': obj.get('brand'),
+            'image_url': obj.get('image_url')}
+    return _object_row(line_number, data, dict(obj.get('field_values') or {}))
+
+def read_import_json(document):
+    """Yield import records from a parsed document shaped like export_to_json output"""
+    if not isinstance(document, dict) or not isinstance(document.get('objects'), list):
+        raise ValueError('JSON import needs an "objects" list')
+    
+    for index, obj in enumerate(document['objects'], start=1):
+        yield _json_object_row(index, obj)
+
+def read_import_ndjson(text):
+    """Yield import records from newline-delimited JSON, one object per line"""
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'Line {line_number}: invalid JSON: {e}')
+        yield _json_object_row(line_number, obj)
+
+def read_import_records(text, format_type):
+    """Import records and declared field types for a text stream in one of EXPORT_FORMATS
+
+    Raises ValueError for malformed input.
+    """
+    if format_type == 'json':
+        # The standard library has no incremental JSON parser, so JSON
+        # documents are parsed whole; NDJSON is the streaming alternative
+        try:
+            document = json.load(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'Invalid JSON: {e}')
+        declared_fields = {}
+        if isinstance(document, dict):
+            declared_fields = {
+                field.get('name', ''): (field.get('type', 'text'), field.get('unit') or '')
+                for field in document.get('fields') or [] if isinstance(field, dict)
+            }
+        return read_import_json(document), declared_fields
+    if format_type == 'ndjson':
+        return read_import_ndjson(text), {}
+    return read_import_csv(text), {}
+
+def import_objects_stream(conn, analysis_id, records, declared_fields=None,
+                          create_fields=False, atomic=False, on_batch=None):
+    """Validate and write import records in executemany batches
+
+    `declared_fields` maps column names to (field_type, field_unit) for
+    fields that may be created. Unknown columns are created as fields when
+    `create_fields` is set (as text unless declared), otherwise ignored.
+    Rows with errors are skipped and reported. Each batch is committed on
+    its own unless `atomic` is set, in which case the caller commits.
+    `on_batch` is called with the report so far after every batch.
+    """
+    declared_names = [name for name in declared_fields or {} if name.strip()]
+    declared_fields = {name.strip().lower(): meta for name, meta in (declared_fields or {}).items()}
+    fields = {field['field_name'].strip().lower(): field for field in load_fields(conn, analysis_id)}
+    resolved = {}
+    report = {'imported': 0, 'failed': 0, 'created_fields': [], 'ignored_columns': [], 'errors': []}
+    
+    def resolve_field(column):
+        if column in resolved:
+            return resolved[column]
+        key = column.strip().lower()
+        field = fields.get(key)
+        if field is None and create_fields and key:
+            field_type, field_unit = declared_fields.get(key, ('text', ''))
+            if field_type not in FIELD_TYPES:
+                field_type = 'text'
+            max_order = conn.execute(
+                'SELECT COALESCE(MAX(display_order), 0) FROM fields WHERE analysis_id = ?',
+                (analysis_id,)
+            ).fetchone()[0]
+            field_id = conn.execute('''
+                INSERT INTO fields (analysis_id, field_name, field_type, field_unit, display_order)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (analysis_id, column.strip(), field_type, field_unit or '', max_order + 1)).lastrowid
+            field = fields[key] = conn.execute('SELECT * FROM fields WHERE id = ?', (field_id,)).fetchone()
+            report['created_fields'].append(column.strip())
+        elif field is None:
+            report['ignored_columns'].append(column)
+        resolved[column] = field
+        return field
+    
+    def record_error(line_number, message):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_IMPORT_ERRORS:
+            report['errors'].append({'row': line_number, 'error': message})
+    
+    # Declared fields are created up front so they keep the document's order
+    if create_fields:
+        for name in declared_names:
+            resolve_field(name)
+    
+    batch = []
+    
+    def flush():
+        if not batch:
+            return
+        if not conn.in_transaction:
+            conn.execute('BEGIN IMMEDIATE')
+        
+        # The write lock is held, so every new row of this batch gets an id
+        # above these; trigger work is done for the whole batch at the end
+        last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM objects').fetchone()[0]
+        last_value_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM object_values').fetchone()[0]
+        begin_bulk_load(conn)
+        conn.executemany(
+            'INSERT INTO objects (analysis_id, object_name, brand, image_url) VALUES (?, ?, ?, ?)',
+            [(analysis_id, name, brand, image_url) for name, brand, image_url, _ in batch]
+        )
+        object_ids = [row[0] for row in conn.execute(
+            'SELECT id FROM objects WHERE id > ? AND analysis_id = ? ORDER BY id', (last_id, analysis_id)
+        )]
+        conn.executemany(INSERT_OBJECT_VALUE_SQL, [
+            object_value_params(object_id, field, value)
+            for object_id, (_, _, _, values) in zip(object_ids, batch)
+            for field, value in values
+        ])
+        finish_bulk_load(conn, last_id, last_value_id)
+        bump_analysis_version(conn, analysis_id)
+        
+        if not atomic:
+            conn.commit()
+        report['imported'] += len(batch)
+        batch.clear()
+        if on_batch is not None:
+            on_batch(report)
+    
+    for line_number, name, brand, image_url, raw_values in records:
+        if not name:
+            record_error(line_number, 'Object name is required')
+            continue
+        
+        values, problems = [], []
+        for column, raw_value in raw_values.items():
+            field = resolve_field(column)
+            if field is None:
+                continue
+            try:
+                value = normalize_field_value(field['field_type'], raw_value)
+            except ValueError as e:
+                problems.append(f'{field["field_name"]}: {e}')
+                continue
+            if value:
+                values.append((field, value))
+        
+        supplied = {field['id'] for field, _ in values}
+        problems.extend(
+            f'{field["field_name"]} is required'
+            for field in fields.values()
+            if field['is_required'] and field['id'] not in supplied
+        )
+        
+        if problems:
+            record_error(line_number, '; '.join(problems))
+            continue
+        
+        batch.append((name, brand, image_url, values))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            flush()
+    
+    flush()
+    return report
+
+@app.route('/analysis/<int:analysis_id>/import', methods=['POST'])
+def import_objects(analysis_id):
+    """Bulk-import objects from an uploaded CSV, JSON or NDJSON file (or raw request body)
+
+    With ?async=1 the upload is saved and imported by a job instead.
+    """
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    filename = (upload.filename if upload else '') or ''
+    
+    format_type = request.args.get('format') or os.path.splitext(filename)[1].lstrip('.').lower()
+    if not format_type:
+        format_type = 'json' if request.mimetype == 'application/json' else (
+            'ndjson' if request.mimetype == 'application/x-ndjson' else 'csv')
+    if format_type not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': 'Unsupported format'}), 400
+    
+    create_fields = request.args.get('create_fields', '0').lower() in ('1', 'true', 'yes')
+    atomic = request.args.get('atomic', '0').lower() in ('1', 'true', 'yes')
+    
+    conn = get_db_connection()
+    
+    if get_analysis_version(conn, analysis_id) is None:
+        conn.close()
+        return jsonify({'success': False, 'error': 'Analysis not found'}), 404
+    
+    if request.args.get('async') == '1':
+        # The upload only lives as long as the request, so keep a copy for the job
+        os.makedirs(JOB_ARTIFACT_DIR, exist_ok=True)
+        handle, path = tempfile.mkstemp(suffix='.upload', dir=JOB_ARTIFACT_DIR)
+        with os.fdopen(handle, 'wb') as upload_copy:
+            shutil.copyfileobj(stream, upload_copy)
+        try:
+            job_id = submit_job(conn, 'import', {
+                'analysis_id': analysis_id, 'path': path, 'format_type': format_type,
+                'create_fields': create_fields, 'atomic': atomic
+            })
+        except JobQueueFull as e:
+            remove_job_artifact(path)
+            conn.close()
+            return jsonify({'success': False, 'error': str(e)}), 503
+        conn.close()
+        return job_accepted(job_id)
+    
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        records, declared_fields = read_import_records(text, format_type)
+    except ValueError as e:
+        conn.close()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    started = datetime.now()
+    try:
+        report = import_objects_stream(conn, analysis_id, records, declared_fields,
+                                       create_fields=create_fields, atomic=atomic)
+        conn.commit()
+    except ValueError as e:
+        conn.rollback()
+        conn.close()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    # Bulk entry is where duplicates come from; look for them in the background
+    if report['imported']:
+        report.update(duplicate_scan_response(queue_duplicate_scan(conn, analysis_id)))
+    conn.close()
+    
+    elapsed = (datetime.now() - started).total_seconds()
+    report.update({
+        'success': True,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(report['imported'] / elapsed) if elapsed else None
+    })
+    return jsonify(report)
+
+def build_fts_query(text):
+    """Turn free text into an FTS5 query where every term is a quoted prefix match"""
+    terms = [term for term in re.split(r'\W+', text) if term]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+# Private-use markers around matched terms in FTS snippets; they are swapped
+# for <mark> tags after the snippet text has been HTML-escaped
+SNIPPET_START, SNIPPET_END = '\x02', '\x03'
+
+def render_snippet(snippet):
+    """HTML-escape an FTS snippet and highlight its matched terms"""
+    if not snippet:
+        return ''
+    return (str(escape(snippet))
+            .replace(SNIPPET_START, '<mark>')
+            .replace(SNIPPET_END, '</mark>'))
+
+@app.route('/search')
+def search():
+    """Global ranked full-text search across analyses, objects and field values"""
+    query = request.args.get('q', '').strip()
+    match = build_fts_query(query)
+    
+    if not match:
+        return jsonify({'results': []})
+    
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    conn = get_db_connection()
+    
+    # Search analyses; bm25 weights favour name over category over description
+    analyses = conn.execute('''
+        SELECT a.id, a.name, a.description, a.category, a.created_at,
+               snippet(analysis_fts, -1, ?, ?, '…', 12) AS snippet,
+               bm25(analysis_fts, 10.0, 1.0, 4.0) AS rank
+        FROM analysis_fts
+        JOIN analysis a ON a.id = analysis_fts.rowid
+        WHERE analysis_fts MATCH ? AND a.deleted_at IS NULL
+        ORDER BY rank
+        LIMIT ?
+    ''', (SNIPPET_START, SNIPPET_END, match, limit)).fetchall()
+    
+    # Search objects by name/brand and by field values; each side is cut to
+    # its best matches before merging so latency does not grow with the catalog
+    objects = conn.execute('''
+        SELECT o.id, o.object_name, o.brand, a.id as analysis_id, a.name as analysis_name,
+               hits.snippet, MIN(hits.rank) AS rank
+        FROM (
+            SELECT * FROM (
+                SELECT objects_fts.rowid AS object_id,
+                       snippet(objects_fts, -1, ?, ?, '…', 12) AS snippet,
+                       bm25(objects_fts, 10.0, 5.0) AS rank
+                FROM objects_fts
+                WHERE objects_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT ov.object_id,
+                       snippet(object_values_fts, 0, ?, ?, '…', 12) AS snippet,
+                       bm25(object_values_fts) AS rank
+                FROM object_values_fts
+                JOIN object_values ov ON ov.id = object_values_fts.rowid
+                WHERE object_values_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            )
+        ) hits
+        JOIN objects o ON o.id = hits.object_id
+        JOIN analysis a ON o.analysis_id = a.id
+        WHERE a.deleted_at IS NULL
+        GROUP BY o.id
+        ORDER BY rank
+        LIMIT ?
+    ''', (SNIPPET_START, SNIPPET_END, match, limit * 5,
+          SNIPPET_START, SNIPPET_END, match, limit * 5, limit)).fetchall()
+    
+    conn.close()
+    
+    results = {
+        'analyses': [dict(analysis, snippet=render_snippet(analysis['snippet'])) for analysis in analyses],
+        'objects': [dict(obj, snippet=render_snippet(obj['snippet'])) for obj in objects]
+    }
+    
+    return jsonify(results)
+
+@app.route('/admin')
+def admin_dashboard():
+    """Admin dashboard with system statistics"""
+    conn = get_db_connection()
+    
+    totals = load_totals(conn)
+    
     # Get comprehensive statistics
     stats = {
-        'total_analyses': conn.execute('SELECT COUNT(*) FROM analysis').fetchone()[0],
-        'total_objects': conn.execute('SELECT COUNT(*) FROM objects').fetchone()[0],
-        'total_fields': conn.execute('SELECT COUNT(*) FROM fields').fetchone()[0],
+        'total_analyses': totals['analyses'],
+        'total_objects': totals['objects'],
+        'total_fields': totals['fields'],
+        # Each side is read newest first from its created_at index
         'recent_activity': conn.execute('''
-            SELECT 'analysis' as type, name as title, created_at 
-            FROM analysis 
+            SELECT * FROM (
+                SELECT 'analysis' as type, name as title, created_at 
+                FROM analysis 
+                WHERE deleted_at IS NULL
+                ORDER BY created_at DESC
+                LIMIT 10
+            )
             UNION ALL
-            SELECT 'object' as type, object_name as title, created_at 
-            FROM objects
+            SELECT * FROM (
+                SELECT 'object' as type, object_name as title, created_at 
+                FROM objects
+                WHERE analysis_id NOT IN (SELECT id FROM analysis WHERE deleted_at IS NOT NULL)
+                ORDER BY created_at DESC
+                LIMIT 10
+            )
             ORDER BY created_at DESC 
             LIMIT 10
         ''').fetchall(),
-        'popular_categories': conn.execute('''
-            SELECT category, COUNT(*) as count
-            FROM analysis
-            WHERE category IS NOT NULL
-            GROUP BY category
-            ORDER BY count DESC
-            LIMIT 5
-        ''').fetchall(),
-        'field_type_distribution': conn.execute('''
-            SELECT field_type, COUNT(*) as count
-            FROM fields
-            GROUP BY field_type
-            ORDER BY count DESC
-        ''').fetchall()
+        'popular_categories': [
+            {'category': row['bucket'], 'count': row['count']}
+            for row in load_stats(conn, 'category', limit=5)
+        ],
+        'field_type_distribution': [
+            {'field_type': row['bucket'], 'count': row['count']}
+            for row in load_stats(conn, 'field_type')
+        ]
     }
     
     conn.close()
     
     return render_template('admin_dashboard.html', stats=stats)
 
+SLOW_QUERY_ORDERS = ('total_seconds', 'max_seconds', 'count', 'mean_seconds')
+
+@app.route('/admin/slow-queries')
+def admin_slow_queries():
+    """Slowest SQL fingerprints seen by this process with their query plans"""
+    order_by = request.args.get('order', 'total_seconds')
+    if order_by not in SLOW_QUERY_ORDERS:
+        order_by = 'total_seconds'
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    
+    queries = slow_query_log.top(limit, order_by)
+    
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'threshold_ms': SLOW_QUERY_MS,
+            'dropped': slow_query_log.dropped,
+            'queries': queries
+        })
+    
+    return render_template('admin_slow_queries.html', queries=queries, order_by=order_by,
+                           orders=SLOW_QUERY_ORDERS, threshold_ms=SLOW_QUERY_MS,
+                           dropped=slow_query_log.dropped)
+
+@app.route('/admin/slow-queries/reset', methods=['POST'])
+def reset_slow_queries():
+    """Forget the recorded slow queries"""
+    slow_query_log.clear()
+    flash('Slow query log cleared.', 'success')
+    return redirect(url_for('admin_slow_queries'))
+
+# Request profiling. A request whose X-Profile header or _profile query
+# parameter equals PROFILE_TOKEN runs under cProfile; PROFILE_SAMPLE_RATE of
+# all requests have their stacks sampled for flame graphs. With neither set
+# create_app() leaves requests unwrapped, so profiling costs nothing
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN') or None
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'product-comparison-profiles'))
+
+def profile_label(environ):
+    """'METHOD rule' of the route a WSGI request goes to, grouping its sampled stacks"""
+    try:
+        rule, _ = app.url_map.bind_to_environ(environ).match(return_rule=True)
+        return f"{environ['REQUEST_METHOD']} {rule.rule}"
+    except HTTPException:
+        return f"{environ['REQUEST_METHOD']} <unmatched>"
+
+def request_profiler():
+    """The installed RequestProfiler, or None when profiling is off"""
+    return app.wsgi_app if isinstance(app.wsgi_app, RequestProfiler) else None
+
+@app.route('/admin/profiles')
+def admin_profiles():
+    """Stored request profiles and the state of stack sampling"""
+    profiler = request_profiler()
+    if profiler:
+        profiler.sampler.flush()
+    
+    return render_template('admin_profiles.html', profiles=list_profiles(PROFILE_DIR),
+                           token_configured=bool(PROFILE_TOKEN), sample_rate=PROFILE_SAMPLE_RATE,
+                           sampled_stacks=len(profiler.sampler.counts) if profiler else 0)
+
+@app.route('/admin/profiles/stacks.folded')
+def download_profile_stacks():
+    """Sampled stacks of every worker in collapsed format, for flamegraph.pl or speedscope"""
+    profiler = request_profiler()
+    if profiler:
+        profiler.sampler.flush()
+    
+    return Response(merged_stacks(PROFILE_DIR), mimetype='text/plain',
+                    headers={'Content-Disposition': 'attachment; filename=stacks.folded'})
+
+@app.route('/admin/profiles/<name>')
+def view_profile(name):
+    """Text report of a stored profile, by cumulative or own time"""
+    path = profile_path(PROFILE_DIR, name)
+    if not path:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    
+    sort = 'tottime' if request.args.get('sort') == 'tottime' else 'cumulative'
+    return Response(profile_summary(path, sort), mimetype='text/plain')
+
+@app.route('/admin/profiles/<name>.prof')
+def download_profile(name):
+    """A stored profile as a pstats file, for snakeviz or pstats"""
+    path = profile_path(PROFILE_DIR, name)
+    if not path:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f'{name}.prof')
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -860,6 +3311,42 @@ def health_check():
             'error': str(e)
         }), 500
 
+response_cache_entries = metrics_registry.gauge(
+    'response_cache_entries', 'Responses held in the response cache')
+response_cache_bytes = metrics_registry.gauge(
+    'response_cache_bytes', 'Body bytes held in the response cache')
+response_cache_lookups = metrics_registry.counter(
+    'response_cache_lookups_total', 'Response cache lookups', ['result'])
+jobs_by_status = metrics_registry.gauge(
+    'jobs', 'Background jobs currently recorded, by status', ['status'])
+database_size = metrics_registry.gauge(
+    'sqlite_database_bytes', 'Size of the main database file')
+
+@metrics_registry.collector
+def collect_runtime_metrics():
+    """Refresh the gauges read from the response cache and the database"""
+    cache = response_cache.stats()
+    response_cache_entries.set((), cache['entries'])
+    response_cache_bytes.set((), cache['bytes'])
+    response_cache_lookups.replace({('hit',): cache['hits'], ('miss',): cache['misses']})
+    
+    conn = open_db_connection()
+    try:
+        jobs_by_status.replace({
+            (row['status'],): row['count']
+            for row in conn.execute('SELECT status, COUNT(*) AS count FROM jobs GROUP BY status')
+        })
+        database_size.set((), conn.execute(
+            'SELECT page_count * page_size FROM pragma_page_count(), pragma_page_size()'
+        ).fetchone()[0])
+    finally:
+        conn.close()
+
+@app.route('/metrics')
+def metrics():
+    """Request, SQL, template, cache and job metrics in the Prometheus text format"""
+    return Response(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 
 # app.py - Add these missing routes after your existing routes
 
@@ -868,9 +3355,7 @@ def edit_analysis(analysis_id):
     """Edit analysis settings"""
     conn = get_db_connection()
     
-    analysis = conn.execute(
-        'SELECT * FROM analysis WHERE id = ?', (analysis_id,)
-    ).fetchone()
+    analysis = load_analysis(conn, analysis_id)
     
     if not analysis:
         flash('Analysis not found!', 'error')
@@ -899,6 +3384,7 @@ def update_analysis(analysis_id):
             WHERE id = ?
         ''', (name, description, category, analysis_id))
         
+        bump_analysis_version(conn, analysis_id)
         conn.commit()
         conn.close()
         
@@ -909,57 +3395,121 @@ def update_analysis(analysis_id):
         flash(f'Error updating analysis: {str(e)}', 'error')
         return redirect(url_for('edit_analysis', analysis_id=analysis_id))
 
+# Rows the reclaimer removes per transaction, the pause between its
+# transactions so other writers get the lock, and free pages it returns
+# to the filesystem after each one
+RECLAIM_CHUNK_SIZE = 2000
+RECLAIM_PAUSE_SECONDS = 0.02
+RECLAIM_VACUUM_PAGES = 500
+
+def reclaim_chunk(conn, analysis_id, chunk_size=RECLAIM_CHUNK_SIZE):
+    """Delete up to `chunk_size` rows of a soft-deleted analysis, children first
+
+    Returns the number of rows removed; the analysis row itself goes last.
+    """
+    deleted = conn.execute('''
+        DELETE FROM object_values WHERE id IN (
+            SELECT ov.id FROM objects o
+            JOIN object_values ov ON ov.object_id = o.id
+            WHERE o.analysis_id = ?
+            LIMIT ?
+        )
+    ''', (analysis_id, chunk_size)).rowcount
+    if deleted:
+        return deleted
+    
+    for table in ('objects', 'fields'):
+        deleted = conn.execute(f'''
+            DELETE FROM {table} WHERE id IN (
+                SELECT id FROM {table} WHERE analysis_id = ? LIMIT ?
+            )
+        ''', (analysis_id, chunk_size)).rowcount
+        if deleted:
+            return deleted
+    
+    return conn.execute(
+        'DELETE FROM analysis WHERE id = ? AND deleted_at IS NOT NULL', (analysis_id,)
+    ).rowcount
+
+def reclaim_deleted_analyses(conn, chunk_size=RECLAIM_CHUNK_SIZE, pause=RECLAIM_PAUSE_SECONDS):
+    """Physically remove soft-deleted analyses, one short transaction per chunk
+
+    Each chunk is followed by an incremental vacuum step and a pause, so the
+    write lock is never held for long. Returns the number of rows removed.
+    """
+    removed = 0
+    while True:
+        row = conn.execute(
+            'SELECT id FROM analysis WHERE deleted_at IS NOT NULL ORDER BY deleted_at LIMIT 1'
+        ).fetchone()
+        if row is None:
+            return removed
+        
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            removed += reclaim_chunk(conn, row['id'], chunk_size)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        # execute() would step the pragma once and free a single page;
+        # executescript() runs it to completion (nothing is pending to commit)
+        conn.executescript(f'PRAGMA incremental_vacuum({RECLAIM_VACUUM_PAGES})')
+        time.sleep(pause)
+
+def start_reclaimer(conn):
+    """Queue a reclaim job unless one is already waiting or running; returns its id"""
+    active = conn.execute('''
+        SELECT id FROM jobs WHERE kind = 'reclaim' AND status IN ('queued', 'running')
+        ORDER BY created_at LIMIT 1
+    ''').fetchone()
+    if active is not None:
+        return active['id']
+    return submit_job(conn, 'reclaim', {})
+
 @app.route('/analysis/<int:analysis_id>/delete', methods=['DELETE'])
 def delete_analysis(analysis_id):
-    """Delete analysis and all related data"""
+    """Delete analysis and all related data
+
+    The analysis is only marked deleted here, which hides it everywhere at
+    once; its rows are removed in small chunks by a background reclaim job,
+    whose id is returned so callers can follow it.
+    """
     try:
         conn = get_db_connection()
         
         # Get analysis name for confirmation
-        analysis = conn.execute(
-            'SELECT name FROM analysis WHERE id = ?', (analysis_id,)
-        ).fetchone()
+        analysis = load_analysis(conn, analysis_id)
         
         if not analysis:
             return jsonify({'success': False, 'error': 'Analysis not found'}), 404
         
-        # Delete in correct order (foreign key constraints)
-        # Delete object values first
-        conn.execute('''
-            DELETE FROM object_values 
-            WHERE object_id IN (
-                SELECT id FROM objects WHERE analysis_id = ?
-            )
-        ''', (analysis_id,))
-        
-        # Delete objects
-        conn.execute('DELETE FROM objects WHERE analysis_id = ?', (analysis_id,))
-        
-        # Delete fields
-        conn.execute('DELETE FROM fields WHERE analysis_id = ?', (analysis_id,))
-        
-        # Delete analysis
-        conn.execute('DELETE FROM analysis WHERE id = ?', (analysis_id,))
-        
+        conn.execute(
+            'UPDATE analysis SET deleted_at = CURRENT_TIMESTAMP WHERE id = ?', (analysis_id,)
+        )
         conn.commit()
+        
+        job_id = start_reclaimer(conn)
         conn.close()
         
         return jsonify({
             'success': True, 
-            'message': f'Analysis "{analysis["name"]}" deleted successfully'
+            'message': f'Analysis "{analysis["name"]}" deleted successfully',
+            'job_id': job_id,
+            'status_url': url_for('job_status', job_id=job_id)
         })
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/analysis/<int:analysis_id>/share')
+@versioned_response
 def share_analysis(analysis_id):
     """Generate shareable link for analysis"""
     conn = get_db_connection()
     
-    analysis = conn.execute(
-        'SELECT * FROM analysis WHERE id = ?', (analysis_id,)
-    ).fetchone()
+    analysis = load_analysis(conn, analysis_id)
     
     if not analysis:
         flash('Analysis not found!', 'error')
@@ -977,21 +3527,117 @@ def share_analysis(analysis_id):
     
     return render_template('share_analysis.html', analysis=analysis, share_data=share_data)
 
+# Duplicates with more cells (objects x fields) than this are copied in a
+# background thread, DUPLICATE_CHUNK_SIZE objects per transaction
+DUPLICATE_BACKGROUND_CELLS = 100000
+DUPLICATE_CHUNK_SIZE = 2000
+
+def last_row_id(conn, table):
+    """Highest id an AUTOINCREMENT table has handed out, including deleted rows"""
+    return conn.execute(f'''
+        SELECT MAX(
+            COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0),
+            COALESCE((SELECT MAX(id) FROM {table}), 0)
+        )
+    ''', (table,)).fetchone()[0]
+
+def copy_analysis_fields(conn, source_id, target_id):
+    """Copy the fields of an analysis, keeping the old-to-new ids in temp.copy_field_map
+
+    New ids are assigned up front from the table's id sequence, so the copy
+    and its mapping are two INSERT ... SELECT statements. The map lives on
+    this connection for the object copies that follow.
+    """
+    conn.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS copy_field_map (
+            old_id INTEGER PRIMARY KEY,
+            new_id INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('DELETE FROM temp.copy_field_map')
+    conn.execute('''
+        INSERT INTO temp.copy_field_map (old_id, new_id)
+        SELECT id, ? + ROW_NUMBER() OVER (ORDER BY id) FROM fields WHERE analysis_id = ?
+    ''', (last_row_id(conn, 'fields'), source_id))
+    conn.execute('''
+        INSERT INTO fields (id, analysis_id, field_name, field_type, field_unit, is_required, display_order)
+        SELECT m.new_id, ?, f.field_name, f.field_type, f.field_unit, f.is_required, f.display_order
+        FROM temp.copy_field_map m
+        JOIN fields f ON f.id = m.old_id
+    ''', (target_id,))
+
+def copy_analysis_objects(conn, source_id, target_id, after_id=0, limit=None):
+    """Copy objects with ids above `after_id` and their values, set-based
+
+    Needs the field map from copy_analysis_fields on the same connection.
+    Returns (objects copied, last source object id copied).
+    """
+    conn.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS copy_object_map (
+            old_id INTEGER PRIMARY KEY,
+            new_id INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('DELETE FROM temp.copy_object_map')
+    
+    last_object_id = last_row_id(conn, 'objects')
+    conn.execute('''
+        INSERT INTO temp.copy_object_map (old_id, new_id)
+        SELECT id, ? + ROW_NUMBER() OVER (ORDER BY id)
+        FROM (SELECT id FROM objects WHERE analysis_id = ? AND id > ? ORDER BY id LIMIT ?)
+    ''', (last_object_id, source_id, after_id, -1 if limit is None else limit))
+    
+    copied, last_copied_id = conn.execute(
+        'SELECT COUNT(*), MAX(old_id) FROM temp.copy_object_map'
+    ).fetchone()
+    if not copied:
+        return 0, after_id
+    
+    # Search indexing and rollups are done once for the whole chunk
+    last_value_id = last_row_id(conn, 'object_values')
+    begin_bulk_load(conn)
+    conn.execute('''
+        INSERT INTO objects (id, analysis_id, object_name, brand, image_url)
+        SELECT m.new_id, ?, o.object_name, o.brand, o.image_url
+        FROM temp.copy_object_map m
+        JOIN objects o ON o.id = m.old_id
+    ''', (target_id,))
+    conn.execute('''
+        INSERT INTO object_values (object_id, field_id, field_value, value_num, value_date)
+        SELECT om.new_id, fm.new_id, ov.field_value, ov.value_num, ov.value_date
+        FROM temp.copy_object_map om
+        JOIN object_values ov ON ov.object_id = om.old_id
+        JOIN temp.copy_field_map fm ON fm.old_id = ov.field_id
+    ''')
+    finish_bulk_load(conn, last_object_id, last_value_id)
+    
+    return copied, last_copied_id
+
 @app.route('/analysis/<int:analysis_id>/duplicate', methods=['POST'])
 def duplicate_analysis(analysis_id):
-    """Create a copy of an existing analysis"""
+    """Create a copy of an existing analysis
+
+    Small analyses are copied within the request. Larger ones, or any with
+    ?async=1, return as soon as the new analysis exists and are filled in
+    by a duplicate job.
+    """
     try:
         conn = get_db_connection()
         
         # Get original analysis
-        original = conn.execute(
-            'SELECT * FROM analysis WHERE id = ?', (analysis_id,)
-        ).fetchone()
+        original = load_analysis(conn, analysis_id)
         
         if not original:
             return jsonify({'success': False, 'error': 'Analysis not found'}), 404
         
+        field_count = conn.execute(
+            'SELECT COUNT(*) FROM fields WHERE analysis_id = ?', (analysis_id,)
+        ).fetchone()[0]
+        background = (request.args.get('async') == '1'
+                      or original['object_count'] * max(field_count, 1) > DUPLICATE_BACKGROUND_CELLS)
+        
         # Create new analysis
+        conn.execute('BEGIN IMMEDIATE')
         cursor = conn.execute('''
             INSERT INTO analysis (name, description, category)
             VALUES (?, ?, ?)
@@ -999,59 +3645,839 @@ def duplicate_analysis(analysis_id):
         
         new_analysis_id = cursor.lastrowid
         
-        # Copy fields
-        fields = conn.execute(
-            'SELECT * FROM fields WHERE analysis_id = ? ORDER BY display_order',
-            (analysis_id,)
-        ).fetchall()
-        
-        field_mapping = {}
-        for field in fields:
-            cursor = conn.execute('''
-                INSERT INTO fields (analysis_id, field_name, field_type, field_unit, is_required, display_order)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (new_analysis_id, field['field_name'], field['field_type'], 
-                  field['field_unit'], field['is_required'], field['display_order']))
+        if background:
+            conn.commit()
+            job_id = submit_job(conn, 'duplicate', {
+                'source_id': analysis_id,
+                'target_id': new_analysis_id,
+                'total_objects': original['object_count']
+            })
+            conn.close()
             
-            field_mapping[field['id']] = cursor.lastrowid
-        
-        # Copy objects and their values
-        objects = conn.execute(
-            'SELECT * FROM objects WHERE analysis_id = ?', (analysis_id,)
-        ).fetchall()
+            return jsonify({
+                'success': True,
+                'message': f'Copying {original["object_count"]} objects in the background',
+                'new_analysis_id': new_analysis_id,
+                'job_id': job_id,
+                'status_url': url_for('job_status', job_id=job_id)
+            }), 202
         
-        for obj in objects:
-            cursor = conn.execute('''
-                INSERT INTO objects (analysis_id, object_name, brand, image_url)
-                VALUES (?, ?, ?, ?)
-            ''', (new_analysis_id, obj['object_name'], obj['brand'], obj['image_url']))
-            
-            new_object_id = cursor.lastrowid
-            
-            # Copy object values
-            values = conn.execute(
-                'SELECT * FROM object_values WHERE object_id = ?', (obj['id'],)
-            ).fetchall()
-            
-            for value in values:
-                if value['field_id'] in field_mapping:
-                    conn.execute('''
-                        INSERT INTO object_values (object_id, field_id, field_value)
-                        VALUES (?, ?, ?)
-                    ''', (new_object_id, field_mapping[value['field_id']], value['field_value']))
+        # Copy fields, objects and values with one statement each
+        copy_analysis_fields(conn, analysis_id, new_analysis_id)
+        copy_analysis_objects(conn, analysis_id, new_analysis_id)
         
         conn.commit()
+        scan = {}
+        if original['object_count']:
+            scan = duplicate_scan_response(queue_duplicate_scan(conn, new_analysis_id))
         conn.close()
         
         return jsonify({
             'success': True, 
             'message': 'Analysis duplicated successfully',
-            'new_analysis_id': new_analysis_id
+            'new_analysis_id': new_analysis_id,
+            **scan
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Background jobs. Each process runs at most JOB_WORKERS jobs at once and
+# accepts at most MAX_ACTIVE_JOBS queued or running ones; finished jobs and
+# their files are removed JOB_RETENTION_SECONDS after they end
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+MAX_ACTIVE_JOBS = int(os.environ.get('MAX_ACTIVE_JOBS', '20'))
+JOB_RETENTION_SECONDS = int(os.environ.get('JOB_RETENTION_SECONDS', str(24 * 3600)))
+JOB_ARTIFACT_DIR = os.environ.get('JOB_ARTIFACT_DIR',
+                                  os.path.join(tempfile.gettempdir(), 'product-comparison-jobs'))
+
+# Objects exported between progress updates (and cancellation checks)
+JOB_PROGRESS_INTERVAL = 1000
+
+# Job functions by kind, registered with @job_kind
+JOB_KINDS = {}
+
+_job_executor = None
+_job_executor_pid = None
+_job_futures = {}
+_job_lock = threading.Lock()
+
+class JobCancelled(Exception):
+    """Raised inside a running job once it has been asked to stop"""
+
+class JobQueueFull(Exception):
+    """Raised by submit_job when too many jobs are already queued or running"""
+
+class Job:
+    """Handle a job function uses to report progress, check for cancellation and keep files
+
+    `conn` is the worker thread's connection. update() commits, so call it
+    between the job's own transactions.
+    """
+    
+    def __init__(self, job_id, conn):
+        self.id = job_id
+        self.conn = conn
+    
+    def update(self, progress=None, message=None):
+        """Record progress (0 to 1) and a status message, then stop if cancelled"""
+        self.conn.execute('''
+            UPDATE jobs SET progress = COALESCE(?, progress), message = COALESCE(?, message)
+            WHERE id = ?
+        ''', (progress, message, self.id))
+        self.conn.commit()
+        self.check_cancelled()
+    
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation was requested from any process"""
+        row = self.conn.execute(
+            'SELECT cancel_requested FROM jobs WHERE id = ?', (self.id,)
+        ).fetchone()
+        if row is None or row['cancel_requested']:
+            raise JobCancelled()
+    
+    def artifact_path(self, extension):
+        """Path for this job's downloadable result file"""
+        os.makedirs(JOB_ARTIFACT_DIR, exist_ok=True)
+        return os.path.join(JOB_ARTIFACT_DIR, f'{self.id}.{extension}')
+    
+    def set_artifact(self, path, name, mimetype):
+        """Offer `path` for download under `name` once the job is done"""
+        self.conn.execute('''
+            UPDATE jobs SET artifact_path = ?, artifact_name = ?, artifact_mimetype = ?
+            WHERE id = ?
+        ''', (path, name, mimetype, self.id))
+        self.conn.commit()
+
+def job_kind(name):
+    """Register a function as the runner for jobs of kind `name`
+
+    The function is called as func(job, **params) and returns a JSON
+    serializable result.
+    """
+    def register(func):
+        JOB_KINDS[name] = func
+        return func
+    return register
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, TypeError):
+        return pid is not None
+    return True
+
+def recover_interrupted_jobs(conn):
+    """Fail jobs left queued or running by a process that no longer exists"""
+    orphaned = [
+        (row['id'],) for row in conn.execute(
+            "SELECT id, worker_pid FROM jobs WHERE status IN ('queued', 'running')"
+        )
+        if not _process_alive(row['worker_pid'])
+    ]
+    conn.executemany('''
+        UPDATE jobs SET status = 'failed', error = 'Interrupted by a restart', finished_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', orphaned)
+    conn.commit()
+
+def cleanup_jobs(conn):
+    """Delete finished jobs older than JOB_RETENTION_SECONDS together with their files"""
+    expired = conn.execute('''
+        SELECT id, artifact_path FROM jobs
+        WHERE status IN ('done', 'failed', 'cancelled') AND finished_at < datetime('now', ?)
+    ''', (f'-{JOB_RETENTION_SECONDS} seconds',)).fetchall()
+    for row in expired:
+        remove_job_artifact(row['artifact_path'])
+    conn.executemany('DELETE FROM jobs WHERE id = ?', [(row['id'],) for row in expired])
+    conn.commit()
+
+def remove_job_artifact(path):
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def get_job_executor():
+    """The worker pool of this process, created on first use (and again after a fork)"""
+    global _job_executor, _job_executor_pid
+    with _job_lock:
+        if _job_executor is None or _job_executor_pid != os.getpid():
+            _job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+            _job_executor_pid = os.getpid()
+            _job_futures.clear()
+            fresh = True
+        else:
+            fresh = False
+    
+    if fresh:
+        conn = open_db_connection()
+        try:
+            recover_interrupted_jobs(conn)
+        finally:
+            conn.close()
+    return _job_executor
+
+def submit_job(conn, kind, params):
+    """Record a job and queue it on this process's workers; returns the job id
+
+    Commits on `conn`, so callers must not have a transaction open. Raises
+    JobQueueFull when MAX_ACTIVE_JOBS are already queued or running.
+    """
+    executor = get_job_executor()
+    cleanup_jobs(conn)
+    
+    active = conn.execute(
+        "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+    ).fetchone()[0]
+    if active >= MAX_ACTIVE_JOBS:
+        raise JobQueueFull(f'Too many background jobs ({active}); try again later')
+    
+    job_id = uuid.uuid4().hex
+    conn.execute('INSERT INTO jobs (id, kind, params, worker_pid) VALUES (?, ?, ?, ?)',
+                 (job_id, kind, json.dumps(params), os.getpid()))
+    conn.commit()
+    
+    with _job_lock:
+        _job_futures[job_id] = executor.submit(run_job, job_id)
+    return job_id
+
+def run_job(job_id):
+    """Run one queued job on the current worker thread and record how it ended"""
+    conn = get_db_connection()
+    try:
+        row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None or row['status'] != 'queued':
+            return
+        if row['cancel_requested']:
+            raise JobCancelled()
+        
+        conn.execute(
+            "UPDATE jobs SET status = 'running', started_at = CURRENT_TIMESTAMP WHERE id = ?", (job_id,)
+        )
+        conn.commit()
+        
+        _thread_state.sql_source = f"job:{row['kind']}"
+        result = JOB_KINDS[row['kind']](Job(job_id, conn), **json.loads(row['params']))
+        conn.commit()
+        conn.execute('''
+            UPDATE jobs SET status = 'done', progress = 1, result = ?, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (json.dumps(result), job_id))
+    except JobCancelled:
+        conn.rollback()
+        artifact = conn.execute('SELECT artifact_path FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        remove_job_artifact(artifact and artifact['artifact_path'])
+        conn.execute('''
+            UPDATE jobs SET status = 'cancelled', artifact_path = NULL, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (job_id,))
+    except Exception as e:
+        conn.rollback()
+        app.logger.exception('Job %s failed', job_id)
+        conn.execute('''
+            UPDATE jobs SET status = 'failed', error = ?, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (str(e), job_id))
+    finally:
+        _thread_state.sql_source = None
+        conn.commit()
+        conn.close()
+        with _job_lock:
+            _job_futures.pop(job_id, None)
+
+def cancel_job(conn, job_id):
+    """Ask a job to stop; a job still waiting in this process's queue never starts"""
+    conn.execute(
+        "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN ('queued', 'running')", (job_id,)
+    )
+    with _job_lock:
+        future = _job_futures.get(job_id)
+    if future is not None and future.cancel():
+        conn.execute('''
+            UPDATE jobs SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'queued'
+        ''', (job_id,))
+    conn.commit()
+
+def job_to_dict(row):
+    """JSON shape of a job, with links to poll it and download its result"""
+    job = {
+        'success': True,
+        'id': row['id'],
+        'kind': row['kind'],
+        'status': row['status'],
+        'progress': row['progress'],
+        'message': row['message'],
+        'error': row['error'],
+        'result': json.loads(row['result']) if row['result'] else None,
+        'created_at': row['created_at'],
+        'started_at': row['started_at'],
+        'finished_at': row['finished_at'],
+        'status_url': url_for('job_status', job_id=row['id'])
+    }
+    if row['status'] == 'done' and row['artifact_path']:
+        job['download_url'] = url_for('download_job', job_id=row['id'])
+    return job
+
+def job_accepted(job_id, **extra):
+    """202 response for a route that handed its work to a job"""
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': url_for('job_status', job_id=job_id),
+        **extra
+    }), 202
+
+@job_kind('export')
+def export_job(job, analysis_id, format_type):
+    """Write an analysis export to a file offered for download"""
+    conn = open_db_connection()
+    analysis = load_analysis(conn, analysis_id)
+    if not analysis:
+        conn.close()
+        raise ValueError('Analysis not found')
+    
+    fields = load_fields(conn, analysis_id)
+    total = max(analysis['object_count'], 1)
+    exported = 0
+    
+    def tracked(objects):
+        nonlocal exported
+        for item in objects:
+            exported += 1
+            if exported % JOB_PROGRESS_INTERVAL == 0:
+                job.update(progress=exported / total, message=f'Exported {exported} objects')
+            yield item
+    
+    # iter_export_objects closes the reading connection when it finishes
+    objects = tracked(iter_export_objects(conn, analysis_id, fields))
+    if format_type == 'json':
+        body = export_to_json(analysis, fields, objects)
+    elif format_type == 'ndjson':
+        body = export_to_ndjson(fields, objects)
+    else:
+        body = export_to_csv(fields, objects)
+    
+    mimetype, extension = EXPORT_FORMATS[format_type]
+    path = job.artifact_path(extension)
+    job.set_artifact(path, f'{analysis["name"]}_comparison.{extension}', mimetype)
+    with open(path, 'w', encoding='utf-8', newline='') as output:
+        for chunk in chunk_stream(body):
+            output.write(chunk)
+    
+    return {'analysis_id': analysis_id, 'objects': exported, 'bytes': os.path.getsize(path)}
+
+@job_kind('duplicate')
+def duplicate_job(job, source_id, target_id, total_objects):
+    """Fill an already created analysis with a copy of another, one chunk per transaction
+
+    A copy that fails or is cancelled is deleted again.
+    """
+    conn = job.conn
+    copied, after_id = 0, 0
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        copy_analysis_fields(conn, source_id, target_id)
+        conn.commit()
+        
+        while True:
+            conn.execute('BEGIN IMMEDIATE')
+            chunk, after_id = copy_analysis_objects(conn, source_id, target_id,
+                                                    after_id, DUPLICATE_CHUNK_SIZE)
+            bump_analysis_version(conn, target_id)
+            conn.commit()
+            if not chunk:
+                break
+            copied += chunk
+            job.update(progress=copied / max(total_objects, 1),
+                       message=f'Copied {copied} of {total_objects} objects')
+    except Exception:
+        conn.rollback()
+        conn.execute('UPDATE analysis SET deleted_at = CURRENT_TIMESTAMP WHERE id = ?', (target_id,))
+        conn.commit()
+        start_reclaimer(conn)
+        raise
+    
+    result = {'new_analysis_id': target_id, 'copied_objects': copied}
+    if copied:
+        result['duplicate_scan_job_id'] = queue_duplicate_scan(conn, target_id)
+    return result
+
+@job_kind('reclaim')
+def reclaim_job(job):
+    """Physically remove soft-deleted analyses"""
+    return {'removed_rows': reclaim_deleted_analyses(job.conn)}
+
+@job_kind('import')
+def import_job(job, analysis_id, path, format_type, create_fields, atomic):
+    """Import a previously uploaded file, reporting progress after every batch
+
+    An atomic import keeps its transaction open across batches, so it only
+    checks for cancellation instead of committing progress updates.
+    """
+    conn = job.conn
+    if atomic:
+        on_batch = lambda report: job.check_cancelled()
+    else:
+        on_batch = lambda report: job.update(message=f'Imported {report["imported"]} objects')
+    
+    try:
+        with open(path, encoding='utf-8-sig', newline='') as text:
+            records, declared_fields = read_import_records(text, format_type)
+            report = import_objects_stream(conn, analysis_id, records, declared_fields,
+                                           create_fields=create_fields, atomic=atomic,
+                                           on_batch=on_batch)
+            conn.commit()
+    finally:
+        remove_job_artifact(path)
+    
+    if report['imported']:
+        report['duplicate_scan_job_id'] = queue_duplicate_scan(conn, analysis_id)
+    return report
+
+# Job kinds that can be submitted directly through POST /jobs
+SUBMITTABLE_JOB_KINDS = ('export', 'reclaim')
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Submit a job: {"kind": "export", "analysis_id": ..., "format": ...} or {"kind": "reclaim"}
+
+    Duplicates and imports are submitted through their own routes with ?async=1.
+    """
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind')
+    if kind not in SUBMITTABLE_JOB_KINDS:
+        return jsonify({'success': False, 'error': f'kind must be one of {", ".join(SUBMITTABLE_JOB_KINDS)}'}), 400
+    
+    conn = get_db_connection()
+    try:
+        if kind == 'export':
+            format_type = data.get('format', 'csv')
+            if format_type not in EXPORT_FORMATS:
+                return jsonify({'success': False, 'error': 'Unsupported format'}), 400
+            if not isinstance(data.get('analysis_id'), int) or not load_analysis(conn, data['analysis_id']):
+                return jsonify({'success': False, 'error': 'Analysis not found'}), 404
+            job_id = submit_job(conn, 'export', {'analysis_id': data['analysis_id'], 'format_type': format_type})
+        else:
+            job_id = start_reclaimer(conn)
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    finally:
+        conn.close()
+    
+    return job_accepted(job_id)
+
+@app.route('/jobs')
+def list_jobs():
+    """Most recent jobs, optionally filtered by ?status= and ?kind="""
+    conn = get_db_connection()
+    
+    conditions, params = [], []
+    for column in ('status', 'kind'):
+        if request.args.get(column):
+            conditions.append(f'{column} = ?')
+            params.append(request.args[column])
+    where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+    
+    jobs = conn.execute(f'SELECT * FROM jobs {where} ORDER BY created_at DESC LIMIT ?',
+                        (*params, limit)).fetchall()
+    conn.close()
+    
+    return jsonify({'success': True, 'jobs': [job_to_dict(job) for job in jobs]})
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Status, progress and result of a job"""
+    conn = get_db_connection()
+    job = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    conn.close()
+    
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify(job_to_dict(job))
+
+@app.route('/jobs/<job_id>/download')
+def download_job(job_id):
+    """Download the file a finished job produced"""
+    conn = get_db_connection()
+    job = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    conn.close()
+    
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if job['status'] != 'done' or not job['artifact_path'] or not os.path.exists(job['artifact_path']):
+        return jsonify({'success': False, 'error': 'Job has no result to download'}), 409
+    
+    return send_file(job['artifact_path'], mimetype=job['artifact_mimetype'],
+                     as_attachment=True, download_name=job['artifact_name'])
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job_route(job_id):
+    """Ask a queued or running job to stop"""
+    conn = get_db_connection()
+    cancel_job(conn, job_id)
+    job = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    conn.close()
+    
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify(job_to_dict(job))
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    """Forget a finished job and delete its file"""
+    conn = get_db_connection()
+    job = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    
+    if not job:
+        conn.close()
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if job['status'] in ('queued', 'running'):
+        conn.close()
+        return jsonify({'success': False, 'error': 'Cancel the job before deleting it'}), 409
+    
+    remove_job_artifact(job['artifact_path'])
+    conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+    conn.commit()
+    conn.close()
+    
+    return jsonify({'success': True, 'message': 'Job deleted'})
+
+# Duplicate detection. Objects of one analysis whose names, without their
+# brand, share enough trigrams are recorded as duplicate candidates when
+# they are created or renamed, and by a full pass run as a job that imports
+# and analysis copies queue when they finish. Each analysis's trigram index
+# is cached per process and carried over object writes by
+# commit_object_write()
+DUPLICATE_THRESHOLD = float(os.environ.get('DUPLICATE_THRESHOLD', '0.6'))
+
+# Object columns the comparison looks at
+DUPLICATE_COLUMNS = ('object_name', 'brand')
+
+# Default and maximum number of clusters listed
+DUPLICATE_CLUSTERS = 100
+MAX_DUPLICATE_CLUSTERS = 500
+
+dedup_cache = DedupCache(int(os.environ.get('DEDUP_CACHE_ENTRIES', '64')))
+
+# Skips pairs whose objects were deleted since they were compared
+INSERT_DUPLICATE_CANDIDATE_SQL = '''
+    INSERT OR REPLACE INTO duplicate_candidates (analysis_id, object_id, other_id, similarity)
+    SELECT :analysis_id, :object_id, :other_id, :similarity
+    WHERE (SELECT COUNT(*) FROM objects WHERE id IN (:object_id, :other_id)) = 2
+'''
+
+def duplicate_candidate_params(analysis_id, object_id, other_id, similarity):
+    """Parameters of INSERT_DUPLICATE_CANDIDATE_SQL for one pair, in stored order"""
+    return {'analysis_id': analysis_id, 'object_id': min(object_id, other_id),
+            'other_id': max(object_id, other_id), 'similarity': similarity}
+
+def get_dedup_index(conn, analysis_id):
+    """The trigram index of an analysis for its current version, built on a cache miss"""
+    # Read the version and the names from one snapshot
+    conn.execute('BEGIN')
+    try:
+        version = get_analysis_version(conn, analysis_id)
+        index = dedup_cache.get(analysis_id, version)
+        if index is None:
+            index = DedupIndex(conn.execute(
+                'SELECT id, object_name, brand FROM objects WHERE analysis_id = ?', (analysis_id,)
+            ), version)
+            dedup_cache.put(analysis_id, index)
+    finally:
+        conn.commit()
+    return index
+
+def record_duplicate_candidates(conn, analysis_id, object_id):
+    """Replace the duplicate candidate pairs of one object after it was created or renamed"""
+    matches = get_dedup_index(conn, analysis_id).matches(object_id, DUPLICATE_THRESHOLD)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DELETE FROM duplicate_candidates WHERE object_id = ? OR other_id = ?',
+                     (object_id, object_id))
+        conn.executemany(INSERT_DUPLICATE_CANDIDATE_SQL, [
+            duplicate_candidate_params(analysis_id, object_id, other_id, similarity)
+            for other_id, similarity in matches
+        ])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+@job_kind('dedup')
+def dedup_job(job, analysis_id):
+    """Compare every object of an analysis with the others that share trigrams with it
+
+    Replaces the pairs among the objects there were when the pass started;
+    objects created since keep the pairs recorded when they were inserted.
+    """
+    conn = job.conn
+    if not load_analysis(conn, analysis_id):
+        raise ValueError('Analysis not found')
+    
+    index = get_dedup_index(conn, analysis_id)
+    object_ids = index.object_ids()
+    pairs = []
+    for compared, object_id in enumerate(object_ids, start=1):
+        pairs.extend((object_id, other_id, similarity)
+                     for other_id, similarity in index.matches(object_id, DUPLICATE_THRESHOLD, higher_only=True))
+        if compared % JOB_PROGRESS_INTERVAL == 0:
+            job.update(progress=compared / len(object_ids),
+                       message=f'Compared {compared} of {len(object_ids)} objects')
+    
+    last_id = object_ids[-1] if object_ids else 0
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('''
+            DELETE FROM duplicate_candidates
+            WHERE analysis_id = ? AND object_id <= ? AND other_id <= ?
+        ''', (analysis_id, last_id, last_id))
+        conn.executemany(INSERT_DUPLICATE_CANDIDATE_SQL, [
+            duplicate_candidate_params(analysis_id, *pair) for pair in pairs
+        ])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    return {'analysis_id': analysis_id, 'objects': len(object_ids), 'pairs': len(pairs),
+            'clusters': len(cluster_pairs(pairs))}
+
+@app.route('/api/analysis/<int:analysis_id>/duplicates')
+def list_duplicates(analysis_id):
+    """Clusters of objects that look like duplicates of each other, most similar first
+
+    Pairs at least `threshold` similar (by default DUPLICATE_THRESHOLD,
+    below which none are recorded) link objects into clusters; `limit` sets
+    how many clusters are listed.
+    """
+    conn = get_db_connection()
+    
+    try:
+        if not load_analysis(conn, analysis_id):
+            return jsonify({'success': False, 'error': 'Analysis not found'}), 404
+        
+        try:
+            threshold = float(request.args.get('threshold', DUPLICATE_THRESHOLD))
+            limit = int(request.args.get('limit', DUPLICATE_CLUSTERS))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'threshold and limit must be numbers'}), 400
+        if not DUPLICATE_THRESHOLD <= threshold <= 1:
+            return jsonify({'success': False,
+                            'error': f'threshold must be between {DUPLICATE_THRESHOLD} and 1'}), 400
+        if not 1 <= limit <= MAX_DUPLICATE_CLUSTERS:
+            return jsonify({'success': False,
+                            'error': f'limit must be between 1 and {MAX_DUPLICATE_CLUSTERS}'}), 400
+        
+        pairs = conn.execute('''
+            SELECT object_id, other_id, similarity FROM duplicate_candidates
+            WHERE analysis_id = ? AND similarity >= ?
+        ''', (analysis_id, threshold)).fetchall()
+        clusters = cluster_pairs([tuple(pair) for pair in pairs])
+        
+        shown = clusters[:limit]
+        ids = sorted({object_id for members, _, _ in shown for object_id in members})
+        details = {}
+        if ids:
+            details = {row['id']: row for row in conn.execute(f'''
+                SELECT id, object_name, brand, image_url FROM objects
+                WHERE id IN ({','.join('?' * len(ids))})
+            ''', ids)}
+        
+        return jsonify({
+            'success': True,
+            'analysis_id': analysis_id,
+            'threshold': threshold,
+            'total_clusters': len(clusters),
+            'clusters': [
+                {
+                    'similarity': round(similarity, 4),
+                    'objects': [
+                        {
+                            'id': object_id,
+                            'object_name': details[object_id]['object_name'],
+                            'brand': details[object_id]['brand'],
+                            'image_url': details[object_id]['image_url']
+                        }
+                        for object_id in members
+                    ],
+                    'pairs': [
+                        {'object_id': object_id, 'other_id': other_id, 'similarity': round(score, 4)}
+                        for object_id, other_id, score in links
+                    ]
+                }
+                for members, similarity, links in shown
+            ]
         })
+    
+    finally:
+        conn.close()
+
+def queue_duplicate_scan(conn, analysis_id):
+    """Queue a full duplicate pass after a bulk write of an analysis, returning the job id
+
+    Bulk writes skip the per-object matching done on inserts. The write
+    has already succeeded, so a full job queue only means None is returned.
+    """
+    try:
+        return submit_job(conn, 'dedup', {'analysis_id': analysis_id})
+    except JobQueueFull:
+        return None
+
+def duplicate_scan_response(job_id):
+    """Response entries pointing at a queued duplicate pass, if there is one"""
+    if job_id is None:
+        return {'duplicate_scan_job_id': None}
+    return {'duplicate_scan_job_id': job_id,
+            'duplicate_scan_url': url_for('job_status', job_id=job_id)}
+
+@app.route('/api/analysis/<int:analysis_id>/duplicates/scan', methods=['POST'])
+def scan_duplicates(analysis_id):
+    """Start a full duplicate pass over an analysis as a background job"""
+    conn = get_db_connection()
+    try:
+        if not load_analysis(conn, analysis_id):
+            return jsonify({'success': False, 'error': 'Analysis not found'}), 404
+        job_id = submit_job(conn, 'dedup', {'analysis_id': analysis_id})
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    finally:
+        conn.close()
+    
+    return job_accepted(job_id)
+
+# Fills the kept object's missing values from a merged one
+MERGE_OBJECT_VALUES_SQL = '''
+    INSERT INTO object_values (object_id, field_id, field_value, value_num, value_date)
+    SELECT ?, field_id, field_value, value_num, value_date FROM object_values
+    WHERE object_id = ? AND COALESCE(field_value, '') != ''
+    ON CONFLICT (object_id, field_id) DO UPDATE SET
+        field_value = excluded.field_value,
+        value_num = excluded.value_num,
+        value_date = excluded.value_date
+    WHERE COALESCE(object_values.field_value, '') = ''
+'''
+
+@app.route('/api/analysis/<int:analysis_id>/duplicates/merge', methods=['POST'])
+def merge_duplicates(analysis_id):
+    """Merge objects into one from a JSON body {"keep": id, "merge": [ids]}
+
+    The kept object keeps its own values; cells and brand or image it
+    lacks are filled from the merged objects in the order given, which are
+    then deleted.
+    """
+    data = request.get_json(silent=True) or {}
+    keep, merge = data.get('keep'), data.get('merge')
+    if (not isinstance(keep, int) or not isinstance(merge, list) or not merge
+            or not all(isinstance(object_id, int) for object_id in merge)
+            or keep in merge or len(set(merge)) != len(merge)):
+        return jsonify({'success': False,
+                        'error': 'Expected {"keep": id, "merge": [ids]} of distinct objects'}), 400
+    
+    try:
+        conn = get_db_connection()
+        
+        if not load_analysis(conn, analysis_id):
+            conn.close()
+            return jsonify({'success': False, 'error': 'Analysis not found'}), 404
+        
+        conn.execute('BEGIN IMMEDIATE')
+        ids = [keep] + merge
+        objects = {row['id']: row for row in conn.execute(f'''
+            SELECT * FROM objects WHERE analysis_id = ? AND id IN ({','.join('?' * len(ids))})
+        ''', [analysis_id] + ids)}
+        missing = [object_id for object_id in ids if object_id not in objects]
+        if missing:
+            conn.rollback()
+            conn.close()
+            return jsonify({'success': False, 'error': 'Object not found', 'missing': missing}), 404
+        
+        # Values first, then the object columns the kept object lacks
+        filled = 0
+        for object_id in merge:
+            filled += conn.execute(MERGE_OBJECT_VALUES_SQL, (keep, object_id)).rowcount
+        columns = {}
+        for column in ('brand', 'image_url'):
+            if not objects[keep][column]:
+                columns[column] = next((objects[object_id][column] for object_id in merge
+                                        if objects[object_id][column]), '')
+        changed_columns = update_object_columns(conn, keep, columns)
+        
+        # Values and duplicate pairs of the merged objects go with them
+        conn.execute(f'DELETE FROM objects WHERE id IN ({",".join("?" * len(merge))})', merge)
+        bump_analysis_version(conn, analysis_id)
+        conn.commit()
         
+        # The merged objects' pairs are gone; look again for the kept one's
+        record_duplicate_candidates(conn, analysis_id, keep)
+        version = get_analysis_version(conn, analysis_id)
+        conn.close()
+        
+        return jsonify({
+            'success': True,
+            'object_id': keep,
+            'merged': merge,
+            'filled_values': filled,
+            'changed': changed_columns,
+            'version': version
+        })
+    
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Module settings create_app() takes from its config; each defaults to its environment variable
+APP_SETTINGS = ('DATABASE', 'REUSE_CONNECTIONS', 'SLOW_QUERY_MS', 'JOB_WORKERS', 'MAX_ACTIVE_JOBS',
+                'JOB_RETENTION_SECONDS', 'JOB_ARTIFACT_DIR', 'PROFILE_TOKEN', 'PROFILE_SAMPLE_RATE',
+                'PROFILE_DIR')
+
+def create_app(config=None):
+    """Configure the application and bring its database schema up to date
+
+    `config` may set any of APP_SETTINGS, RESPONSE_CACHE_BYTES,
+    SCORE_CACHE_ENTRIES, FIELD_SUMMARY_CACHE_ENTRIES,
+    SIMILARITY_CACHE_ENTRIES, DEDUP_CACHE_ENTRIES, entries of SQLITE_PRAGMAS
+    (merged over the defaults) and ordinary Flask keys such as SECRET_KEY or TESTING. Call it once in the process that forks the
+    workers, so the schema is migrated before any of them starts; INIT_DB
+    set to False skips that. The connection used for it is closed again,
+    so no open database handle is inherited across a fork.
+    """
+    global response_cache, score_cache, summary_cache, similarity_cache, dedup_cache
+    config = dict(config or {})
+    
+    for name in APP_SETTINGS:
+        if name in config:
+            globals()[name] = config[name]
+    SQLITE_PRAGMAS.update(config.pop('SQLITE_PRAGMAS', {}))
+    if 'RESPONSE_CACHE_BYTES' in config:
+        response_cache = ResponseCache(int(config['RESPONSE_CACHE_BYTES']))
+    if 'SCORE_CACHE_ENTRIES' in config:
+        score_cache = ScoreCache(int(config['SCORE_CACHE_ENTRIES']))
+    if 'FIELD_SUMMARY_CACHE_ENTRIES' in config:
+        summary_cache = SummaryCache(int(config['FIELD_SUMMARY_CACHE_ENTRIES']))
+    if 'SIMILARITY_CACHE_ENTRIES' in config:
+        similarity_cache = SimilarityCache(int(config['SIMILARITY_CACHE_ENTRIES']))
+    if 'DEDUP_CACHE_ENTRIES' in config:
+        dedup_cache = DedupCache(int(config['DEDUP_CACHE_ENTRIES']))
+    app.config.update(config)
+    
+    # Wrap requests for profiling only when it is configured
+    if request_profiler():
+        app.wsgi_app = app.wsgi_app.app
+    if PROFILE_TOKEN or PROFILE_SAMPLE_RATE > 0:
+        app.wsgi_app = RequestProfiler(app.wsgi_app, PROFILE_DIR, token=PROFILE_TOKEN,
+                                       sample_rate=PROFILE_SAMPLE_RATE, label=profile_label)
+    
+    if config.get('INIT_DB', True):
+        init_db()
+        close_thread_connections()
+    return app
+
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5007)
+    # Development server; production runs the pre-fork server in server.py
+    create_app().run(debug=os.environ.get('FLASK_DEBUG', '1') == '1', host='0.0.0.0', port=5007)
@@ -0,0 +1 @@
+"""Benchmarks: a seeded catalog generator (catalog.py) and a route harness (harness.py)"""
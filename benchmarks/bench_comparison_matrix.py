@@ -0,0 +1,112 @@
+"""Benchmark: comparison matrix loading vs. the old per-object value lookups
+
+Builds throwaway databases of increasing size and reports, for each size, the
+number of SQL statements and the wall time needed to load the full
+object x field grid of one analysis with load_comparison_matrix().
+
+The loader now backs only the edit form, which loads a single object. The
+analysis page pages through load_objects_page() and exports stream from
+one cursor, so this is no longer their cost. With the query count fixed,
+what is left is SQLite stepping through the value rows and Python turning
+each row into dict entries. The matrix time is therefore split into the
+time SQLite takes to run the same statements and the Python cost per row
+on top of it.
+
+    python benchmarks/bench_comparison_matrix.py [--fields 30] [--sizes 10,100,1000,2000] [--repeat 5]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app as comparison_app
+from benchmarks.catalog import build_catalog
+
+
+def load_per_object(conn, analysis_id):
+    """The pre-matrix access pattern: one value query per object"""
+    objects = conn.execute(
+        'SELECT * FROM objects WHERE analysis_id = ? ORDER BY created_at DESC', (analysis_id,)
+    ).fetchall()
+    object_values = {}
+    for obj in objects:
+        values = conn.execute('''
+            SELECT f.id as field_id, f.field_name, ov.field_value
+            FROM fields f
+            LEFT JOIN object_values ov ON f.id = ov.field_id AND ov.object_id = ?
+            WHERE f.analysis_id = ?
+            ORDER BY f.display_order ASC
+        ''', (obj['id'], analysis_id)).fetchall()
+        object_values[obj['id']] = {v['field_id']: v['field_value'] for v in values}
+    return object_values
+
+
+def measure(loader, analysis_id):
+    """Run `loader` once and return (seconds, statements run)"""
+    conn = comparison_app.get_db_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    
+    started = time.perf_counter()
+    loader(conn, analysis_id)
+    elapsed = time.perf_counter() - started
+    
+    conn.set_trace_callback(None)
+    conn.close()
+    return elapsed, statements
+
+
+def replay(statements):
+    """Run traced statements again, only stepping through their rows; returns (seconds, rows)
+
+    This is the part of a load spent in SQLite, with plain tuples and no
+    row objects or dicts built, on a connection with the app's pragmas.
+    """
+    conn = comparison_app.open_db_connection(factory=sqlite3.Connection)
+    conn.row_factory = None
+    rows = 0
+    started = time.perf_counter()
+    for sql in statements:
+        for _ in conn.execute(sql):
+            rows += 1
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return elapsed, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fields', type=int, default=30)
+    parser.add_argument('--sizes', default='10,100,1000,2000')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement; the fastest counts')
+    args = parser.parse_args()
+    
+    sizes = [int(size) for size in args.sizes.split(',')]
+    
+    print(f"{'objects':>8} {'matrix queries':>15} {'matrix ms':>10} {'sql ms':>8} {'python us/row':>14} "
+          f"{'per-object queries':>19} {'per-object ms':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            catalog = build_catalog(os.path.join(tmp, f'bench_{size}.db'), 1, args.fields, size,
+                                    field_types=('number',), empty_ratio=0)
+            analysis_id = catalog['analysis_ids'][0]
+            
+            fastest = lambda runs: min(runs, key=lambda run: run[0])
+            matrix_time, matrix_statements = fastest(measure(comparison_app.load_comparison_matrix, analysis_id)
+                                                     for _ in range(args.repeat))
+            sql_time, rows = fastest(replay(matrix_statements) for _ in range(args.repeat))
+            legacy_time, legacy_statements = fastest(measure(load_per_object, analysis_id)
+                                                     for _ in range(args.repeat))
+            
+            # Python cost per row fetched, on top of SQLite producing it
+            per_row = (matrix_time - sql_time) / max(rows, 1) * 1e6
+            print(f'{size:>8} {len(matrix_statements):>15} {matrix_time * 1000:>10.1f} {sql_time * 1000:>8.1f} '
+                  f'{per_row:>14.2f} {len(legacy_statements):>19} {legacy_time * 1000:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
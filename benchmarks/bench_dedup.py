@@ -0,0 +1,75 @@
+"""Benchmark: duplicate detection full pass and per-insert cost
+
+Builds throwaway single-analysis catalogs of increasing size, then times a
+full duplicate pass run as a job and the p50/p95 of object inserts, each of
+which records the new object's duplicate candidates.
+
+    python benchmarks/bench_dedup.py [--sizes 10000,50000,100000] [--inserts 200]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app as comparison_app
+from benchmarks.catalog import build_catalog
+
+
+def run_scan(client, analysis_id):
+    """Milliseconds until a full duplicate pass job is done, and its result"""
+    started = time.perf_counter()
+    response = client.post(f'/api/analysis/{analysis_id}/duplicates/scan')
+    assert response.status_code == 202, response.status_code
+    while True:
+        job = client.get(response.json['status_url']).json
+        if job['status'] not in ('queued', 'running'):
+            break
+        time.sleep(0.01)
+    assert job['status'] == 'done', job
+    return (time.perf_counter() - started) * 1000, job['result']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,50000,100000', help='objects in the analysis')
+    parser.add_argument('--inserts', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    print(f"{'objects':>8} {'scan ms':>10} {'pairs':>8} {'insert p50':>11} {'insert p95':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(size) for size in args.sizes.split(',')):
+            build_catalog(os.path.join(tmp, f'bench_{size}.db'), 1, 4, size, seed=args.seed)
+            comparison_app.dedup_cache.clear()
+            
+            conn = comparison_app.get_db_connection()
+            analysis_id = conn.execute('SELECT id FROM analysis').fetchone()[0]
+            objects = conn.execute('SELECT object_name, brand FROM objects').fetchall()
+            conn.close()
+            
+            client = comparison_app.app.test_client()
+            scan, result = run_scan(client, analysis_id)
+            
+            samples = []
+            for _ in range(args.inserts):
+                # A respelling of an existing object, as bulk entry would produce
+                name, brand = rng.choice(objects)
+                name = name.split(' ', 1)[-1].upper() + rng.choice(['', ' Edition', ' Headphones'])
+                started = time.perf_counter()
+                response = client.post(f'/analysis/{analysis_id}/objects',
+                                       data={'object_name': name, 'brand': brand})
+                samples.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 302, response.status_code
+            samples.sort()
+            
+            print(f'{size:>8} {scan:>10.0f} {result["pairs"]:>8} {samples[len(samples) // 2]:>11.2f} '
+                  f'{samples[int(len(samples) * 0.95)]:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark: main routes before and after the lookup index migrations
+
+Builds a synthetic database, times the main routes with every secondary
+index dropped (the schema as the original init_db left it), then rolls
+PRAGMA user_version back so run_migrations() re-applies the index
+migrations in place and times the same routes again. The response cache
+and field summaries are cleared before every request, so each sample
+pays for its queries.
+
+    python benchmarks/bench_migrations.py [--analyses 20] [--fields 20] [--objects 1000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app as comparison_app
+from benchmarks.catalog import build_catalog
+
+def drop_secondary_indexes():
+    """Drop every index the migrations created and rewind user_version to the base schema"""
+    conn = comparison_app.get_db_connection()
+    names = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'"
+    )]
+    for name in names:
+        conn.execute(f'DROP INDEX {name}')
+    conn.execute('PRAGMA user_version = 1')
+    conn.commit()
+    conn.close()
+
+
+def clear_caches():
+    """Empty the per-process caches the timed routes would otherwise be served from"""
+    comparison_app.response_cache.clear()
+    comparison_app.summary_cache.clear()
+
+
+def time_routes(client, routes, repeat):
+    """Median milliseconds per route, every request uncached"""
+    results = {}
+    for label, url in routes:
+        samples = []
+        for _ in range(repeat):
+            clear_caches()
+            started = time.perf_counter()
+            response = client.get(url)
+            samples.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, (url, response.status_code)
+        results[label] = statistics.median(samples)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--analyses', type=int, default=20)
+    parser.add_argument('--fields', type=int, default=20)
+    parser.add_argument('--objects', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        build_catalog(os.path.join(tmp, 'bench.db'), args.analyses, args.fields, args.objects)
+        
+        conn = comparison_app.get_db_connection()
+        analysis_id = conn.execute('SELECT MAX(id) FROM analysis').fetchone()[0]
+        object_id, brand = conn.execute(
+            'SELECT id, brand FROM objects WHERE analysis_id = ? ORDER BY id DESC LIMIT 1', (analysis_id,)
+        ).fetchone()
+        price_id, rating_id = [row[0] for row in conn.execute(
+            "SELECT id FROM fields WHERE analysis_id = ? AND field_type IN ('price', 'rating') ORDER BY id LIMIT 2",
+            (analysis_id,)
+        )]
+        conn.close()
+        
+        routes = [
+            ('dashboard', '/'),
+            ('view_analysis', f'/analysis/{analysis_id}'),
+            ('objects_api', f'/api/analysis/{analysis_id}/objects?sort={price_id}&order=asc&field_{rating_id}_min=4&limit=20'),
+            ('edit_object', f'/analysis/{analysis_id}/objects/{object_id}/edit'),
+            ('export_csv', f'/analysis/{analysis_id}/export?format=csv'),
+            # Catalog names are built from brands, so a brand always has hits
+            ('search', f'/search?q={brand}'),
+            ('admin', '/admin'),
+        ]
+        client = comparison_app.app.test_client()
+        
+        drop_secondary_indexes()
+        before = time_routes(client, routes, args.repeat)
+        
+        conn = comparison_app.get_db_connection()
+        started = time.perf_counter()
+        applied = comparison_app.run_migrations(conn)
+        migration_time = time.perf_counter() - started
+        conn.close()
+        
+        after = time_routes(client, routes, args.repeat)
+    
+    print(f'applied {", ".join(applied)} in {migration_time:.2f}s')
+    print(f"{'route':<16} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for label, _ in routes:
+        print(f'{label:<16} {before[label]:>10.1f} {after[label]:>10.1f} {before[label] / after[label]:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark: "find similar products" index build and k-NN query latency
+
+Builds throwaway catalogs of increasing size with every analysis in one
+category, then times the first /api/objects/<id>/similar request (which
+builds the category's index) and the p50/p95 of the requests after it.
+
+    python benchmarks/bench_similar.py [--analyses 20] [--fields 10] [--sizes 1000,5000,15000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app as comparison_app
+from benchmarks.catalog import build_catalog
+
+
+def timed_get(client, url):
+    """Milliseconds taken by one GET, which must succeed"""
+    started = time.perf_counter()
+    response = client.get(url)
+    elapsed = (time.perf_counter() - started) * 1000
+    assert response.status_code == 200, (url, response.status_code)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--analyses', type=int, default=20)
+    parser.add_argument('--fields', type=int, default=10)
+    parser.add_argument('--sizes', default='1000,5000,15000', help='objects per analysis')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    print(f"{'objects':>8} {'build ms':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(size) for size in args.sizes.split(',')):
+            build_catalog(os.path.join(tmp, f'bench_{size}.db'), args.analyses, args.fields, size,
+                          seed=args.seed)
+            comparison_app.similarity_cache.clear()
+            
+            conn = comparison_app.get_db_connection()
+            conn.execute("UPDATE analysis SET category = 'Benchmark'")
+            conn.commit()
+            object_ids = [row[0] for row in conn.execute('SELECT id FROM objects')]
+            conn.close()
+            
+            client = comparison_app.app.test_client()
+            build = timed_get(client, f'/api/objects/{object_ids[0]}/similar')
+            samples = sorted(timed_get(client, f'/api/objects/{rng.choice(object_ids)}/similar')
+                             for _ in range(args.queries))
+            
+            print(f'{len(object_ids):>8} {build:>10.0f} {samples[len(samples) // 2]:>8.2f} '
+                  f'{samples[int(len(samples) * 0.95)]:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""Seeded synthetic catalog generator for benchmarks
+
+Builds a database of analyses x fields x objects with a realistic mix of the
+field types in FIELD_TYPES. The same arguments and seed always produce the
+same rows, including timestamps, so numbers are comparable across commits.
+
+    python benchmarks/catalog.py catalog.db [--analyses 10] [--fields 20] [--objects 500] [--seed 42]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app as comparison_app
+
+# Relative frequency of each field type in a generated analysis
+FIELD_TYPE_WEIGHTS = {
+    'text': 4, 'number': 4, 'decimal': 2, 'boolean': 3, 'select': 2, 'rating': 1, 'price': 1, 'date': 1
+}
+
+# Name and unit choices per field type
+FIELD_NAMES = {
+    'text': [('Description', ''), ('Material', ''), ('Connectivity', ''), ('Notes', '')],
+    'number': [('Weight', 'g'), ('Battery Life', 'h'), ('Storage', 'GB'), ('Warranty', 'months')],
+    'decimal': [('Screen Size', 'in'), ('Thickness', 'mm'), ('Power', 'W')],
+    'boolean': [('Wireless', ''), ('Waterproof', ''), ('In Stock', ''), ('Refurbished', '')],
+    'select': [('Color', ''), ('Finish', ''), ('Tier', '')],
+    'rating': [('Rating', ''), ('Build Quality', ''), ('Value', '')],
+    'price': [('Price', '$'), ('Street Price', '$')],
+    'date': [('Release Date', ''), ('Last Reviewed', '')]
+}
+
+CATEGORIES = {
+    'Headphones': ['Sony', 'Bose', 'Sennheiser', 'JBL', 'Audio-Technica'],
+    'Laptops': ['Lenovo', 'Dell', 'Apple', 'ASUS', 'HP'],
+    'Phones': ['Samsung', 'Apple', 'Google', 'OnePlus', 'Xiaomi'],
+    'Cameras': ['Canon', 'Nikon', 'Fujifilm', 'Sony', 'Panasonic'],
+    'Monitors': ['LG', 'Dell', 'BenQ', 'Samsung', 'ASUS']
+}
+
+MODEL_WORDS = ['Pro', 'Air', 'Max', 'Ultra', 'Lite', 'Plus', 'Mini', 'Studio', 'Edge', 'One']
+TEXT_WORDS = ['compact', 'wireless', 'premium', 'budget', 'aluminium', 'plastic', 'bluetooth',
+              'usb-c', 'lightweight', 'durable', 'noise', 'cancelling', 'fast', 'charging', 'matte']
+SELECT_OPTIONS = ['Black', 'White', 'Silver', 'Blue', 'Red', 'Graphite', 'Gold']
+
+# Generated timestamps start here, one analysis per day and one object per minute
+BASE_TIME = datetime(2024, 1, 1, 9, 0, 0)
+
+
+def choose_field_types(rng, count, field_types=None):
+    """`count` field types: a price and a rating first, the rest drawn by FIELD_TYPE_WEIGHTS
+
+    With explicit `field_types` they are cycled through in order instead.
+    """
+    if field_types:
+        return [field_types[index % len(field_types)] for index in range(count)]
+    
+    types = list(comparison_app.FIELD_TYPES)
+    weights = [FIELD_TYPE_WEIGHTS.get(field_type, 1) for field_type in types]
+    chosen = ['price', 'rating'][:count]
+    chosen.extend(rng.choices(types, weights, k=count - len(chosen)))
+    return chosen
+
+
+def random_value(rng, field_type):
+    """A plausible raw form value for a field type"""
+    if field_type == 'price':
+        return f'{rng.lognormvariate(5, 1):.2f}'
+    if field_type == 'rating':
+        return str(rng.choices([1, 2, 3, 4, 5], [1, 2, 5, 9, 6])[0])
+    if field_type == 'number':
+        return str(rng.randint(0, 10000))
+    if field_type == 'decimal':
+        return f'{rng.uniform(0, 100):.2f}'
+    if field_type == 'boolean':
+        return rng.choice(['Yes', 'No'])
+    if field_type == 'date':
+        return (BASE_TIME - timedelta(days=rng.randint(0, 5 * 365))).strftime('%Y-%m-%d')
+    if field_type == 'select':
+        return rng.choice(SELECT_OPTIONS)
+    return ' '.join(rng.sample(TEXT_WORDS, rng.randint(1, 4)))
+
+
+def timestamp(moment):
+    """`moment` in the format SQLite's CURRENT_TIMESTAMP uses"""
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def build_catalog(path, analyses=10, fields=20, objects=500, seed=42, field_types=None,
+                  empty_ratio=0.1):
+    """Create a fresh database at `path` and fill it, returning a summary dict
+
+    Each object leaves about `empty_ratio` of its fields without a value.
+    Rows are written in one transaction in bulk-load mode, like an import.
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    comparison_app.create_app({'DATABASE': path})
+    
+    conn = comparison_app.get_db_connection()
+    last_object_id = comparison_app.last_row_id(conn, 'objects')
+    last_value_id = comparison_app.last_row_id(conn, 'object_values')
+    comparison_app.begin_bulk_load(conn)
+    
+    analysis_ids, value_count = [], 0
+    for a in range(analyses):
+        category = rng.choice(sorted(CATEGORIES))
+        created_at = BASE_TIME + timedelta(days=a)
+        analysis_id = conn.execute('''
+            INSERT INTO analysis (name, description, category, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (f'{category} comparison {a + 1}', f'Synthetic {category.lower()} benchmark analysis',
+              category, timestamp(created_at), timestamp(created_at))).lastrowid
+        analysis_ids.append(analysis_id)
+        
+        analysis_fields, used_names = [], set()
+        for index, field_type in enumerate(choose_field_types(rng, fields, field_types)):
+            name, unit = rng.choice(FIELD_NAMES[field_type])
+            if name in used_names:
+                name = f'{name} {index + 1}'
+            used_names.add(name)
+            field_id = conn.execute('''
+                INSERT INTO fields (analysis_id, field_name, field_type, field_unit, display_order)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (analysis_id, name, field_type, unit, index)).lastrowid
+            analysis_fields.append({'id': field_id, 'field_type': field_type})
+        
+        brands = CATEGORIES[category]
+        for o in range(objects):
+            brand = rng.choice(brands)
+            moment = timestamp(created_at + timedelta(minutes=o))
+            object_id = conn.execute('''
+                INSERT INTO objects (analysis_id, object_name, brand, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (analysis_id, f'{brand} {rng.choice(MODEL_WORDS)} {rng.randint(1, 999)}',
+                  brand, moment, moment)).lastrowid
+            
+            rows = [
+                comparison_app.object_value_params(object_id, field, random_value(rng, field['field_type']))
+                for field in analysis_fields
+                if rng.random() >= empty_ratio
+            ]
+            conn.executemany(comparison_app.INSERT_OBJECT_VALUE_SQL, rows)
+            value_count += len(rows)
+    
+    comparison_app.finish_bulk_load(conn, last_object_id, last_value_id)
+    conn.commit()
+    conn.close()
+    
+    return {
+        'path': path,
+        'seed': seed,
+        'analyses': analyses,
+        'fields_per_analysis': fields,
+        'objects_per_analysis': objects,
+        'values': value_count,
+        'analysis_ids': analysis_ids,
+        'build_seconds': round(time.perf_counter() - started, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--analyses', type=int, default=10)
+    parser.add_argument('--fields', type=int, default=20)
+    parser.add_argument('--objects', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--empty-ratio', type=float, default=0.1)
+    args = parser.parse_args()
+    
+    if os.path.exists(args.path):
+        parser.error(f'{args.path} already exists')
+    
+    summary = build_catalog(args.path, args.analyses, args.fields, args.objects, args.seed,
+                            empty_ratio=args.empty_ratio)
+    print(f"{summary['analyses']} analyses, {summary['values']} values "
+          f"written to {args.path} in {summary['build_seconds']:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
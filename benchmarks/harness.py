@@ -0,0 +1,334 @@
+"""Benchmark harness: drive the real routes through the Flask test client
+
+Builds a seeded catalog (see catalog.py) in a throwaway directory, runs each
+scenario a fixed number of times and reports p50/p95/p99 latency, SQL
+statements per request and peak RSS as JSON. Runs from two commits can be
+compared directly:
+
+    python benchmarks/harness.py --output before.json
+    python benchmarks/harness.py --output after.json --baseline before.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_DIR)
+
+import app as comparison_app
+from benchmarks.catalog import CATEGORIES, TEXT_WORDS, build_catalog
+
+# One request issued by a scenario; `after` gets the response once it has been timed
+BenchRequest = namedtuple('BenchRequest', ['method', 'url', 'data', 'expected', 'after'],
+                          defaults=(None, 200, None))
+
+# Scenario functions by name, registered with @scenario in the order they run
+SCENARIOS = {}
+
+
+def scenario(name):
+    """Register a function that returns the next BenchRequest for scenario `name`"""
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+class BenchContext:
+    """Test client, seeded random source and the catalog rows the scenarios pick from"""
+    
+    def __init__(self, client, analysis_ids, seed):
+        self.client = client
+        self.analysis_ids = analysis_ids
+        self.rng = random.Random(seed)
+        self.copies = []
+        self.edit_forms = load_edit_forms(analysis_ids)
+        self._next = 0
+    
+    def next_analysis(self):
+        """The generated analyses in turn"""
+        analysis_id = self.analysis_ids[self._next % len(self.analysis_ids)]
+        self._next += 1
+        return analysis_id
+
+
+def load_edit_forms(analysis_ids, per_analysis=20):
+    """Complete edit forms for a few objects of each analysis, plus the field an edit changes"""
+    conn = comparison_app.get_db_connection()
+    forms = []
+    for analysis_id in analysis_ids:
+        object_ids = [row[0] for row in conn.execute(
+            'SELECT id FROM objects WHERE analysis_id = ? ORDER BY id LIMIT ?', (analysis_id, per_analysis)
+        )]
+        for object_id in object_ids:
+            matrix = comparison_app.load_comparison_matrix(conn, analysis_id, object_id=object_id)
+            obj = matrix.objects[0]
+            form = {'object_name': obj['object_name'], 'brand': obj['brand'] or '', 'image_url': ''}
+            for field in matrix.fields:
+                form[f"field_{field['id']}"] = matrix.values[object_id].get(field['id']) or ''
+            numeric = [field['id'] for field in matrix.fields
+                       if field['field_type'] in comparison_app.NUMERIC_FIELD_TYPES]
+            forms.append((analysis_id, object_id, form, numeric[0] if numeric else None))
+    conn.close()
+    return forms
+
+
+def wait_for_jobs(timeout=120):
+    """Block until no background job is queued or running"""
+    deadline = time.monotonic() + timeout
+    conn = comparison_app.open_db_connection()
+    try:
+        while conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+        ).fetchone()[0]:
+            if time.monotonic() > deadline:
+                raise RuntimeError('background jobs did not finish in time')
+            time.sleep(0.05)
+    finally:
+        conn.close()
+
+
+@scenario('dashboard')
+def dashboard(ctx):
+    return BenchRequest('GET', '/')
+
+
+@scenario('view_analysis')
+def view_analysis(ctx):
+    return BenchRequest('GET', f'/analysis/{ctx.next_analysis()}')
+
+
+@scenario('search')
+def search(ctx):
+    terms = TEXT_WORDS + [brand for brands in CATEGORIES.values() for brand in brands]
+    return BenchRequest('GET', f'/search?q={ctx.rng.choice(terms)}')
+
+
+@scenario('export_csv')
+def export_csv(ctx):
+    return BenchRequest('GET', f'/analysis/{ctx.next_analysis()}/export?format=csv')
+
+
+@scenario('export_json')
+def export_json(ctx):
+    return BenchRequest('GET', f'/analysis/{ctx.next_analysis()}/export?format=json')
+
+
+@scenario('edit_object')
+def edit_object(ctx):
+    analysis_id, object_id, form, numeric_field_id = ctx.rng.choice(ctx.edit_forms)
+    data = dict(form)
+    # Change one value so every submission is a real write
+    if numeric_field_id is not None:
+        data[f'field_{numeric_field_id}'] = str(ctx.rng.randint(1, 5))
+    else:
+        data['object_name'] = f"{form['object_name']} {ctx.rng.randint(1, 999)}"
+    return BenchRequest('POST', f'/analysis/{analysis_id}/objects/{object_id}/edit', data, expected=302)
+
+
+@scenario('duplicate_analysis')
+def duplicate_analysis(ctx):
+    def remember_copy(response):
+        ctx.copies.append(response.get_json()['new_analysis_id'])
+    return BenchRequest('POST', f'/analysis/{ctx.next_analysis()}/duplicate', after=remember_copy)
+
+
+@scenario('delete_analysis')
+def delete_analysis(ctx):
+    # Delete the copies made by duplicate_analysis, so the catalog itself stays the same size
+    if not ctx.copies:
+        response = ctx.client.post(f'/analysis/{ctx.next_analysis()}/duplicate')
+        ctx.copies.append(response.get_json()['new_analysis_id'])
+        response.close()
+    
+    # Reclaiming runs in the background; let it finish before the next timed request
+    return BenchRequest('DELETE', f'/analysis/{ctx.copies.pop()}/delete',
+                        after=lambda response: wait_for_jobs())
+
+
+@scenario('admin')
+def admin(ctx):
+    return BenchRequest('GET', '/admin')
+
+
+def total_sql_statements():
+    """SQL statements recorded by the request metrics so far, over every route"""
+    return sum(comparison_app.sql_statements.values().values())
+
+
+def peak_rss_kb():
+    """High-water mark of this process's resident set size in KiB, or None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux KiB
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def percentile(ordered, p):
+    """Linearly interpolated `p`th percentile of an already sorted list"""
+    rank = (len(ordered) - 1) * p / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def run_scenario(ctx, name, requests, warmup):
+    """Issue `warmup` + `requests` requests for scenario `name` and summarize the timed ones"""
+    latencies, statements = [], []
+    for iteration in range(warmup + requests):
+        bench_request = SCENARIOS[name](ctx)
+        
+        before = total_sql_statements()
+        started = time.perf_counter()
+        response = ctx.client.open(bench_request.url, method=bench_request.method,
+                                   data=bench_request.data)
+        response.get_data()
+        # Closing records the request metrics, including those of streamed bodies
+        response.close()
+        elapsed = time.perf_counter() - started
+        
+        if response.status_code != bench_request.expected:
+            raise RuntimeError(f'{name}: {bench_request.method} {bench_request.url} '
+                               f'returned {response.status_code}, expected {bench_request.expected}')
+        if iteration >= warmup:
+            latencies.append(elapsed * 1000)
+            statements.append(total_sql_statements() - before)
+        if bench_request.after:
+            bench_request.after(response)
+    
+    latencies.sort()
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'max_ms': round(latencies[-1], 3),
+        'queries_per_request': round(sum(statements) / len(statements), 2),
+        'max_queries_per_request': max(statements),
+        'peak_rss_kb': peak_rss_kb()
+    }
+
+
+def git_revision():
+    """Current commit and whether tracked files differ from it, or None outside a checkout"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return {'commit': commit, 'dirty': bool(dirty)}
+
+
+def print_comparison(report, baseline, out=sys.stderr):
+    """Table of this run against a previous report, scenario by scenario"""
+    if baseline.get('dataset', {}).get('parameters') != report['dataset']['parameters']:
+        print('warning: the baseline was run on a different dataset', file=out)
+    if baseline.get('meta', {}).get('response_cache') != report['meta']['response_cache']:
+        print('warning: the baseline was run with the response cache set differently', file=out)
+    
+    print(f"{'scenario':<20} {'p50 ms':>17} {'p95 ms':>17} {'queries':>15}", file=out)
+    for name, result in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            print(f"{name:<20} {'(new)':>17}", file=out)
+            continue
+        columns = []
+        for key in ('p50_ms', 'p95_ms'):
+            ratio = result[key] / previous[key] if previous[key] else float('inf')
+            columns.append(f'{result[key]:>8.1f} {ratio:>6.2f}x')
+        queries = f"{previous['queries_per_request']:g} -> {result['queries_per_request']:g}"
+        print(f'{name:<20} {columns[0]:>17} {columns[1]:>17} {queries:>15}', file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--analyses', type=int, default=5)
+    parser.add_argument('--fields', type=int, default=20)
+    parser.add_argument('--objects', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per scenario')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed requests per scenario')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help='comma-separated subset of: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--no-cache', action='store_true', help='disable the response cache')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='earlier JSON report to compare against')
+    args = parser.parse_args()
+    
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    
+    if args.no_cache:
+        comparison_app.response_cache.max_bytes = comparison_app.response_cache.max_entry_bytes = 0
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        comparison_app.JOB_ARTIFACT_DIR = os.path.join(tmp, 'jobs')
+        dataset = build_catalog(os.path.join(tmp, 'bench.db'), args.analyses, args.fields,
+                                args.objects, args.seed)
+        comparison_app.response_cache.clear()
+        
+        ctx = BenchContext(comparison_app.app.test_client(), dataset['analysis_ids'], args.seed)
+        results = {}
+        for name in names:
+            results[name] = run_scenario(ctx, name, args.requests, args.warmup)
+            print(f"{name:<20} p50 {results[name]['p50_ms']:>8.2f} ms  "
+                  f"p95 {results[name]['p95_ms']:>8.2f} ms  "
+                  f"{results[name]['queries_per_request']:>6g} queries", file=sys.stderr)
+        
+        wait_for_jobs()
+        comparison_app.close_thread_connections()
+    
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'git': git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'response_cache': not args.no_cache
+        },
+        'dataset': {
+            'parameters': {'analyses': args.analyses, 'fields': args.fields,
+                           'objects': args.objects, 'seed': args.seed},
+            'values': dataset['values'],
+            'build_seconds': dataset['build_seconds']
+        },
+        'scenarios': results,
+        'peak_rss_kb': peak_rss_kb()
+    }
+    
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
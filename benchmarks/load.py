@@ -0,0 +1,428 @@
+"""Concurrent load and lock-contention harness for multi-worker deployments
+
+Builds a seeded catalog (see catalog.py), serves a fresh copy of it from the
+pre-fork server in server.py for each worker count and replays a weighted mix
+of reads and writes from concurrent clients. Each run has two phases of
+--duration seconds: reads alone, then the full mix, so the report shows
+whether writers slow down readers as well as throughput, tail latency,
+`database is locked` error rates and WAL growth.
+
+    python benchmarks/load.py [--workers 1,2,4] [--clients 16] [--duration 10]
+                              [--mix view=40,search=15,export=5,create=15,edit=15,delete=5,reorder=5]
+
+Server settings come from the environment as usual (SQLITE_BUSY_TIMEOUT_MS,
+SQLITE_JOURNAL_MODE, ...), so configurations can be compared run by run.
+
+Any other server can be run with --server-command instead, e.g.
+
+    --server-command "gunicorn -w {workers} -b 127.0.0.1:{port} app:app"
+
+It is started from a directory holding the copy of the catalog as
+product_comparisons.db, with the repository on PYTHONPATH.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shlex
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_DIR)
+
+import app as comparison_app
+from benchmarks.catalog import TEXT_WORDS, build_catalog
+from benchmarks.harness import git_revision, percentile
+
+READ_OPS = ('view', 'search', 'export')
+WRITE_OPS = ('create', 'edit', 'delete', 'reorder')
+DEFAULT_MIX = 'view=40,search=15,export=5,create=15,edit=15,delete=5,reorder=5'
+
+# Seconds allowed for a single request before it counts as failed
+REQUEST_TIMEOUT = 60
+
+
+def parse_mix(text):
+    """{op: weight} from 'op=weight,...', rejecting unknown operations"""
+    mix = {}
+    for part in text.split(','):
+        op, _, weight = part.partition('=')
+        op = op.strip()
+        if op not in READ_OPS + WRITE_OPS:
+            raise ValueError(f'unknown operation {op!r}')
+        mix[op] = float(weight or 1)
+    return mix
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Catalog:
+    """Ids the clients pick from, shared between client threads"""
+    
+    def __init__(self, database):
+        conn = comparison_app.open_db_connection(database)
+        self.analysis_ids = [row[0] for row in conn.execute('SELECT id FROM analysis ORDER BY id')]
+        self.fields = {analysis_id: [] for analysis_id in self.analysis_ids}
+        for row in conn.execute('SELECT id, analysis_id, field_type FROM fields ORDER BY display_order, id'):
+            self.fields[row['analysis_id']].append((row['id'], row['field_type']))
+        self.objects = [tuple(row) for row in conn.execute('SELECT analysis_id, id FROM objects')]
+        conn.close()
+        self._lock = threading.Lock()
+    
+    def numeric_field(self, analysis_id):
+        for field_id, field_type in self.fields[analysis_id]:
+            if field_type in comparison_app.NUMERIC_FIELD_TYPES:
+                return field_id
+        return None
+    
+    def pick_object(self, rng, remove=False):
+        """A random (analysis_id, object_id), optionally taken out of the pool, or None"""
+        with self._lock:
+            if not self.objects:
+                return None
+            index = rng.randrange(len(self.objects))
+            if not remove:
+                return self.objects[index]
+            # Swap-remove keeps this O(1)
+            self.objects[index], self.objects[-1] = self.objects[-1], self.objects[index]
+            return self.objects.pop()
+
+
+class Client:
+    """One HTTP connection per request against the server under test"""
+    
+    def __init__(self, port):
+        self.port = port
+    
+    def request(self, method, path, body=None, headers=None):
+        """(status, headers, body) of one request"""
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=REQUEST_TIMEOUT)
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            return response.status, response.headers, response.read()
+        finally:
+            conn.close()
+    
+    def json(self, method, path, data):
+        return self.request(method, path, json.dumps(data), {'Content-Type': 'application/json'})
+    
+    def form(self, method, path, data):
+        return self.request(method, path, urlencode(data),
+                            {'Content-Type': 'application/x-www-form-urlencoded'})
+
+
+def is_lock_error(body):
+    text = body.lower()
+    return b'database is locked' in text or b'database table is locked' in text
+
+
+def json_outcome(status, body, missing_ok=False):
+    if status == 200:
+        return 'ok'
+    if status == 404 and missing_ok:
+        return 'missing'
+    return 'locked' if is_lock_error(body) else f'error_{status}'
+
+
+def run_op(op, client, catalog, rng):
+    """Perform one operation and classify how it went"""
+    analysis_id = rng.choice(catalog.analysis_ids)
+    
+    if op == 'view':
+        status, _, body = client.request('GET', f'/analysis/{analysis_id}')
+    elif op == 'search':
+        status, _, body = client.request('GET', f'/search?q={rng.choice(TEXT_WORDS)}')
+    elif op == 'export':
+        status, _, body = client.request('GET', f'/analysis/{analysis_id}/export?format=csv')
+    elif op == 'create':
+        data = {'object_name': f'Load test {rng.randrange(10 ** 6)}', 'brand': 'Load'}
+        field_id = catalog.numeric_field(analysis_id)
+        if field_id is not None:
+            data[f'field_{field_id}'] = str(rng.randint(1, 5))
+        status, headers, body = client.form('POST', f'/analysis/{analysis_id}/objects', data)
+        # The form route reports failures by flashing a message and redirecting back to the form
+        if status == 302 and headers.get('Location', '').endswith('/objects/new'):
+            _, _, page = client.request('GET', headers['Location'],
+                                        headers={'Cookie': headers.get('Set-Cookie', '').split(';')[0]})
+            return 'locked' if is_lock_error(page) else 'error_form'
+        return 'ok' if status == 302 else f'error_{status}'
+    elif op == 'edit':
+        picked = catalog.pick_object(rng)
+        if picked is None:
+            return 'missing'
+        analysis_id, object_id = picked
+        field_id = catalog.numeric_field(analysis_id)
+        data = {f'field_{field_id}': str(rng.randint(1, 5))} if field_id else {'brand': 'Edited'}
+        status, _, body = client.json('PATCH', f'/analysis/{analysis_id}/objects/{object_id}', data)
+        return json_outcome(status, body, missing_ok=True)
+    elif op == 'delete':
+        picked = catalog.pick_object(rng, remove=True)
+        if picked is None:
+            return 'missing'
+        analysis_id, object_id = picked
+        status, _, body = client.request('DELETE', f'/analysis/{analysis_id}/objects/{object_id}')
+        return json_outcome(status, body, missing_ok=True)
+    else:
+        field_ids = [field_id for field_id, _ in catalog.fields[analysis_id]]
+        rng.shuffle(field_ids)
+        status, _, body = client.json('POST', f'/analysis/{analysis_id}/fields/reorder',
+                                      {'field_ids': field_ids})
+    return json_outcome(status, body)
+
+
+def drive(port, catalog, mix, clients, duration, seed):
+    """Run `clients` threads replaying `mix` for `duration` seconds; returns (samples, seconds)"""
+    ops, weights = list(mix), list(mix.values())
+    samples = []
+    samples_lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = Client(port)
+        local = []
+        while time.monotonic() < deadline:
+            op = rng.choices(ops, weights)[0]
+            started = time.perf_counter()
+            try:
+                outcome = run_op(op, client, catalog, rng)
+            except (OSError, http.client.HTTPException):
+                outcome = 'failed'
+            local.append((op, outcome, time.perf_counter() - started))
+        with samples_lock:
+            samples.extend(local)
+    
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.monotonic() - started
+
+
+def latency_summary(latencies):
+    if not latencies:
+        return None
+    ordered = sorted(seconds * 1000 for seconds in latencies)
+    return {
+        'p50_ms': round(percentile(ordered, 50), 2),
+        'p95_ms': round(percentile(ordered, 95), 2),
+        'p99_ms': round(percentile(ordered, 99), 2),
+        'max_ms': round(ordered[-1], 2)
+    }
+
+
+def summarize(samples, elapsed):
+    """Throughput, per-operation outcomes and latency tails of one phase"""
+    by_op = {}
+    for op, outcome, seconds in samples:
+        entry = by_op.setdefault(op, {'count': 0, 'outcomes': {}, 'latencies': []})
+        entry['count'] += 1
+        entry['outcomes'][outcome] = entry['outcomes'].get(outcome, 0) + 1
+        entry['latencies'].append(seconds)
+    
+    writes = [outcome for op, outcome, _ in samples if op in WRITE_OPS]
+    return {
+        'requests': len(samples),
+        'seconds': round(elapsed, 2),
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'reads': latency_summary([seconds for op, _, seconds in samples if op in READ_OPS]),
+        'writes': latency_summary([seconds for op, _, seconds in samples if op in WRITE_OPS]),
+        'locked_errors': writes.count('locked'),
+        'locked_rate': round(writes.count('locked') / len(writes), 4) if writes else 0.0,
+        'errors': sum(1 for _, outcome, _ in samples if outcome not in ('ok', 'missing', 'locked')),
+        'operations': {
+            op: dict(count=entry['count'], outcomes=entry['outcomes'], **latency_summary(entry['latencies']))
+            for op, entry in sorted(by_op.items())
+        }
+    }
+
+
+class FileSizeMonitor(threading.Thread):
+    """Samples a file's size in the background and remembers the largest seen"""
+    
+    def __init__(self, path, interval=0.2):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.max_bytes = 0
+        self._halt = threading.Event()
+    
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+    
+    def run(self):
+        while not self._halt.is_set():
+            self.max_bytes = max(self.max_bytes, self.size())
+            self._halt.wait(self.interval)
+    
+    def stop(self):
+        self._halt.set()
+        self.join()
+        self.max_bytes = max(self.max_bytes, self.size())
+
+
+def start_server(database, workers, log_path, command=None):
+    """Launch the server subprocess and wait until it answers /health"""
+    port = free_port()
+    if command:
+        argv = shlex.split(command.format(port=port, workers=workers, python=sys.executable))
+    else:
+        argv = [sys.executable, os.path.join(REPO_DIR, 'server.py'), '--host', '127.0.0.1',
+                '--port', str(port), '--workers', str(workers), '--database', database]
+    
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [REPO_DIR, env.get('PYTHONPATH')]))
+    log = open(log_path, 'ab')
+    # The app's default database path is relative, so run from the directory holding the copy
+    process = subprocess.Popen(argv, cwd=os.path.dirname(database), env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    
+    client = Client(port)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with {process.returncode}, see {log_path}')
+        try:
+            if client.request('GET', '/health')[0] == 200:
+                return process, port
+        except OSError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f'server did not start, see {log_path}')
+
+
+def run_workers(template, tmp, workers, args, mix):
+    """Both phases against a fresh copy of the catalog served by `workers` processes"""
+    directory = os.path.join(tmp, f'workers_{workers}')
+    os.mkdir(directory)
+    database = os.path.join(directory, 'product_comparisons.db')
+    shutil.copyfile(template, database)
+    catalog = Catalog(database)
+    
+    process, port = start_server(database, workers, os.path.join(directory, 'server.log'),
+                                 args.server_command)
+    try:
+        read_mix = {op: weight for op, weight in mix.items() if op in READ_OPS}
+        reads_alone = None
+        if read_mix:
+            reads_alone = summarize(*drive(port, catalog, read_mix, args.clients, args.duration, args.seed))
+        
+        db_bytes = os.path.getsize(database)
+        wal = FileSizeMonitor(database + '-wal')
+        wal.start()
+        mixed = summarize(*drive(port, catalog, mix, args.clients, args.duration, args.seed + 1))
+        wal.stop()
+    finally:
+        process.terminate()
+        process.wait()
+    
+    return {
+        'workers': workers,
+        'reads_alone': reads_alone,
+        'mixed': mixed,
+        'wal': {'max_bytes': wal.max_bytes, 'final_bytes': wal.size()},
+        'database_bytes': {'before': db_bytes, 'after': os.path.getsize(database)}
+    }
+
+
+def print_run(result, out=sys.stderr):
+    mixed, alone = result['mixed'], result['reads_alone']
+    slowdown = '-'
+    if alone and mixed['reads'] and alone['reads']['p95_ms']:
+        slowdown = f"{mixed['reads']['p95_ms'] / alone['reads']['p95_ms']:.2f}x"
+    print(f"{result['workers']:>7} {mixed['throughput_rps']:>9} "
+          f"{mixed['reads']['p95_ms'] if mixed['reads'] else '-':>10} "
+          f"{mixed['writes']['p95_ms'] if mixed['writes'] else '-':>11} "
+          f"{mixed['writes']['p99_ms'] if mixed['writes'] else '-':>11} "
+          f"{mixed['locked_rate'] * 100:>7.2f}% {mixed['errors']:>6} "
+          f"{result['wal']['max_bytes'] / 1024 / 1024:>9.1f} {slowdown:>17}", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker process counts')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent client threads')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per phase')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='op=weight pairs; ops: '
+                        + ', '.join(READ_OPS + WRITE_OPS))
+    parser.add_argument('--analyses', type=int, default=5)
+    parser.add_argument('--fields', type=int, default=20)
+    parser.add_argument('--objects', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--server-command',
+                        help='server to run instead of the built-in one; {port} and {workers} are filled in')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+    
+    try:
+        mix = parse_mix(args.mix)
+        worker_counts = [int(count) for count in args.workers.split(',')]
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if max(worker_counts) > (os.cpu_count() or 1):
+        print(f'note: {os.cpu_count()} CPU cores, so more workers than that cannot add throughput',
+              file=sys.stderr)
+    
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, 'catalog.db')
+        dataset = build_catalog(template, args.analyses, args.fields, args.objects, args.seed)
+        # Closing the last connection checkpoints the WAL so the file can be copied on its own
+        comparison_app.close_thread_connections()
+        
+        print(f"{'workers':>7} {'req/s':>9} {'read p95':>10} {'write p95':>11} {'write p99':>11} "
+              f"{'locked':>8} {'errors':>6} {'WAL MiB':>9} {'read p95 vs alone':>17}", file=sys.stderr)
+        for workers in worker_counts:
+            results.append(run_workers(template, tmp, workers, args, mix))
+            print_run(results[-1])
+    
+    report = {
+        'meta': {
+            'git': git_revision(),
+            'clients': args.clients,
+            'duration_seconds': args.duration,
+            'mix': mix,
+            'busy_timeout_ms': comparison_app.SQLITE_PRAGMAS['busy_timeout'],
+            'journal_mode': comparison_app.SQLITE_PRAGMAS['journal_mode'],
+            'server': args.server_command or 'server.py',
+            'cpu_count': os.cpu_count()
+        },
+        'dataset': {
+            'parameters': {'analyses': args.analyses, 'fields': args.fields,
+                           'objects': args.objects, 'seed': args.seed},
+            'values': dataset['values']
+        },
+        'runs': results
+    }
+    
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""Near-duplicate detection over object names and brands, blocked by shared trigrams"""
+import re
+import threading
+from collections import Counter, OrderedDict, namedtuple
+
+# What two objects are compared on: the trigrams of the name without the
+# brand's words, the brand, and the numbers in the name
+NameKey = namedtuple('NameKey', 'grams brand numbers')
+
+
+def words(text):
+    """Lowercase alphanumeric runs of a text"""
+    return re.findall(r'[a-z0-9]+', (text or '').lower())
+
+
+def name_key(name, brand):
+    """NameKey of an object
+
+    Spacing and punctuation are dropped before taking trigrams, so
+    "WH-1000XM5" and "WH1000 XM5" come out the same.
+    """
+    brand_words = words(brand)
+    name_words = [word for word in words(name) if word not in brand_words] or words(name)
+    text = '$' + ''.join(name_words)
+    grams = frozenset(text[i:i + 3] for i in range(len(text) - 2)) or frozenset([text])
+    return NameKey(grams, ''.join(brand_words), frozenset(re.findall(r'[0-9]+', ' '.join(name_words))))
+
+
+def comparable(key, other):
+    """Whether two objects may be duplicates at all: brands and model numbers must not disagree"""
+    return (not key.brand or not other.brand or key.brand == other.brand) and key.numbers == other.numbers
+
+
+def similarity(key, other):
+    """Dice coefficient of the name trigrams of two objects"""
+    return 2 * len(key.grams & other.grams) / (len(key.grams) + len(other.grams))
+
+
+class DedupIndex:
+    """Trigram postings of the object names of one analysis as of analysis `version`
+
+    Postings are keyed by the numbers in the name as well as the trigram,
+    since objects whose model numbers differ are never duplicates. Only
+    objects sharing a posting with an object are compared with it, and
+    postings of more than `stop_ratio` of the objects (and at least
+    `min_stop` of them) are too common to block on. Reads and in-place
+    updates are serialized by a per-index lock.
+    """
+
+    def __init__(self, objects, version, stop_ratio=0.05, min_stop=64):
+        self.version = version
+        self.stop_ratio = stop_ratio
+        self.min_stop = min_stop
+        self.keys = {}
+        self.postings = {}
+        self._lock = threading.Lock()
+        for object_id, name, brand in objects:
+            self._add(object_id, name_key(name, brand))
+
+    def _add(self, object_id, key):
+        self.keys[object_id] = key
+        for gram in key.grams:
+            self.postings.setdefault((key.numbers, gram), set()).add(object_id)
+
+    def _remove(self, object_id):
+        key = self.keys.pop(object_id, None)
+        if key is None:
+            return
+        for gram in key.grams:
+            posting = self.postings[key.numbers, gram]
+            posting.discard(object_id)
+            if not posting:
+                del self.postings[key.numbers, gram]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def apply_object(self, object_id, name, brand, version):
+        """Apply one object's name and brand after the write that produced `version`
+
+        `name` is None when the object was deleted. Applies only if the
+        index reflects the version right before that write; returns whether
+        it did.
+        """
+        with self._lock:
+            if self.version != version - 1:
+                return False
+            self._remove(object_id)
+            if name is not None:
+                self._add(object_id, name_key(name, brand))
+            self.version = version
+            return True
+
+    def object_ids(self):
+        """Ids of the indexed objects in ascending order"""
+        with self._lock:
+            return sorted(self.keys)
+
+    def matches(self, object_id, threshold, higher_only=False):
+        """(other_id, similarity) of the objects at least `threshold` similar to one object
+
+        With `higher_only` just objects with a higher id are considered, so
+        going over every object this way finds each pair once.
+        """
+        with self._lock:
+            key = self.keys.get(object_id)
+            if key is None:
+                return []
+            stop = max(self.min_stop, int(len(self.keys) * self.stop_ratio))
+            counts, common = Counter(), 0
+            for gram in key.grams:
+                posting = self.postings[key.numbers, gram]
+                if len(posting) > stop:
+                    common += 1
+                else:
+                    counts.update(posting)
+
+            found = []
+            for other_id, shared in counts.items():
+                if other_id == object_id or (higher_only and other_id < object_id):
+                    continue
+                other = self.keys[other_id]
+                # At most the counted trigrams and the common ones are shared
+                if 2 * (shared + common) < threshold * (len(key.grams) + len(other.grams)):
+                    continue
+                if comparable(key, other):
+                    score = similarity(key, other)
+                    if score >= threshold:
+                        found.append((other_id, score))
+            return sorted(found, key=lambda match: (-match[1], match[0]))
+
+
+def cluster_pairs(pairs):
+    """Group (object_id, other_id, similarity) pairs into clusters of connected objects
+
+    Returns (members, similarity, pairs) per cluster, most similar first.
+    A cluster's similarity is the weakest link needed to hold it together:
+    the lowest similarity on its maximum spanning tree.
+    """
+    parent = {}
+
+    def find(object_id):
+        root = parent.setdefault(object_id, object_id)
+        while root != parent[root]:
+            root = parent[root]
+        while object_id != root:
+            parent[object_id], object_id = root, parent[object_id]
+        return root
+
+    weakest = {}
+    for object_id, other_id, score in sorted(pairs, key=lambda pair: -pair[2]):
+        root, other_root = find(object_id), find(other_id)
+        if root != other_root:
+            parent[other_root] = root
+            # Pairs come strongest first, so each join is the weakest link so far
+            weakest.pop(other_root, None)
+            weakest[root] = score
+
+    clusters = {}
+    for pair in pairs:
+        clusters.setdefault(find(pair[0]), []).append(pair)
+    return sorted(
+        ((sorted(set().union(*((pair[0], pair[1]) for pair in members))), weakest[root],
+          sorted(members, key=lambda pair: -pair[2]))
+         for root, members in clusters.items()),
+        key=lambda cluster: (-cluster[1], cluster[0][0])
+    )
+
+
+class DedupCache:
+    """Thread-safe LRU of DedupIndexes keyed by analysis id"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, analysis_id, version):
+        """The cached index if it reflects `version`, else None"""
+        with self._lock:
+            index = self._indexes.get(analysis_id)
+            if index is None or index.version != version:
+                self.misses += 1
+                return None
+            self._indexes.move_to_end(analysis_id)
+            self.hits += 1
+            return index
+
+    def peek(self, analysis_id):
+        """The cached index of an analysis whatever its version, or None"""
+        with self._lock:
+            return self._indexes.get(analysis_id)
+
+    def put(self, analysis_id, index):
+        """Store `index`, evicting the least recently used ones beyond `max_entries`"""
+        with self._lock:
+            self._indexes[analysis_id] = index
+            self._indexes.move_to_end(analysis_id)
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+
+    def clear(self):
+        """Drop every index"""
+        with self._lock:
+            self._indexes.clear()
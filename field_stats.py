@@ -0,0 +1,132 @@
+"""Per-field summary statistics of an analysis, carried over object writes incrementally"""
+import math
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+
+class FieldSummary:
+    """Values of one field by object, kept sorted for order statistics, with running sums
+
+    Count, sum, minimum and maximum are read in O(1) and the median by
+    index; changing one value is a bisect plus one array insert or delete.
+    """
+
+    def __init__(self, values):
+        self.values = dict(values)
+        self.sorted = array('d', sorted(self.values.values()))
+        self.total = math.fsum(self.sorted)
+        self.total_squares = math.fsum(value * value for value in self.sorted)
+
+    def set(self, object_id, value):
+        """Set or (with None or NaN) clear the value of one object"""
+        old = self.values.pop(object_id, None)
+        if old is not None:
+            del self.sorted[bisect_left(self.sorted, old)]
+            self.total -= old
+            self.total_squares -= old * old
+        if value is not None and value == value:
+            self.values[object_id] = value
+            self.sorted.insert(bisect_right(self.sorted, value), value)
+            self.total += value
+            self.total_squares += value * value
+        if not self.sorted:
+            self.total = self.total_squares = 0.0
+
+    def stats(self, object_count, lower_is_better=False):
+        """count, fill_rate, min, max, mean, median, spread (standard deviation) and best value"""
+        count = len(self.sorted)
+        stats = {'count': count, 'fill_rate': count / object_count if object_count else 0.0}
+        if not count:
+            return dict(stats, min=None, max=None, mean=None, median=None, spread=None, best=None)
+
+        mean = self.total / count
+        middle = count // 2
+        median = self.sorted[middle] if count % 2 else (self.sorted[middle - 1] + self.sorted[middle]) / 2
+        return dict(stats,
+                    min=self.sorted[0],
+                    max=self.sorted[-1],
+                    mean=mean,
+                    median=median,
+                    spread=math.sqrt(max(self.total_squares / count - mean * mean, 0.0)),
+                    best=self.sorted[0] if lower_is_better else self.sorted[-1])
+
+
+class AnalysisSummary:
+    """FieldSummaries of the objects of one analysis as of analysis `version`
+
+    `columns` maps field ids to {object_id: value}. Reads and in-place
+    updates are serialized by a per-summary lock.
+    """
+
+    def __init__(self, object_ids, columns, version):
+        self.objects = set(object_ids)
+        self.fields = {field_id: FieldSummary(values) for field_id, values in columns.items()}
+        self.version = version
+        self._lock = threading.Lock()
+
+    def apply_object(self, object_id, values, version):
+        """Apply one object's values {field_id: value} after the write that produced `version`
+
+        `values` is None when the object was deleted. Applies only if the
+        summary reflects the version right before that write; returns
+        whether it did.
+        """
+        with self._lock:
+            if self.version != version - 1:
+                return False
+            if values is None:
+                self.objects.discard(object_id)
+            else:
+                self.objects.add(object_id)
+            for field_id, summary in self.fields.items():
+                summary.set(object_id, None if values is None else values.get(field_id))
+            self.version = version
+            return True
+
+    def stats(self, lower_is_better=()):
+        """{field_id: FieldSummary.stats()}, the best value of fields in `lower_is_better` being the lowest"""
+        with self._lock:
+            return {field_id: summary.stats(len(self.objects), field_id in lower_is_better)
+                    for field_id, summary in self.fields.items()}
+
+
+class SummaryCache:
+    """Thread-safe LRU of AnalysisSummaries keyed by analysis id"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, analysis_id, version):
+        """The cached summary if it reflects `version`, else None"""
+        with self._lock:
+            summary = self._summaries.get(analysis_id)
+            if summary is None or summary.version != version:
+                self.misses += 1
+                return None
+            self._summaries.move_to_end(analysis_id)
+            self.hits += 1
+            return summary
+
+    def peek(self, analysis_id):
+        """The cached summary of an analysis whatever its version, or None"""
+        with self._lock:
+            return self._summaries.get(analysis_id)
+
+    def put(self, analysis_id, summary):
+        """Store `summary`, evicting the least recently used ones beyond `max_entries`"""
+        with self._lock:
+            self._summaries[analysis_id] = summary
+            self._summaries.move_to_end(analysis_id)
+            while len(self._summaries) > self.max_entries:
+                self._summaries.popitem(last=False)
+
+    def clear(self):
+        """Drop every summary"""
+        with self._lock:
+            self._summaries.clear()
@@ -0,0 +1,152 @@
+"""In-process metrics registry rendered in the Prometheus text exposition format"""
+import threading
+from bisect import bisect_left
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Common bookkeeping for a named metric with a fixed set of label names"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.label_names):
+            raise ValueError(f'{self.name} expects labels {self.label_names}')
+        return tuple(str(label) for label in labels)
+
+    def replace(self, readings):
+        """Swap in a complete {labels: value} reading taken from elsewhere, e.g. by a collector"""
+        values = {self._key(labels): value for labels, value in readings.items()}
+        with self._lock:
+            self._values = values
+
+    def values(self):
+        """Snapshot of the current {labels: value} readings"""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._samples(labels, value))
+        return lines
+
+    def _samples(self, labels, value):
+        return [f'{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    """Monotonically increasing total per label combination"""
+
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that is set to its current reading"""
+
+    kind = 'gauge'
+
+    def set(self, labels=(), value=0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count of observations per label combination"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels=(), value=0):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self, labels, state):
+        counts, total, count = state
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            label_text = _format_labels(self.label_names, labels, [('le', _format_value(float(bound)))])
+            lines.append(f'{self.name}_bucket{label_text} {cumulative}')
+        label_text = _format_labels(self.label_names, labels)
+        lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+        lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics plus collectors that refresh gauges just before rendering"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, label_names=()):
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name, documentation, label_names=()):
+        return self._register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def collector(self, func):
+        """Register `func` to run before every render, e.g. to set gauges; usable as a decorator"""
+        self._collectors.append(func)
+        return func
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        for collect in self._collectors:
+            collect()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
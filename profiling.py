@@ -0,0 +1,302 @@
+"""Request profiling: cProfile on demand and low-rate stack sampling for flame graphs"""
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlencode
+
+# Names of stored profiles: creation time plus a random suffix
+PROFILE_NAME = re.compile(r'^\d{8}T\d{6}-[0-9a-f]{8}$')
+
+# Query parameter and header that ask for a request to be profiled
+PROFILE_PARAMETER = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+
+def _stack_frames(frame, roots):
+    names = []
+    while frame is not None and frame.f_code not in roots:
+        module = frame.f_globals.get('__name__') or os.path.basename(frame.f_code.co_filename)
+        names.append(f'{module}:{frame.f_code.co_name}')
+        frame = frame.f_back
+    return names
+
+
+def collapse_stack(frame, label, roots=()):
+    """`frame`'s stack in collapsed-stack format, 'label;outermost;...;innermost'
+
+    Frames from `roots` outwards (the server around the application) are left out.
+    """
+    return ';'.join([label] + _stack_frames(frame, roots)[::-1])
+
+
+class StackSampler:
+    """Background thread counting the stacks of the threads it tracks every `interval` seconds
+
+    Counts are kept per process and rewritten to `stacks-<pid>.folded` in
+    `directory` at most every `flush_seconds`, so every worker contributes
+    its own file. At most `max_stacks` distinct stacks are counted.
+    """
+
+    def __init__(self, directory, interval=0.005, flush_seconds=10, max_stacks=20000, roots=()):
+        self.directory = directory
+        self.interval = interval
+        self.flush_seconds = flush_seconds
+        self.max_stacks = max_stacks
+        self.roots = set(roots)
+        self.counts = Counter()
+        self.dropped = 0
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self._last_flush = time.monotonic()
+
+    def track(self, ident, label):
+        """Start sampling thread `ident`, filing its stacks under `label`"""
+        with self._lock:
+            # Threads do not survive a fork, so each worker starts its own
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self.counts = Counter()
+                threading.Thread(target=self._run, name='stack-sampler', daemon=True).start()
+            self._threads[ident] = label
+        self._wake.set()
+
+    def untrack(self, ident):
+        """Stop sampling thread `ident`, writing the counts out if it is time to"""
+        with self._lock:
+            self._threads.pop(ident, None)
+        if time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                threads = dict(self._threads)
+            if not threads:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            frames = sys._current_frames()
+            stacks = [collapse_stack(frames[ident], label, self.roots)
+                      for ident, label in threads.items() if ident in frames]
+            with self._lock:
+                for stack in stacks:
+                    if stack in self.counts or len(self.counts) < self.max_stacks:
+                        self.counts[stack] += 1
+                    else:
+                        self.dropped += 1
+            time.sleep(self.interval)
+
+    def flush(self):
+        """Rewrite this process's stack file from the current counts"""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self.counts:
+                return
+            lines = [f'{stack} {count}\n' for stack, count in self.counts.items()]
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'stacks-{os.getpid()}.folded')
+        with open(path + '.tmp', 'w') as f:
+            f.writelines(lines)
+        os.replace(path + '.tmp', path)
+
+
+class RequestProfiler:
+    """WSGI middleware profiling the requests that ask for it and a random sample of the rest
+
+    A request carrying `token` in the X-Profile header or the _profile query
+    parameter runs under cProfile; the stats are saved in `directory` and
+    named in the X-Profile-Id response header. Only one such request is
+    profiled at a time per process; others get X-Profile: busy. With a
+    `sample_rate` above zero, that fraction of all requests is followed by a
+    StackSampler instead. `label(environ)` names the sampled stacks' route.
+    """
+
+    def __init__(self, app, directory, token=None, sample_rate=0.0, label=None, keep=50):
+        self.app = app
+        self.directory = directory
+        self.token = token
+        self.sample_rate = sample_rate
+        self.label = label or (lambda environ: f"{environ['REQUEST_METHOD']} {environ.get('PATH_INFO', '')}")
+        self.keep = keep
+        self.sampler = StackSampler(directory, roots=[RequestProfiler.__call__.__code__,
+                                                      RequestProfiler._sampled_body.__code__])
+        self._profile_lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        if self.token and self._requested(environ):
+            return self._profile(environ, start_response)
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            ident = threading.get_ident()
+            self.sampler.track(ident, self.label(environ))
+            try:
+                body = self.app(environ, start_response)
+            except BaseException:
+                self.sampler.untrack(ident)
+                raise
+            return self._sampled_body(body, ident)
+        return self.app(environ, start_response)
+
+    def _requested(self, environ):
+        supplied = environ.get(PROFILE_HEADER)
+        if supplied is None and PROFILE_PARAMETER in environ.get('QUERY_STRING', ''):
+            supplied = dict(parse_qsl(environ['QUERY_STRING'])).get(PROFILE_PARAMETER)
+        return supplied is not None and hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    def _sampled_body(self, body, ident):
+        try:
+            yield from body
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+            self.sampler.untrack(ident)
+
+    def _profile(self, environ, start_response):
+        if not self._profile_lock.acquire(blocking=False):
+            def busy_response(status, headers, exc_info=None):
+                return start_response(status, headers + [('X-Profile', 'busy')], exc_info)
+            return self.app(environ, busy_response)
+
+        name = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        statuses = []
+
+        def profiled_response(status, headers, exc_info=None):
+            statuses.append(status)
+            return start_response(status, headers + [('X-Profile-Id', name)], exc_info)
+
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                body = self.app(environ, profiled_response)
+            finally:
+                profile.disable()
+        except BaseException:
+            self._profile_lock.release()
+            raise
+
+        # Streamed bodies do most of their work while being iterated, so that is profiled too
+        def finish():
+            try:
+                self._save(name, profile, environ, statuses[-1] if statuses else None,
+                           time.perf_counter() - started)
+            finally:
+                self._profile_lock.release()
+
+        return self._profiled_body(body, profile, finish)
+
+    def _profiled_body(self, body, profile, finish):
+        try:
+            iterator = iter(body)
+            while True:
+                profile.enable()
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    profile.disable()
+                yield chunk
+        finally:
+            try:
+                if hasattr(body, 'close'):
+                    profile.enable()
+                    try:
+                        body.close()
+                    finally:
+                        profile.disable()
+            finally:
+                finish()
+
+    def _save(self, name, profile, environ, status, seconds):
+        os.makedirs(self.directory, exist_ok=True)
+        profile.dump_stats(os.path.join(self.directory, f'{name}.prof'))
+
+        # Never store the token itself
+        query = urlencode([(key, value) for key, value in parse_qsl(environ.get('QUERY_STRING', ''))
+                           if key != PROFILE_PARAMETER])
+        meta = {
+            'name': name,
+            'method': environ['REQUEST_METHOD'],
+            'path': environ.get('PATH_INFO', '') + (f'?{query}' if query else ''),
+            'status': status,
+            'duration_ms': round(seconds * 1000, 2),
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'pid': os.getpid()
+        }
+        with open(os.path.join(self.directory, f'{name}.json'), 'w') as f:
+            json.dump(meta, f)
+
+        for old in list_profiles(self.directory)[self.keep:]:
+            for extension in ('.prof', '.json'):
+                try:
+                    os.remove(os.path.join(self.directory, old['name'] + extension))
+                except OSError:
+                    pass
+
+
+def list_profiles(directory):
+    """Metadata of the stored profiles, newest first"""
+    try:
+        names = sorted((entry[:-5] for entry in os.listdir(directory)
+                        if entry.endswith('.json') and PROFILE_NAME.match(entry[:-5])), reverse=True)
+    except FileNotFoundError:
+        return []
+
+    profiles = []
+    for name in names:
+        try:
+            with open(os.path.join(directory, f'{name}.json')) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def profile_path(directory, name):
+    """Path of the stats file of profile `name`, or None if there is no such profile"""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = os.path.join(directory, f'{name}.prof')
+    return path if os.path.exists(path) else None
+
+
+def profile_summary(path, sort='cumulative', limit=60):
+    """Text report of the top `limit` functions of a stats file"""
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def merged_stacks(directory):
+    """Collapsed stacks of every process's stack file, summed, as 'stack count' lines"""
+    totals = Counter()
+    try:
+        entries = [entry for entry in os.listdir(directory)
+                   if entry.startswith('stacks-') and entry.endswith('.folded')]
+    except FileNotFoundError:
+        return ''
+    for entry in entries:
+        try:
+            with open(os.path.join(directory, entry)) as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack and count.isdigit():
+                        totals[stack] += int(count)
+        except OSError:
+            continue
+    return ''.join(f'{stack} {count}\n' for stack, count in totals.most_common())
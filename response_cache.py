@@ -0,0 +1,71 @@
+"""In-process LRU cache for rendered responses, bounded by the total size of the cached bodies"""
+import threading
+from collections import OrderedDict, namedtuple
+
+# A cached response body with the headers needed to replay it
+CachedResponse = namedtuple('CachedResponse', ['body', 'mimetype', 'headers'])
+
+
+class ResponseCache:
+    """Thread-safe LRU mapping of cache keys to CachedResponse entries
+
+    The least recently used entries are evicted once the summed body size
+    would exceed `max_bytes`. Bodies larger than `max_entry_bytes` are never
+    stored, so one huge export cannot flush everything else.
+    """
+
+    def __init__(self, max_bytes, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes // 8
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the entry for `key` and mark it recently used, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        """Store `entry` under `key`, evicting old entries to stay within budget"""
+        size = len(entry.body)
+        if size > self.max_entry_bytes:
+            return False
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.body)
+
+            while self._entries and self._size + size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+
+            self._entries[key] = entry
+            self._size += size
+        return True
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """Current entry count, byte size and hit/miss counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -34,17 +34,18 @@ mkdir -p data
 # Set production environment variables
 export FLASK_ENV=production
 export FLASK_DEBUG=false
+# Worker processes default to one per CPU core; override with WEB_CONCURRENCY
+export PORT=${PORT:-5007}
 
 # Function to cleanup processes on exit
 cleanup() {
     echo ""
     echo "🛑 Shutting down Product Comparison Hub..."
-    if [ ! -z "$FLASK_PID" ]; then
-        kill $FLASK_PID 2>/dev/null
-        wait $FLASK_PID 2>/dev/null
+    if [ ! -z "$SERVER_PID" ]; then
+        # The server lets its workers finish their in-flight requests before exiting
+        kill $SERVER_PID 2>/dev/null
+        wait $SERVER_PID 2>/dev/null
     fi
-    # Kill any remaining python processes running the app
-    pkill -f "python.*app.py" 2>/dev/null || true
     echo "✅ Server stopped successfully."
     exit 0
 }
@@ -53,12 +54,13 @@ cleanup() {
 trap cleanup SIGINT SIGTERM EXIT
 
 # Start the application
-echo "🌟 Starting the application on http://localhost:5007"
+echo "🌟 Starting the application on http://localhost:$PORT"
 echo "⏹️  Press Ctrl+C to stop the application"
 
-# Start Python application in background and capture PID
-python3 app.py &
-FLASK_PID=$!
+# Start the pre-fork server in background and capture PID
+python3 server.py &
+SERVER_PID=$!
+echo "🔄 Reload code without downtime with: kill -HUP $SERVER_PID"
 
 # Wait for the background process
-wait $FLASK_PID
+wait $SERVER_PID
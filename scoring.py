@@ -0,0 +1,212 @@
+"""Weighted multi-criteria scores over the typed values of an analysis"""
+import heapq
+import math
+import threading
+from array import array
+from collections import OrderedDict
+
+# How raw values are put on a common scale before weighting
+NORMALIZATIONS = ('minmax', 'zscore')
+
+# Whether larger or smaller raw values are better
+DIRECTIONS = ('higher', 'lower')
+
+MISSING = math.nan
+
+
+class ScoreColumn:
+    """One weighted criterion: raw values per object row and their running statistics"""
+
+    def __init__(self, field_id, weight, direction, values):
+        self.field_id = field_id
+        self.weight = weight
+        self.direction = direction
+        self.values = values
+        self.recount()
+
+    def recount(self):
+        """Recompute count, sum, sum of squares, min and max with one pass over the values"""
+        present = [value for value in self.values if value == value]
+        self.count = len(present)
+        self.total = math.fsum(present)
+        self.total_squares = math.fsum(value * value for value in present)
+        self.minimum = min(present) if present else MISSING
+        self.maximum = max(present) if present else MISSING
+
+    def replace(self, row, value):
+        """Set the value of one row, keeping the statistics current
+
+        Count and sums change in O(1); only moving the current minimum or
+        maximum inwards needs a rescan.
+        """
+        old = self.values[row]
+        self.values[row] = value
+        if old == old:
+            self.count -= 1
+            self.total -= old
+            self.total_squares -= old * old
+        if value == value:
+            self.count += 1
+            self.total += value
+            self.total_squares += value * value
+
+        if (old == old and old in (self.minimum, self.maximum)) or self.count == 0:
+            self.recount()
+        elif value == value:
+            self.minimum = value if self.minimum != self.minimum else min(self.minimum, value)
+            self.maximum = value if self.maximum != self.maximum else max(self.maximum, value)
+
+    def scale(self, normalization):
+        """(offset, factor) mapping a raw value to its oriented normalized score"""
+        if self.count == 0:
+            return 0.0, 0.0
+        if normalization == 'zscore':
+            mean = self.total / self.count
+            variance = max(self.total_squares / self.count - mean * mean, 0.0)
+            # Identical values all sit on the mean
+            factor = 1 / math.sqrt(variance) if variance > 0 else 0.0
+            return mean, -factor if self.direction == 'lower' else factor
+
+        spread = self.maximum - self.minimum
+        if spread <= 0:
+            # Identical values are all the best available
+            return self.minimum - 1, 1.0
+        if self.direction == 'lower':
+            return self.maximum, -1 / spread
+        return self.minimum, 1 / spread
+
+
+class ScoreTable:
+    """Scores of every object of an analysis under one weight profile
+
+    `object_ids` are the analysis's objects in id order and `columns` one
+    ScoreColumn per weighted field, indexed by the same rows. A missing
+    value contributes nothing to an object's score, which is the weighted
+    mean of its normalized values over all weighted fields. `version` is
+    the analysis version the values reflect. Reads and in-place updates
+    are serialized by a per-table lock.
+    """
+
+    def __init__(self, object_ids, columns, normalization, version, profile_version):
+        self.object_ids = array('q', object_ids)
+        self.rows = {object_id: row for row, object_id in enumerate(object_ids)}
+        self.columns = columns
+        self.normalization = normalization
+        self.version = version
+        self.profile_version = profile_version
+        self.total_weight = math.fsum(column.weight for column in columns) or 1.0
+        self._lock = threading.Lock()
+        self.rescore()
+
+    def _scales(self):
+        return [column.scale(self.normalization) for column in self.columns]
+
+    def rescore(self):
+        """Recompute every score, one column at a time"""
+        self._current_scales = self._scales()
+        scores = [0.0] * len(self.object_ids)
+        for column, (offset, factor) in zip(self.columns, self._current_scales):
+            weight = column.weight / self.total_weight
+            if factor == 0.0:
+                continue
+            for row, value in enumerate(column.values):
+                if value == value:
+                    scores[row] += weight * (value - offset) * factor
+        self.scores = array('d', scores)
+
+    def score_row(self, row):
+        """Score of one row under the current scales"""
+        score = 0.0
+        for column, (offset, factor) in zip(self.columns, self._current_scales):
+            value = column.values[row]
+            if value == value:
+                score += column.weight / self.total_weight * (value - offset) * factor
+        return score
+
+    def update_object(self, object_id, values, version):
+        """Apply the new raw values {field_id: value} of one object, as of analysis `version`
+
+        Applies only if the table reflects the version right before that
+        write and knows the object; returns whether it did. Only that object
+        is rescored unless the edit moved a column's normalization, in which
+        case every score is recomputed from the values in memory.
+        """
+        row = self.rows.get(object_id)
+        if row is None:
+            return False
+        with self._lock:
+            if self.version != version - 1:
+                return False
+            for column in self.columns:
+                column.replace(row, values.get(column.field_id, MISSING))
+            if self._scales() == self._current_scales:
+                self.scores[row] = self.score_row(row)
+            else:
+                self.rescore()
+            self.version = version
+        return True
+
+    def top(self, k):
+        """The `k` best (object_id, score) pairs, best first"""
+        with self._lock:
+            best = heapq.nlargest(k, range(len(self.scores)), key=self.scores.__getitem__)
+            return [(self.object_ids[row], self.scores[row]) for row in best]
+
+    def rank(self, object_id):
+        """(rank, score) of one object, rank 1 being the best, or None if it is unknown"""
+        row = self.rows.get(object_id)
+        if row is None:
+            return None
+        with self._lock:
+            score = self.scores[row]
+            return 1 + sum(1 for other in self.scores if other > score), score
+
+    def contributions(self, object_id):
+        """{field_id: weighted share of the score} for one object"""
+        row = self.rows[object_id]
+        with self._lock:
+            return {
+                column.field_id: (column.weight / self.total_weight * (column.values[row] - offset) * factor
+                                  if column.values[row] == column.values[row] else None)
+                for column, (offset, factor) in zip(self.columns, self._current_scales)
+            }
+
+
+class ScoreCache:
+    """Thread-safe LRU of ScoreTables keyed by (analysis_id, profile_id)"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, analysis_id, profile_id, version, profile_version):
+        """The cached table if it reflects these versions, else None"""
+        with self._lock:
+            table = self._tables.get((analysis_id, profile_id))
+            if table is None or table.version != version or table.profile_version != profile_version:
+                self.misses += 1
+                return None
+            self._tables.move_to_end((analysis_id, profile_id))
+            self.hits += 1
+            return table
+
+    def put(self, analysis_id, profile_id, table):
+        """Store `table`, evicting the least recently used ones beyond `max_entries`"""
+        with self._lock:
+            self._tables[(analysis_id, profile_id)] = table
+            self._tables.move_to_end((analysis_id, profile_id))
+            while len(self._tables) > self.max_entries:
+                self._tables.popitem(last=False)
+
+    def tables_for(self, analysis_id):
+        """Cached tables of one analysis"""
+        with self._lock:
+            return [table for (cached_id, _), table in self._tables.items() if cached_id == analysis_id]
+
+    def clear(self):
+        """Drop every table"""
+        with self._lock:
+            self._tables.clear()
@@ -0,0 +1,256 @@
+"""Pre-fork multi-worker server for production
+
+The master process migrates the schema once through create_app(), binds the
+listening socket and forks the workers. Each worker serves the shared socket
+with a bounded pool of request threads, so a busy worker stops accepting and
+leaves new connections to the others. Workers that die are replaced.
+
+Signals to the master:
+
+    TERM, INT  stop; workers finish their in-flight requests first
+    HUP        graceful reload: re-import the application code, migrate,
+               start a new set of workers, then stop the old set
+
+    python server.py [--host 0.0.0.0] [--port 5007] [--workers N] [--threads 4]
+"""
+import argparse
+import importlib
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+
+import app as comparison_app
+
+# Application modules re-imported on a graceful reload, dependencies first
+RELOAD_MODULES = ('metrics', 'response_cache', 'slow_queries', 'profiling', 'scoring', 'skyline',
+                  'field_stats', 'similarity', 'dedup', 'app')
+
+# Seconds stopping workers get to finish their requests before they are killed
+GRACEFUL_TIMEOUT = float(os.environ.get('GRACEFUL_TIMEOUT', '30'))
+
+# Seconds an idle keep-alive connection may hold a request thread
+KEEPALIVE_TIMEOUT = float(os.environ.get('KEEPALIVE_TIMEOUT', '10'))
+
+# Workers that exit sooner than this after starting count as crashing, and are respawned more slowly
+MIN_WORKER_LIFETIME = 5
+
+log = logging.getLogger('server')
+
+
+def default_workers():
+    """One worker per CPU core this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class RequestHandler(WSGIRequestHandler):
+    """Request handler that closes connections idle for KEEPALIVE_TIMEOUT"""
+
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+
+
+class WorkerServer(ThreadedWSGIServer):
+    """Threaded WSGI server that runs at most `threads` requests at once
+
+    While every thread is busy it stops accepting, so queued connections go
+    to another worker. Stopping waits for the running requests to finish.
+    """
+
+    daemon_threads = False
+    block_on_close = True
+
+    def __init__(self, host, port, application, sock, threads):
+        self._slots = threading.BoundedSemaphore(threads)
+        super().__init__(host, port, application, handler=RequestHandler, fd=sock.fileno())
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+def run_worker(application, sock, host, port, threads):
+    """Serve `sock` in this forked process until SIGTERM, then drain and exit"""
+    # Ctrl-C and reloads are the master's business
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    server = WorkerServer(host, port, application, sock, threads)
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever() to return, so it cannot run on this thread
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    server.serve_forever()
+    server.server_close()
+
+
+class Master:
+    """Forks the workers, replaces those that die and handles stop and reload signals"""
+
+    def __init__(self, sock, host, port, worker_count, threads, config):
+        self.sock = sock
+        self.host = host
+        self.port = port
+        self.worker_count = worker_count
+        self.threads = threads
+        self.config = config
+        self.application = comparison_app.create_app(config)
+        self.generation = 0
+        self.workers = {}
+        self.stopping = False
+        self.reload_requested = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                run_worker(self.application, self.sock, self.host, self.port, self.threads)
+            except BaseException:
+                log.exception('Worker failed')
+                status = 1
+            finally:
+                # Never return into the master's loop from a forked child
+                os._exit(status)
+        self.workers[pid] = (self.generation, time.monotonic())
+        log.info('Started worker %d', pid)
+
+    def reap(self):
+        """Forget exited workers; returns how many of the current generation died early"""
+        crashed = 0
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            generation, started = self.workers.pop(pid, (None, 0))
+            if generation == self.generation and not self.stopping:
+                code = os.waitstatus_to_exitcode(status)
+                if code < 0:
+                    log.warning('Worker %d was killed by signal %d', pid, -code)
+                else:
+                    log.warning('Worker %d exited with status %d', pid, code)
+                if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                    crashed += 1
+        return crashed
+
+    def reload(self):
+        """Re-import the application, migrate, start new workers and retire the old ones"""
+        self.reload_requested = False
+        log.info('Reloading')
+        try:
+            for name in RELOAD_MODULES:
+                importlib.reload(sys.modules[name])
+            self.application = comparison_app.create_app(self.config)
+        except Exception:
+            log.exception('Reload failed, keeping the current workers')
+            return
+
+        old = [pid for pid, (generation, _) in self.workers.items() if generation == self.generation]
+        self.generation += 1
+        for _ in range(self.worker_count):
+            self.spawn()
+        for pid in old:
+            self.signal_worker(pid, signal.SIGTERM)
+
+    def signal_worker(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def stop(self):
+        """Ask every worker to finish up, killing those still busy after GRACEFUL_TIMEOUT"""
+        log.info('Stopping %d workers', len(self.workers))
+        for pid in list(self.workers):
+            self.signal_worker(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            log.warning('Killing worker %d', pid)
+            self.signal_worker(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.workers.clear()
+
+    def run(self):
+        def request_stop(signum, frame):
+            self.stopping = True
+
+        def request_reload(signum, frame):
+            self.reload_requested = True
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGHUP, request_reload)
+        log.info('Listening on http://%s:%d with %d workers of %d threads (pid %d)',
+                 self.host, self.port, self.worker_count, self.threads, os.getpid())
+
+        while not self.stopping:
+            if self.reap():
+                # Back off instead of fork-looping a worker that cannot start
+                time.sleep(1)
+            if self.reload_requested:
+                self.reload()
+            current = sum(1 for generation, _ in self.workers.values() if generation == self.generation)
+            for _ in range(self.worker_count - current):
+                self.spawn()
+            time.sleep(0.2)
+
+        self.stop()
+
+
+def bind_socket(host, port, backlog=2048):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', '5007')))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('WEB_CONCURRENCY', '0')) or default_workers(),
+                        help='worker processes (default: WEB_CONCURRENCY, else one per CPU core)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WORKER_THREADS', '4')),
+                        help='request threads per worker')
+    parser.add_argument('--database', help='database path (default: DATABASE_PATH)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(process)d] %(message)s')
+    config = {'DATABASE': args.database} if args.database else {}
+
+    sock = bind_socket(args.host, args.port)
+    Master(sock, args.host, args.port, args.workers, args.threads, config).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""Nearest-neighbour search over normalized numeric feature vectors of objects"""
+import heapq
+import math
+import operator
+import threading
+from array import array
+from collections import OrderedDict
+
+MISSING = math.nan
+
+
+class KDTree:
+    """Static k-d tree over points stored column by column in flat arrays
+
+    Points are reordered so that every node covers a contiguous run of
+    positions; nodes keep that run, their children and their bounding box in
+    parallel arrays. A NaN coordinate is a missing value and counts as 0, the
+    feature's mean.
+    """
+
+    def __init__(self, ids, columns, leaf_size=32):
+        self.dimensions = len(columns)
+        filled = [array('d', [0.0 if value != value else value for value in column]) for column in columns]
+        order = list(range(len(ids)))
+        self.starts, self.ends = array('q'), array('q')
+        self.lefts, self.rights = array('q'), array('q')
+        self.lows, self.highs = array('d'), array('d')
+        if ids:
+            self._build(order, filled, 0, len(order), leaf_size,
+                        [min(column) for column in filled], [max(column) for column in filled])
+
+        self.ids = array('q', map(ids.__getitem__, order))
+        self.columns = [array('d', map(column.__getitem__, order)) for column in columns]
+
+    def _build(self, order, filled, start, end, leaf_size, cell_low, cell_high):
+        node = len(self.starts)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lefts.append(-1)
+        self.rights.append(-1)
+        self.lows.extend([0.0] * self.dimensions)
+        self.highs.extend([0.0] * self.dimensions)
+
+        # Split the widest side of the node's cell at the median, narrowing
+        # sides that turn out to hold a single value
+        while end - start > leaf_size:
+            split = max(range(self.dimensions), key=lambda d: cell_high[d] - cell_low[d])
+            if cell_high[split] <= cell_low[split]:
+                break
+            column = filled[split]
+            order[start:end] = sorted(order[start:end], key=column.__getitem__)
+            cell_low[split], cell_high[split] = column[order[start]], column[order[end - 1]]
+            if cell_low[split] == cell_high[split]:
+                continue
+            middle = (start + end) // 2
+            median = column[order[middle]]
+            left_high, right_low = list(cell_high), list(cell_low)
+            left_high[split] = right_low[split] = median
+            self.lefts[node] = self._build(order, filled, start, middle, leaf_size, list(cell_low), left_high)
+            self.rights[node] = self._build(order, filled, middle, end, leaf_size, right_low, list(cell_high))
+            break
+
+        # Bounding boxes are exact: taken over a leaf's points, merged from children otherwise
+        base = node * self.dimensions
+        if self.lefts[node] < 0:
+            run = order[start:end]
+            for d, column in enumerate(filled):
+                values = list(map(column.__getitem__, run))
+                self.lows[base + d] = min(values)
+                self.highs[base + d] = max(values)
+        else:
+            left, right = self.lefts[node] * self.dimensions, self.rights[node] * self.dimensions
+            for d in range(self.dimensions):
+                self.lows[base + d] = min(self.lows[left + d], self.lows[right + d])
+                self.highs[base + d] = max(self.highs[left + d], self.highs[right + d])
+        return node
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _box_distance(self, node, query, dims):
+        base = node * self.dimensions
+        distance = 0.0
+        for d in dims:
+            value = query[d]
+            low = self.lows[base + d]
+            if value < low:
+                distance += (low - value) ** 2
+            else:
+                high = self.highs[base + d]
+                if value > high:
+                    distance += (value - high) ** 2
+        return distance
+
+    def shared(self, position, dims):
+        """How many of `dims` the point at `position` has a value for"""
+        return sum(1 for d in dims if self.columns[d][position] == self.columns[d][position])
+
+    def nearest(self, query, dims, k, skip, limit=math.inf):
+        """The `k` nearest points to `query` over the dimensions `dims`, as (squared distance, position)
+
+        Only points closer than `limit` count. Points without a value in any
+        of `dims`, or whose id `skip` rejects, are passed over. Nodes are
+        visited best first by the distance to their box, stopping once none
+        can be closer than the k-th point found.
+        """
+        best = []
+        if not self.ids:
+            return best
+        targets = [(self.columns[d], query[d]) for d in dims]
+        worst = limit
+        frontier = [(0.0, 0)]
+        while frontier:
+            bound, node = heapq.heappop(frontier)
+            if bound >= worst:
+                break
+            left = self.lefts[node]
+            if left >= 0:
+                for child in (left, self.rights[node]):
+                    distance = self._box_distance(child, query, dims)
+                    if distance < worst:
+                        heapq.heappush(frontier, (distance, child))
+                continue
+
+            for position in range(self.starts[node], self.ends[node]):
+                distance, shared = 0.0, False
+                for column, target in targets:
+                    value = column[position]
+                    if value != value:
+                        value = 0.0
+                    else:
+                        shared = True
+                    distance += (value - target) ** 2
+                if distance >= worst or not shared or skip(self.ids[position]):
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, position))
+                else:
+                    heapq.heapreplace(best, (-distance, position))
+                if len(best) == k:
+                    worst = -best[0][0]
+        return sorted((-negated, position) for negated, position in best)
+
+
+class SimilarityIndex:
+    """k-NN index over the objects of a group of analyses, as of their `versions`
+
+    `analyses` maps each analysis id to (object_ids, {feature: array of raw
+    values}), NaN where an object has no value, and `field_features` maps
+    the group's field ids to feature positions. Values are z-scored with
+    each feature's mean and deviation at build time. Each analysis gets its
+    own tree over just the features it has, so trees stay dense however
+    many features the group has. Objects written since the build are masked
+    out of the trees and kept in a side table scanned by every query, until
+    there are enough of them that `stale` asks for a rebuild.
+    """
+
+    def __init__(self, analyses, field_features, dimensions, versions, leaf_size=32):
+        self.field_features = field_features
+        self.dimensions = dimensions
+        self.versions = dict(versions)
+        self._lock = threading.Lock()
+
+        count, total, total_squares = [0] * dimensions, [0.0] * dimensions, [0.0] * dimensions
+        for _, columns in analyses.values():
+            for feature, column in columns.items():
+                present = [value for value in column if value == value]
+                count[feature] += len(present)
+                total[feature] += math.fsum(present)
+                total_squares[feature] += math.fsum(map(operator.mul, present, present))
+        self.means, self.scales = [], []
+        for feature in range(dimensions):
+            mean = total[feature] / count[feature] if count[feature] else 0.0
+            variance = total_squares[feature] / count[feature] - mean * mean if count[feature] else 0.0
+            self.means.append(mean)
+            # Constant features cannot tell objects apart
+            self.scales.append(1 / math.sqrt(variance) if variance > 1e-12 * (mean * mean or 1.0) else 0.0)
+
+        self.trees = {}
+        for analysis_id, (object_ids, columns) in analyses.items():
+            features = sorted(columns)
+            normalized = [array('d', [(value - self.means[feature]) * self.scales[feature]
+                                      for value in columns[feature]]) for feature in features]
+            self.trees[analysis_id] = (features, KDTree(object_ids, normalized, leaf_size))
+        self.size = sum(len(object_ids) for object_ids, _ in analyses.values())
+        self.masked = set()
+        self.pending = {}
+
+    def normalize(self, values):
+        """z-scores of raw values by feature, NaN where a value is missing"""
+        return [(value - mean) * scale if value == value else MISSING
+                for value, mean, scale in zip(values, self.means, self.scales)]
+
+    def raw_values(self, values):
+        """Raw values by feature from typed values {field_id: value} of one object"""
+        raw = [MISSING] * self.dimensions
+        for field_id, value in values.items():
+            feature = self.field_features.get(field_id)
+            if feature is not None and value == value:
+                raw[feature] = value
+        return raw
+
+    def apply_object(self, analysis_id, object_id, values, version):
+        """Apply one object's typed values {field_id: value} after the write that produced `version`
+
+        `values` is None when the object was deleted. Applies only if the
+        index reflects the analysis version right before that write; returns
+        whether it did.
+        """
+        with self._lock:
+            if self.versions.get(analysis_id) != version - 1:
+                return False
+            self.masked.add(object_id)
+            self.pending.pop(object_id, None)
+            if values is not None:
+                point = self.normalize(self.raw_values(values))
+                if any(value == value for value in point):
+                    self.pending[object_id] = (analysis_id, point)
+            self.versions[analysis_id] = version
+            return True
+
+    @property
+    def stale(self):
+        """Whether enough objects changed since the build that rebuilding beats scanning them"""
+        return len(self.masked) > max(1024, self.size // 256)
+
+    def nearest(self, values, k, exclude_id=None, exclude_analysis=None):
+        """The `k` objects closest to typed values {field_id: value}, as (object_id, analysis_id, distance, shared)
+
+        Distance is the root mean square difference of z-scores over the
+        features the values have, missing values counting as the mean;
+        `shared` is how many of those features the object has too.
+        """
+        query = self.normalize(self.raw_values(values))
+        dims = [d for d, value in enumerate(query) if value == value]
+        if not dims:
+            return []
+        query_norm = math.fsum(query[d] ** 2 for d in dims)
+
+        def skip(object_id):
+            return object_id == exclude_id or object_id in self.masked
+
+        # Max-heap of the best (distance, object_id, analysis_id, shared) so far
+        best = []
+
+        def offer(distance, object_id, analysis_id, shared):
+            if len(best) < k:
+                heapq.heappush(best, (-distance, object_id, analysis_id, shared))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, object_id, analysis_id, shared))
+
+        with self._lock:
+            for analysis_id, (features, tree) in self.trees.items():
+                local_dims = [i for i, d in enumerate(features) if query[d] == query[d]]
+                if analysis_id == exclude_analysis or not local_dims:
+                    continue
+                # Query features this analysis lacks add the same distance to all its objects
+                local_query = [query[d] if query[d] == query[d] else 0.0 for d in features]
+                offset = max(query_norm - math.fsum(local_query[i] ** 2 for i in local_dims), 0.0)
+                limit = -best[0][0] - offset if len(best) == k else math.inf
+                for distance, position in tree.nearest(local_query, local_dims, k, skip, limit):
+                    offer(offset + distance, tree.ids[position], analysis_id, tree.shared(position, local_dims))
+
+            for object_id, (analysis_id, point) in self.pending.items():
+                if object_id == exclude_id or analysis_id == exclude_analysis:
+                    continue
+                shared = sum(1 for d in dims if point[d] == point[d])
+                if shared:
+                    offer(math.fsum(((point[d] if point[d] == point[d] else 0.0) - query[d]) ** 2 for d in dims),
+                          object_id, analysis_id, shared)
+
+        return [(object_id, analysis_id, math.sqrt(-negated / len(dims)), shared)
+                for negated, object_id, analysis_id, shared in sorted(best, reverse=True)]
+
+
+class SimilarityCache:
+    """Thread-safe LRU of SimilarityIndexes keyed by analysis group"""
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, group, versions):
+        """The cached index of `group` if it reflects these analysis versions and is not stale, else None"""
+        with self._lock:
+            index = self._indexes.get(group)
+            if index is None or index.versions != versions or index.stale:
+                self.misses += 1
+                return None
+            self._indexes.move_to_end(group)
+            self.hits += 1
+            return index
+
+    def put(self, group, index):
+        """Store `index`, evicting the least recently used ones beyond `max_entries`"""
+        with self._lock:
+            self._indexes[group] = index
+            self._indexes.move_to_end(group)
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+
+    def indexes_for(self, analysis_id):
+        """Cached indexes whose group includes an analysis"""
+        with self._lock:
+            return [index for index in self._indexes.values() if analysis_id in index.versions]
+
+    def clear(self):
+        """Drop every index"""
+        with self._lock:
+            self._indexes.clear()
@@ -0,0 +1,105 @@
+"""Pareto skyline: the objects no other object beats on every chosen criterion"""
+from bisect import bisect_left, bisect_right
+
+
+def dominates(a, b):
+    """Whether `a` is at least as good as `b` everywhere and better somewhere (larger is better)"""
+    better = False
+    for x, y in zip(a, b):
+        if x < y:
+            return False
+        if x > y:
+            better = True
+    return better
+
+
+def _skyline_2d(points):
+    # Best first by the first criterion; within a run of equal first values
+    # only those with the run's best second value can survive, and only if
+    # it beats every second value seen among strictly better first values
+    order = sorted(range(len(points)), key=lambda i: (-points[i][0], -points[i][1]))
+    result, best_y, position = [], None, 0
+    while position < len(order):
+        x = points[order[position]][0]
+        run_end = position
+        while run_end < len(order) and points[order[run_end]][0] == x:
+            run_end += 1
+        run_y = points[order[position]][1]
+        if best_y is None or run_y > best_y:
+            result.extend(i for i in order[position:run_end] if points[i][1] == run_y)
+            best_y = run_y
+        position = run_end
+    return result
+
+
+def _skyline_3d(points):
+    # Sweep by decreasing first value, keeping the (second, third) maxima of
+    # the skyline so far as a staircase: seconds ascending, thirds
+    # descending (stored negated so both lists bisect ascending)
+    order = sorted(range(len(points)), key=lambda i: -points[i][0])
+    seconds, negated_thirds, result = [], [], []
+    position = 0
+    while position < len(order):
+        x = points[order[position]][0]
+        run_end = position
+        while run_end < len(order) and points[order[run_end]][0] == x:
+            run_end += 1
+        run = order[position:run_end]
+
+        # Earlier runs dominate a point if a staircase step is at least as
+        # good on both remaining values; within its own run only a better
+        # (second, third) pair does
+        survivors = []
+        for local in _skyline_2d([points[i][1:] for i in run]):
+            y, z = points[run[local]][1:]
+            step = bisect_left(seconds, y)
+            if step == len(seconds) or -negated_thirds[step] < z:
+                survivors.append(run[local])
+
+        for i in survivors:
+            y, z = points[i][1:]
+            step = bisect_left(seconds, y)
+            if step < len(seconds) and -negated_thirds[step] >= z:
+                continue
+            end = bisect_right(seconds, y)
+            start = bisect_left(negated_thirds, -z, 0, end)
+            seconds[start:end] = [y]
+            negated_thirds[start:end] = [-z]
+        result.extend(survivors)
+        position = run_end
+    return result
+
+
+def skyline(points):
+    """Indexes of the non-dominated points, larger values being better in every dimension
+
+    Points are tuples of equal length. Two or three criteria take one sort
+    and a sweep, O(n log n). More use sort-filter-skyline: points are
+    visited in decreasing order of a monotone score (the sum of min-max
+    scaled values, ties broken lexicographically), so none can be dominated
+    by a later one and each is only checked against the skyline so far.
+    """
+    if not points:
+        return []
+    dimensions = len(points[0])
+    if dimensions == 1:
+        best = max(point[0] for point in points)
+        return [i for i, point in enumerate(points) if point[0] == best]
+    if dimensions == 2:
+        return _skyline_2d(points)
+    if dimensions == 3:
+        return _skyline_3d(points)
+
+    lows = [min(point[d] for point in points) for d in range(dimensions)]
+    spans = [(max(point[d] for point in points) - lows[d]) or 1.0 for d in range(dimensions)]
+
+    def strength(i):
+        point = points[i]
+        return sum((point[d] - lows[d]) / spans[d] for d in range(dimensions)), point
+
+    window = []
+    for i in sorted(range(len(points)), key=strength, reverse=True):
+        point = points[i]
+        if not any(dominates(points[j], point) for j in window):
+            window.append(i)
+    return window
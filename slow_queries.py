@@ -0,0 +1,120 @@
+"""In-process log of slow SQL statements grouped by normalized fingerprint"""
+import re
+import threading
+
+# Literals, parameter lists and whitespace that vary between runs of the same statement
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_NAMED_PARAMETER = re.compile(r'[:@$][A-Za-z_]\w*')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint_sql(sql):
+    """Normalize `sql` so statements differing only in literals share one fingerprint"""
+    text = _STRING_LITERAL.sub('?', sql)
+    text = _NAMED_PARAMETER.sub('?', text)
+    text = _NUMBER_LITERAL.sub('?', text)
+    text = _WHITESPACE.sub(' ', text).strip()
+    return _PLACEHOLDER_LIST.sub('(?, ...)', text)
+
+
+def redact_parameters(parameters):
+    """Describe bound parameters by type only, so logged values never leak user data"""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {name: f'<{type(value).__name__}>' for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [f'<{type(value).__name__}>' for value in parameters]
+    return '<redacted>'
+
+
+def plan_scans(plan):
+    """Tables a query plan reads with a full scan, the usual sign of a missing index
+
+    Scans of virtual tables (full-text indexes) and of subqueries or CTEs the
+    plan materialized itself are not counted.
+    """
+    derived = set()
+    scans = []
+    for line in plan:
+        detail = line.strip()
+        for prefix in ('MATERIALIZE ', 'CO-ROUTINE '):
+            if detail.startswith(prefix):
+                derived.add(detail[len(prefix):])
+        if not detail.startswith('SCAN ') or 'VIRTUAL TABLE' in detail:
+            continue
+        table = detail.split()[1]
+        if not table.startswith('(') and table not in derived:
+            scans.append(table)
+    return scans
+
+
+class SlowQueryLog:
+    """Thread-safe aggregate of slow statements per fingerprint
+
+    Each fingerprint keeps its call count, total and worst time, the routes
+    that issued it and up to `max_plans` distinct EXPLAIN QUERY PLAN outputs.
+    Once `max_fingerprints` are tracked, new fingerprints are dropped rather
+    than evicting existing ones, and counted in `dropped`.
+    """
+
+    def __init__(self, max_fingerprints=500, max_plans=5):
+        self.max_fingerprints = max_fingerprints
+        self.max_plans = max_plans
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def record(self, sql, seconds, route, parameters=None, plan=None):
+        """Add one slow execution of `sql` taking `seconds`, issued by `route`
+
+        `plan` is a tuple of EXPLAIN QUERY PLAN lines. Only the parameter
+        types of the slowest execution are kept, never their values.
+        """
+        fingerprint = fingerprint_sql(sql)
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                if len(self._entries) >= self.max_fingerprints:
+                    self.dropped += 1
+                    return None
+                entry = self._entries[fingerprint] = {
+                    'fingerprint': fingerprint,
+                    'sample_parameters': redact_parameters(parameters),
+                    'count': 0,
+                    'total_seconds': 0.0,
+                    'max_seconds': 0.0,
+                    'routes': {},
+                    'plans': []
+                }
+
+            entry['count'] += 1
+            entry['total_seconds'] += seconds
+            if seconds >= entry['max_seconds']:
+                entry['max_seconds'] = seconds
+                entry['sample_parameters'] = redact_parameters(parameters)
+            entry['routes'][route] = entry['routes'].get(route, 0) + 1
+
+            if plan and len(entry['plans']) < self.max_plans:
+                if plan not in entry['plans']:
+                    entry['plans'].append(plan)
+        return fingerprint
+
+    def top(self, limit=50, order_by='total_seconds'):
+        """Fingerprints with the largest `order_by` value, each as a plain dict"""
+        with self._lock:
+            entries = [dict(entry, routes=dict(entry['routes']), plans=list(entry['plans']))
+                       for entry in self._entries.values()]
+        for entry in entries:
+            entry['mean_seconds'] = entry['total_seconds'] / entry['count']
+            entry['scans'] = sorted({table for plan in entry['plans'] for table in plan_scans(plan)})
+        entries.sort(key=lambda entry: entry[order_by], reverse=True)
+        return entries[:limit]
+
+    def clear(self):
+        """Forget every recorded statement"""
+        with self._lock:
+            self._entries.clear()
+            self.dropped = 0
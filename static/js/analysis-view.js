@@ -2,6 +2,15 @@ class AnalysisView {
     constructor() {
         this.currentView = 'table';
         this.chart = null;
+        this.container = document.getElementById('comparisonContainer');
+        this.sentinel = document.getElementById('loadMoreSentinel');
+        this.analysisId = this.container?.dataset.analysisId;
+        this.pageSize = parseInt(this.container?.dataset.pageSize) || 50;
+        this.nextCursor = this.sentinel?.dataset.nextCursor || null;
+        this.sort = { field: 'created_at', order: 'desc' };
+        this.loading = false;
+        this.skyline = null; // ids of the Pareto-optimal objects while the highlight is on
+        this.fields = this.parseFields();
         this.analysisData = this.parseAnalysisData();
         this.init();
     }
@@ -9,36 +18,49 @@ class AnalysisView {
     init() {
         this.initViewSwitching();
         this.initTableSorting();
+        this.initInfiniteScroll();
+        this.initInlineEditing();
+        this.initSkyline();
         this.initChart();
         this.bindEvents();
     }
 
+    parseFields() {
+        // Field metadata from the table headers, used to render loaded rows
+        return Array.from(document.querySelectorAll('.comparison-table .sortable')).map(th => ({
+            id: th.dataset.field,
+            name: th.dataset.name,
+            type: th.dataset.type,
+            unit: th.dataset.unit,
+            best: th.dataset.best || null
+        }));
+    }
+
     parseAnalysisData() {
         // Extract data from the page for JavaScript use
         const objects = [];
         document.querySelectorAll('.object-row').forEach(row => {
-            const objectId = row.dataset.objectId;
-            const objectName = row.querySelector('.fw-bold').textContent;
-            const brand = row.querySelector('.text-muted')?.textContent || '';
-            
-            const fieldValues = {};
-            row.querySelectorAll('.field-value').forEach((cell, index) => {
-                const fieldType = cell.dataset.fieldType;
-                const value = this.extractCellValue(cell, fieldType);
-                fieldValues[index] = value;
-            });
-
-            objects.push({
-                id: objectId,
-                name: objectName,
-                brand: brand,
-                values: fieldValues
-            });
+            objects.push(this.parseRow(row));
         });
 
         return { objects };
     }
 
+    parseRow(row) {
+        const fieldValues = {};
+        row.querySelectorAll('.field-value').forEach((cell, index) => {
+            const fieldType = cell.dataset.fieldType;
+            fieldValues[index] = this.extractCellValue(cell, fieldType);
+        });
+
+        return {
+            id: row.dataset.objectId,
+            name: row.querySelector('.fw-bold').textContent,
+            brand: row.querySelector('.text-muted')?.textContent || '',
+            values: fieldValues
+        };
+    }
+
     extractCellValue(cell, fieldType) {
         switch (fieldType) {
             case 'number':
@@ -106,10 +128,6 @@ class AnalysisView {
 
     sortTable(header) {
         const table = header.closest('table');
-        const tbody = table.querySelector('tbody');
-        const rows = Array.from(tbody.querySelectorAll('tr'));
-        const columnIndex = Array.from(header.parentElement.children).indexOf(header);
-        const fieldType = header.dataset.type;
         
         // Toggle sort direction
         const isAscending = !header.classList.contains('sort-asc');
@@ -122,40 +140,404 @@ class AnalysisView {
         // Add sort class to current header
         header.classList.add(isAscending ? 'sort-asc' : 'sort-desc');
 
-        // Sort rows
-        rows.sort((a, b) => {
-            const aCell = a.children[columnIndex];
-            const bCell = b.children[columnIndex];
-            
-            const aValue = this.extractCellValue(aCell, fieldType);
-            const bValue = this.extractCellValue(bCell, fieldType);
+        // Sorting happens on the server so rows that are not loaded yet
+        // still end up in the right place
+        this.sort = { field: header.dataset.field, order: isAscending ? 'asc' : 'desc' };
+        this.reloadObjects();
+    }
+
+    initInfiniteScroll() {
+        if (!this.sentinel) return;
+
+        const observer = new IntersectionObserver((entries) => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) {
+                    this.loadMore();
+                }
+            });
+        }, { rootMargin: '400px 0px' });
+
+        observer.observe(this.sentinel);
+    }
+
+    initInlineEditing() {
+        // Double-clicking a value cell edits just that cell in place
+        document.getElementById('objectRows')?.addEventListener('dblclick', (event) => {
+            const cell = event.target.closest('.field-value');
+            if (cell && !cell.querySelector('input')) {
+                this.editCell(cell);
+            }
+        });
+    }
+
+    editCell(cell) {
+        const field = this.fields.find(f => String(f.id) === cell.dataset.fieldId);
+        if (!field) return;
+
+        const original = cell.innerHTML;
+        const input = document.createElement('input');
+        input.className = 'form-control form-control-sm';
+        input.value = cell.dataset.value || '';
+        cell.innerHTML = '';
+        cell.appendChild(input);
+        input.focus();
+
+        let finished = false;
+        const finish = async (save) => {
+            if (finished) return;
+            finished = true;
+
+            if (!save || input.value.trim() === (cell.dataset.value || '')) {
+                cell.innerHTML = original;
+                return;
+            }
+
+            try {
+                const row = cell.closest('.object-row');
+                const key = `field_${field.id}`;
+                const response = await fetch(`/analysis/${this.analysisId}/objects/${row.dataset.objectId}`, {
+                    method: 'PATCH',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ [key]: input.value })
+                });
+                const result = await response.json();
+                if (!result.success) {
+                    throw new Error(result.errors ? Object.values(result.errors).join('; ') : result.error);
+                }
+
+                cell.dataset.value = result.values[key];
+                cell.innerHTML = this.renderValue(field, result.values[key], false);
+
+                // The edit may have changed which objects are Pareto-optimal
+                if (this.skyline) {
+                    this.loadSkyline();
+                }
+                this.refreshFieldStats();
+
+                // Keep the chart data in step with the table
+                const index = this.analysisData.objects.findIndex(obj => obj.id === row.dataset.objectId);
+                if (index !== -1) {
+                    this.analysisData.objects[index] = this.parseRow(row);
+                }
+            } catch (error) {
+                cell.innerHTML = original;
+                window.comparisonHub?.showNotification(error.message, 'danger');
+            }
+        };
+
+        input.addEventListener('keydown', (event) => {
+            if (event.key === 'Enter') finish(true);
+            if (event.key === 'Escape') finish(false);
+        });
+        input.addEventListener('blur', () => finish(true));
+    }
+
+    buildPageUrl(cursor) {
+        const params = new URLSearchParams();
+        params.set('sort', this.sort.field);
+        params.set('order', this.sort.order);
+        params.set('limit', this.pageSize);
+        if (cursor) params.set('cursor', cursor);
+
+        // Keep any field filters from the page URL
+        new URLSearchParams(window.location.search).forEach((value, key) => {
+            if (key.startsWith('field_')) params.append(key, value);
+        });
+
+        return `/api/analysis/${this.analysisId}/objects?${params.toString()}`;
+    }
+
+    async fetchPage(cursor) {
+        this.loading = true;
+        try {
+            const response = await fetch(this.buildPageUrl(cursor));
+            const result = await response.json();
+            if (!result.success) {
+                throw new Error(result.error);
+            }
+            return result;
+        } finally {
+            this.loading = false;
+        }
+    }
+
+    async loadMore() {
+        if (this.loading || !this.nextCursor) return;
+
+        try {
+            const result = await this.fetchPage(this.nextCursor);
+            this.appendObjects(result.objects);
+            this.setNextCursor(result.next_cursor);
+        } catch (error) {
+            window.comparisonHub?.showNotification(error.message, 'danger');
+        }
+    }
+
+    async reloadObjects() {
+        try {
+            const result = await this.fetchPage(null);
+
+            document.getElementById('objectRows').innerHTML = '';
+            document.getElementById('objectCards').innerHTML = '';
+            this.analysisData.objects = [];
+
+            const rows = this.appendObjects(result.objects);
+            this.setNextCursor(result.next_cursor);
+
+            // Add animation
+            rows.forEach((row, index) => {
+                row.style.animation = `slideIn 0.3s ease-out ${Math.min(index, 20) * 0.05}s`;
+            });
+        } catch (error) {
+            window.comparisonHub?.showNotification(error.message, 'danger');
+        }
+    }
+
+    setNextCursor(cursor) {
+        this.nextCursor = cursor || null;
+        this.sentinel?.classList.toggle('d-none', !this.nextCursor);
+    }
 
-            if (aValue === null && bValue === null) return 0;
-            if (aValue === null) return isAscending ? 1 : -1;
-            if (bValue === null) return isAscending ? -1 : 1;
+    appendObjects(objects) {
+        const tbody = document.getElementById('objectRows');
+        const cards = document.getElementById('objectCards');
+        const rows = [];
 
-            let comparison = 0;
-            if (typeof aValue === 'number' && typeof bValue === 'number') {
-                comparison = aValue - bValue;
+        objects.forEach(obj => {
+            tbody.insertAdjacentHTML('beforeend', this.renderRow(obj));
+            cards.insertAdjacentHTML('beforeend', this.renderCard(obj));
+
+            const row = tbody.lastElementChild;
+            rows.push(row);
+            this.analysisData.objects.push(this.parseRow(row));
+        });
+
+        if (this.currentView === 'chart') {
+            this.updateChart();
+        }
+
+        this.applySkyline();
+        this.applyBestValues();
+        return rows;
+    }
+
+    initSkyline() {
+        document.getElementById('skylineToggle')?.addEventListener('click', () => {
+            if (this.skyline) {
+                this.skyline = null;
+                this.applySkyline();
             } else {
-                comparison = String(aValue).localeCompare(String(bValue));
+                this.loadSkyline();
+            }
+        });
+
+        // Changing the chosen fields recomputes a highlight that is showing
+        document.querySelectorAll('.skyline-field-check, .skyline-field-direction').forEach(input => {
+            input.addEventListener('change', () => {
+                if (this.skyline) this.loadSkyline();
+            });
+        });
+    }
+
+    buildSkylineUrl() {
+        const fields = [];
+        const lower = [];
+        document.querySelectorAll('.skyline-field').forEach(item => {
+            if (!item.querySelector('.skyline-field-check').checked) return;
+            fields.push(item.dataset.fieldId);
+            if (item.querySelector('.skyline-field-direction').value === 'lower') {
+                lower.push(item.dataset.fieldId);
             }
+        });
+        if (!fields.length) {
+            throw new Error('Choose at least one field for the Pareto highlight');
+        }
+
+        const params = new URLSearchParams({ fields: fields.join(','), lower: lower.join(',') });
+        return `/api/analysis/${this.analysisId}/skyline?${params.toString()}`;
+    }
+
+    async loadSkyline() {
+        try {
+            const response = await fetch(this.buildSkylineUrl());
+            const result = await response.json();
+            if (!result.success) {
+                throw new Error(result.error);
+            }
+
+            this.skyline = new Set(result.object_ids.map(String));
+            const summary = document.getElementById('skylineSummary');
+            if (summary) {
+                summary.textContent = `${result.object_ids.length} of ${result.considered} objects are Pareto-optimal`
+                    + (result.excluded ? `; ${result.excluded} without all values are left out` : '');
+            }
+        } catch (error) {
+            this.skyline = null;
+            window.comparisonHub?.showNotification(error.message, 'danger');
+        }
+        this.applySkyline();
+    }
+
+    applySkyline() {
+        const active = this.skyline !== null;
+        this.container?.classList.toggle('skyline-active', active);
+        document.getElementById('skylineToggle')?.classList.toggle('active', active);
 
-            return isAscending ? comparison : -comparison;
+        document.querySelectorAll('.object-row, [data-card-object-id]').forEach(element => {
+            const id = element.dataset.objectId || element.dataset.cardObjectId;
+            element.classList.toggle('skyline-member', active && this.skyline.has(id));
         });
+    }
 
-        // Reorder rows in DOM
-        rows.forEach(row => tbody.appendChild(row));
+    isBestValue(field, value) {
+        if (!field.best || value === undefined || value === null || value === '') return false;
+        if (field.type === 'date' || field.type === 'boolean') {
+            return String(value).trim().toLowerCase() === field.best.toLowerCase();
+        }
+        const number = parseFloat(field.type === 'price' ? String(value).replace(/[$,]/g, '') : value);
+        return number === parseFloat(field.best);
+    }
 
-        // Add animation
-        rows.forEach((row, index) => {
-            row.style.animation = 'none';
-            setTimeout(() => {
-                row.style.animation = `slideIn 0.3s ease-out ${index * 0.05}s`;
-            }, 10);
+    applyBestValues() {
+        const fields = new Map(this.fields.map(field => [String(field.id), field]));
+        document.querySelectorAll('#objectRows .field-value').forEach(cell => {
+            const field = fields.get(cell.dataset.fieldId);
+            cell.classList.toggle('best-value', !!field && this.isBestValue(field, cell.dataset.value));
         });
     }
 
+    renderFieldSummary(stats) {
+        if (!stats.count) {
+            return '<span class="field-summary-detail">No values</span>';
+        }
+        const display = stats.display;
+        return `
+            <div>${escapeHtml(display.range)}</div>
+            <div class="field-summary-detail">avg ${escapeHtml(display.mean)} · med ${escapeHtml(display.median)}</div>
+            <div class="field-summary-detail">± ${escapeHtml(display.spread)} · ${escapeHtml(display.fill)} filled</div>`;
+    }
+
+    async refreshFieldStats() {
+        // Statistics are over all objects, so any edit can move them
+        try {
+            const response = await fetch(`/api/analysis/${this.analysisId}/field-stats`);
+            const result = await response.json();
+            if (!result.success) {
+                throw new Error(result.error);
+            }
+
+            result.fields.forEach(stats => {
+                const field = this.fields.find(f => String(f.id) === String(stats.id));
+                if (field) field.best = stats.best === null ? null : String(stats.best);
+                const cell = document.querySelector(`.field-summary[data-field-id="${stats.id}"]`);
+                if (cell) cell.innerHTML = this.renderFieldSummary(stats);
+            });
+        } catch (error) {
+            window.comparisonHub?.showNotification(error.message, 'danger');
+        }
+        this.applyBestValues();
+    }
+
+    renderValue(field, value, withUnit) {
+        if (value === undefined || value === null || value === '') {
+            return '<span class="text-muted">-</span>';
+        }
+
+        switch (field.type) {
+            case 'boolean':
+                return `<span class="badge bg-${value === 'Yes' ? 'success' : 'secondary'}">${escapeHtml(value)}</span>`;
+
+            case 'rating': {
+                const rating = parseInt(value) || 0;
+                let stars = '';
+                for (let i = 1; i <= 5; i++) {
+                    stars += `<i class="bi bi-star${i <= rating ? '-fill text-warning' : ''}"></i>`;
+                }
+                return `<div class="rating-display">${stars}</div>`;
+            }
+
+            case 'price':
+                return `<span class="price-value">$${(parseFloat(value) || 0).toFixed(2)}</span>`;
+
+            default:
+                return escapeHtml(value) + (withUnit && field.unit ? ` ${escapeHtml(field.unit)}` : '');
+        }
+    }
+
+    renderRow(obj) {
+        const image = obj.image_url
+            ? `<img src="${escapeHtml(obj.image_url)}" alt="${escapeHtml(obj.object_name)}" class="object-image me-3" onerror="this.style.display='none'">`
+            : '';
+        const brand = obj.brand ? `<small class="text-muted">${escapeHtml(obj.brand)}</small>` : '';
+        const cells = this.fields.map(field => `
+            <td class="text-center field-value${this.isBestValue(field, obj.values[field.id]) ? ' best-value' : ''}" data-field-type="${field.type}"
+                data-field-id="${field.id}" data-value="${escapeHtml(obj.values[field.id] ?? '')}" title="Double-click to edit">
+                ${this.renderValue(field, obj.values[field.id], false)}
+            </td>`).join('');
+
+        return `
+            <tr class="object-row" data-object-id="${obj.id}">
+                <td class="object-info">
+                    <div class="d-flex align-items-center">
+                        ${image}
+                        <div>
+                            <div class="fw-bold">${escapeHtml(obj.object_name)}</div>
+                            ${brand}
+                        </div>
+                    </div>
+                </td>
+                ${cells}
+                <td class="text-center">
+                    <div class="btn-group btn-group-sm">
+                        <button class="btn btn-outline-primary" onclick="editObject(${obj.id})">
+                            <i class="bi bi-pencil"></i>
+                        </button>
+                        <button class="btn btn-outline-danger" onclick="deleteObject(${obj.id})">
+                            <i class="bi bi-trash"></i>
+                        </button>
+                    </div>
+                </td>
+            </tr>`;
+    }
+
+    renderCard(obj) {
+        const image = obj.image_url
+            ? `<div class="object-image-container">
+                   <img src="${escapeHtml(obj.image_url)}" alt="${escapeHtml(obj.object_name)}" class="object-card-image" onerror="this.style.display='none'">
+               </div>`
+            : '';
+        const brand = obj.brand ? `<p class="text-muted mb-3">${escapeHtml(obj.brand)}</p>` : '';
+        const properties = this.fields
+            .filter(field => obj.values[field.id])
+            .map(field => `
+                <div class="property-item d-flex justify-content-between mb-2">
+                    <span class="property-label">${escapeHtml(field.name)}:</span>
+                    <span class="property-value">${this.renderValue(field, obj.values[field.id], true)}</span>
+                </div>`).join('');
+
+        return `
+            <div class="col-lg-4 col-md-6" data-card-object-id="${obj.id}">
+                <div class="object-card glass-card h-100">
+                    ${image}
+                    <div class="card-body p-4">
+                        <h5 class="card-title">${escapeHtml(obj.object_name)}</h5>
+                        ${brand}
+                        <div class="object-properties">${properties}</div>
+                    </div>
+                    <div class="card-footer bg-transparent border-0 p-4">
+                        <div class="d-flex gap-2">
+                            <button class="btn btn-outline-primary btn-sm flex-fill" onclick="editObject(${obj.id})">
+                                <i class="bi bi-pencil me-1"></i>Edit
+                            </button>
+                            <button class="btn btn-outline-danger btn-sm" onclick="deleteObject(${obj.id})">
+                                <i class="bi bi-trash"></i>
+                            </button>
+                        </div>
+                    </div>
+                </div>
+            </div>`;
+    }
+
     initChart() {
         const canvas = document.getElementById('comparisonChart');
         if (!canvas) return;
@@ -250,6 +632,15 @@ class AnalysisView {
 }
 
 // Global functions for template use
+function escapeHtml(value) {
+    return String(value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
 function editObject(objectId) {
     const analysisId = window.location.pathname.split('/')[2];
     window.location.href = `/analysis/${analysisId}/objects/${objectId}/edit`;
@@ -270,6 +661,7 @@ async function deleteObject(objectId) {
 
         if (result.success) {
             // Remove object from UI
+            document.querySelector(`[data-card-object-id="${objectId}"]`)?.remove();
             const objectRow = document.querySelector(`[data-object-id="${objectId}"]`);
             if (objectRow) {
                 objectRow.style.transition = 'all 0.3s ease';
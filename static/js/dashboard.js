@@ -213,6 +213,9 @@ class DashboardManager {
 
             if (result.success) {
                 this.showNotification(result.message, 'success');
+                if (result.status_url) {
+                    await this.waitForDuplicate(result.status_url);
+                }
                 setTimeout(() => {
                     window.location.href = `/analysis/${result.new_analysis_id}`;
                 }, 1500);
@@ -224,6 +227,21 @@ class DashboardManager {
         }
     }
 
+    async waitForDuplicate(statusUrl) {
+        // Large copies run in the background; poll until they finish
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const response = await fetch(statusUrl);
+            const status = await response.json();
+
+            if (!status.success || status.status === 'done') return;
+            if (status.status === 'failed' || status.status === 'cancelled') {
+                throw new Error(status.error || 'Duplicate was cancelled');
+            }
+            this.showNotification(`Copying objects... ${Math.round(status.progress * 100)}%`, 'info', 1000);
+        }
+    }
+
     createShredderEffect(card) {
         const pieces = 8;
         for (let i = 0; i < pieces; i++) {